@@ -0,0 +1,118 @@
+# benchmark_benders.py
+"""
+So sánh backend Benders (tscflp_benders.py) với model MILP đầy đủ (CBC)
+trên các instance sinh ngẫu nhiên (tscflp_generator.py).
+
+Mỗi instance được giải bằng solve_full_mip với từng backend, cùng time
+limit; in ra cost, thời gian, đã chứng minh tối ưu hay chưa và số vòng
+Benders. Kết quả có thể ghi ra file JSON (--json).
+
+    python benchmark_benders.py
+    python benchmark_benders.py --sizes 5x20x200 10x40x1000 --tightness 1.2 --time-limit 300
+    python benchmark_benders.py --backends cbc highs benders
+    python benchmark_benders.py --check      # kiểm tra hồi quy: Benders = HiGHS
+"""
+
+import argparse
+import json
+import time
+
+from tscflp_core import solve_full_mip, get_model, register_backend
+from tscflp_generator import generate_instance
+from tscflp_benders import BendersModel
+
+DEFAULT_SIZES = ["5x15x100", "6x20x150", "5x40x600", "10x50x1000"]
+DEFAULT_BACKENDS = ["cbc", "benders", "benders-multi"]
+
+register_backend("benders-multi", lambda inst: BendersModel(inst, multicut=True))
+
+# Instance mà master HiGHS từng báo "Solve error" (status 4) giữa chừng,
+# Benders khi đó trả về incumbent lệch ~10% so với tối ưu
+REGRESSION_CASES = [
+    dict(n_primary=3, n_secondary=7, n_customers=22, seed=6, tightness=3.0,
+         layout="clustered"),
+]
+
+
+def parse_size(text: str):
+    """'nIxnJxnK' -> (nI, nJ, nK)."""
+    parts = text.lower().split("x")
+    if len(parts) != 3:
+        raise argparse.ArgumentTypeError(f"Kích thước không hợp lệ: {text!r} (dạng 5x20x200)")
+    return tuple(int(p) for p in parts)
+
+
+def run_benchmark(sizes, backends, tightness=1.5, time_limit=120.0, seed=0):
+    """Giải từng instance bằng từng backend. Trả về list kết quả (dict)."""
+    rows = []
+    for nI, nJ, nK in sizes:
+        for backend in backends:
+            # instance mới cho mỗi backend: không dùng chung model / cache
+            inst = generate_instance(nI, nJ, nK, tightness=tightness, seed=seed)
+            start = time.perf_counter()
+            sol = solve_full_mip(inst, time_limit=time_limit, backend=backend)
+            elapsed = time.perf_counter() - start
+            model = get_model(inst, backend)
+            timing = model.timing()
+            rows.append({
+                "size": f"{nI}x{nJ}x{nK}",
+                "backend": backend,
+                "cost": sol.cost,
+                "time_seconds": round(elapsed, 4),
+                "optimal": bool(model.last_optimal),
+                "iterations": timing.get("iterations"),
+                "subproblems": timing.get("subproblems"),
+            })
+            print(f"{rows[-1]['size']:>14} {backend:>15} cost = {sol.cost:16.4f} "
+                  f"time = {elapsed:9.3f} s  optimal = {model.last_optimal}"
+                  + (f"  iterations = {timing['iterations']}" if "iterations" in timing else ""),
+                  flush=True)
+    return rows
+
+
+def check_against_highs(cases=REGRESSION_CASES, backends=("benders", "benders-multi"),
+                        rel_tol=1e-4):
+    """
+    Giải từng instance trong cases bằng backend "highs" và các backend Benders;
+    RuntimeError nếu cost Benders lệch khỏi tối ưu của HiGHS quá rel_tol.
+    """
+    for params in cases:
+        ref = solve_full_mip(generate_instance(**params), backend="highs").cost
+        for backend in backends:
+            inst = generate_instance(**params)
+            cost = solve_full_mip(inst, backend=backend).cost
+            ok = abs(cost - ref) <= rel_tol * max(1.0, abs(ref))
+            print(f"{params} {backend:>15} cost = {cost:.4f}  highs = {ref:.4f}  "
+                  f"{'OK' if ok else 'SAI'}", flush=True)
+            if not ok:
+                raise RuntimeError(f"Backend {backend} cho cost {cost} khác tối ưu {ref} "
+                                   f"của highs trên instance {params}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="So sánh Benders với MILP đầy đủ (CBC)")
+    parser.add_argument("--sizes", nargs="+", type=parse_size,
+                        default=[parse_size(s) for s in DEFAULT_SIZES],
+                        help="kích thước instance dạng nIxnJxnK")
+    parser.add_argument("--backends", nargs="+", default=DEFAULT_BACKENDS,
+                        help="các backend cần so sánh (mặc định: %(default)s)")
+    parser.add_argument("--tightness", type=float, default=1.5,
+                        help="tổng capacity / tổng demand (mặc định: %(default)s)")
+    parser.add_argument("--time-limit", type=float, default=120.0,
+                        help="time limit cho mỗi lần giải (giây)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="ghi kết quả ra file JSON")
+    parser.add_argument("--check", action="store_true",
+                        help="chỉ kiểm tra hồi quy: Benders phải cho cùng cost với highs")
+    args = parser.parse_args()
+
+    if args.check:
+        check_against_highs()
+        raise SystemExit(0)
+
+    results = run_benchmark(args.sizes, args.backends, tightness=args.tightness,
+                            time_limit=args.time_limit, seed=args.seed)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=4)
+        print(f"✓ Kết quả đã lưu vào: {args.json}")
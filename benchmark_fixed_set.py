@@ -0,0 +1,132 @@
+# benchmark_fixed_set.py
+"""
+So sánh 2 cách chọn fixed-set trong MFSS (build_fixed_set, mfss_tscflp.py):
+    frequency : tần suất giống base trong Skn (như paper)
+    lp        : theo relaxation LP của instance (tscflp_lp.py)
+
+Đo time-to-target: cost tham chiếu lấy từ solve_full_mip (HiGHS, có time
+limit), target = tham chiếu * (1 + target_gap); với mỗi instance / seed /
+rule, chạy mfss tới khi đạt target hoặc hết time budget và ghi lại thời
+điểm đầu tiên best <= target (tính cả thời gian dựng population và giải LP).
+In ra bảng tổng hợp: tỉ lệ đạt target, thời gian trung vị / trung bình
+(trên các lần đạt), cost cuối trung bình. Kết quả có thể ghi ra file JSON (--json).
+
+    python benchmark_fixed_set.py
+    python benchmark_fixed_set.py --sizes 10x50x1000 --seeds 0 1 2 3 --time-budget 120 --target-gap 0.005
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from tscflp_core import solve_full_mip
+from tscflp_generator import generate_instance
+from mfss_tscflp import mfss, FIX_RULES
+from benchmark_benders import parse_size
+
+DEFAULT_SIZES = ["5x20x200", "10x50x1000"]
+
+
+def reference_cost(nI, nJ, nK, tightness, seed, time_limit):
+    """Cost tham chiếu: model MILP đầy đủ (HiGHS) với time limit."""
+    inst = generate_instance(nI, nJ, nK, tightness=tightness, seed=seed)
+    return solve_full_mip(inst, time_limit=time_limit, backend="highs").cost
+
+
+def run_benchmark(sizes, rules=FIX_RULES, seeds=(0, 1, 2), tightness=1.5,
+                  time_budget=60.0, target_gap=0.01, ref_time_limit=120.0):
+    """Chạy mfss với từng rule. Trả về (list kết quả từng lần chạy, bảng tổng hợp)."""
+    rows = []
+    for nI, nJ, nK in sizes:
+        size = f"{nI}x{nJ}x{nK}"
+        ref = reference_cost(nI, nJ, nK, tightness, 0, ref_time_limit)
+        target = ref * (1 + target_gap)
+        print(f"{size}: cost tham chiếu = {ref:.4f}, target = {target:.4f}", flush=True)
+        for rule in rules:
+            for seed in seeds:
+                # instance mới cho mỗi lần chạy: không dùng chung model / LP / cache
+                inst = generate_instance(nI, nJ, nK, tightness=tightness, seed=0)
+                hit = []
+
+                def on_improve(ev):
+                    if ev.cost <= target and not hit:
+                        hit.append(ev.elapsed)
+
+                start = time.perf_counter()
+                sol = mfss(inst, seed=seed, fix_rule=rule, lb_iter=0, max_iter=10 ** 6,
+                           time_budget=time_budget, target_cost=target,
+                           callback=on_improve)
+                rows.append({
+                    "size": size,
+                    "rule": rule,
+                    "seed": seed,
+                    "reference_cost": ref,
+                    "target_cost": target,
+                    "final_cost": sol.cost,
+                    "reached": bool(hit),
+                    "time_to_target": round(hit[0], 4) if hit else None,
+                    "time_seconds": round(time.perf_counter() - start, 4),
+                })
+    return rows, summarize(rows)
+
+
+def summarize(rows):
+    """Tổng hợp theo (size, rule)."""
+    table = []
+    for size in dict.fromkeys(r["size"] for r in rows):
+        for rule in dict.fromkeys(r["rule"] for r in rows):
+            group = [r for r in rows if r["size"] == size and r["rule"] == rule]
+            if not group:
+                continue
+            times = [r["time_to_target"] for r in group if r["reached"]]
+            table.append({
+                "size": size,
+                "rule": rule,
+                "runs": len(group),
+                "success_rate": len(times) / len(group),
+                "median_time_to_target": statistics.median(times) if times else None,
+                "mean_time_to_target": statistics.mean(times) if times else None,
+                "mean_final_cost": statistics.mean(r["final_cost"] for r in group),
+            })
+    return table
+
+
+def print_summary(table):
+    print(f"\n{'size':>14} {'rule':>10} {'đạt':>7} {'trung vị (s)':>13} "
+          f"{'trung bình (s)':>15} {'cost cuối TB':>16}")
+    for t in table:
+        med = "-" if t["median_time_to_target"] is None else f"{t['median_time_to_target']:.3f}"
+        mean = "-" if t["mean_time_to_target"] is None else f"{t['mean_time_to_target']:.3f}"
+        print(f"{t['size']:>14} {t['rule']:>10} {t['success_rate']:>7.0%} {med:>13} "
+              f"{mean:>15} {t['mean_final_cost']:>16.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time-to-target của các rule chọn fixed-set trong MFSS")
+    parser.add_argument("--sizes", nargs="+", type=parse_size,
+                        default=[parse_size(s) for s in DEFAULT_SIZES],
+                        help="kích thước instance dạng nIxnJxnK")
+    parser.add_argument("--rules", nargs="+", choices=FIX_RULES, default=list(FIX_RULES),
+                        help="các rule cần so sánh (mặc định: %(default)s)")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0, 1, 2],
+                        help="seed của mfss (mỗi seed 1 lần chạy)")
+    parser.add_argument("--tightness", type=float, default=1.5,
+                        help="tổng capacity / tổng demand (mặc định: %(default)s)")
+    parser.add_argument("--time-budget", type=float, default=60.0,
+                        help="time budget cho mỗi lần chạy mfss (giây)")
+    parser.add_argument("--target-gap", type=float, default=0.01,
+                        help="target = cost tham chiếu * (1 + target_gap)")
+    parser.add_argument("--ref-time-limit", type=float, default=120.0,
+                        help="time limit khi tính cost tham chiếu (giây)")
+    parser.add_argument("--json", help="ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    rows, table = run_benchmark(args.sizes, args.rules, seeds=args.seeds,
+                                tightness=args.tightness, time_budget=args.time_budget,
+                                target_gap=args.target_gap, ref_time_limit=args.ref_time_limit)
+    print_summary(table)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"runs": rows, "summary": table}, fh, indent=4)
+        print(f"✓ Kết quả đã lưu vào: {args.json}")
@@ -4,31 +4,48 @@ Script so sánh hiệu suất giữa Algorithm 1 (Greedy) và Algorithm 2 (MFSS)
 Xuất kết quả ra file JSON và CSV để dễ dàng phân tích.
 """
 
+import argparse
 import json
 import csv
 import time
 from datetime import datetime
-from tscflp_core import build_small_example
+from tscflp_core import build_small_example, get_model, SOLVER_BACKENDS, DEFAULT_BACKEND
+from tscflp_cache import PatternCache
 from greedy_tscflp import greedy_tscflp
 from mfss_tscflp import mfss
+from tscflp_lagrangian import lagrangian_bound, relative_gap
+from tscflp_profile import profiling
+from tscflp_preprocess import get_preprocessed
 
 
-def run_comparison():
-    """Chạy cả hai thuật toán và thu thập metrics"""
+# File cache kết quả các fixed pattern, dùng lại giữa các lần chạy
+CACHE_FILE = "tscflp_cache.json"
+
+
+def run_comparison(cache_path=CACHE_FILE, backend=DEFAULT_BACKEND, preprocess=False):
+    """
+    Chạy cả hai thuật toán và thu thập metrics (backend: solver MILP dùng chung,
+    preprocess: chạy trên instance đã rút gọn, xem tscflp_preprocess.py)
+    """
     
     # Tạo instance
     inst = build_small_example()
     
+    # Cache kết quả solve_full_mip (đọc lại từ các lần chạy trước nếu có)
+    cache = PatternCache(path=cache_path) if cache_path else None
+    
     results = {
         "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "instance_info": {
             "num_primary": len(inst.I),
             "num_secondary": len(inst.J),
             "num_customers": len(inst.K),
-            "total_demand": sum(inst.D)
+            "total_demand": float(inst.D.sum())
         },
         "algorithms": {}
     }
+    if preprocess:
+        results["preprocess"] = get_preprocessed(inst).stats()
     
     # ==================== GREEDY ALGORITHM ====================
     print("="*60)
@@ -36,7 +53,8 @@ def run_comparison():
     print("="*60)
     
     start_time = time.time()
-    greedy_sol = greedy_tscflp(inst, rcl_size=1)
+    greedy_sol = greedy_tscflp(inst, rcl_size=1, cache=cache, backend=backend,
+                               preprocess=preprocess)
     greedy_time = time.time() - start_time
     
     results["algorithms"]["Greedy"] = {
@@ -67,7 +85,10 @@ def run_comparison():
         n_best=5,
         Sizemax=5,
         tinit=1.0,
-        max_iter=20
+        max_iter=20,
+        cache=cache,
+        backend=backend,
+        preprocess=preprocess
     )
     mfss_time = time.time() - start_time
     
@@ -87,6 +108,21 @@ def run_comparison():
     print(f"  Open Secondary: {mfss_sol.open_J}")
     print()
     
+    # ==================== LOWER BOUND / GAP ====================
+    # Cận dưới Lagrangian (tiếp tục từ nhân tử MFSS đã tính), gap của từng thuật toán
+    bound = lagrangian_bound(inst, upper_bound=min(greedy_sol.cost, mfss_sol.cost))
+    results["lower_bound"] = {
+        "method": "lagrangian",
+        "value": bound.lower_bound,
+        "iterations": bound.iterations,
+        "time_seconds": round(bound.time_seconds, 4)
+    }
+    for name, sol in (("Greedy", greedy_sol), ("MFSS", mfss_sol)):
+        gap = relative_gap(sol.cost, bound.lower_bound)
+        results["algorithms"][name]["optimality_gap_percentage"] = round(100 * gap, 4)
+    print(f"Lower bound (Lagrangian): {bound.lower_bound:.4f}")
+    print()
+
     # ==================== COMPARISON METRICS ====================
     cost_diff = greedy_sol.cost - mfss_sol.cost
     cost_improvement_pct = (cost_diff / greedy_sol.cost) * 100 if greedy_sol.cost > 0 else 0
@@ -99,6 +135,20 @@ def run_comparison():
         "greedy_faster": greedy_time < mfss_time
     }
     
+    # Thời gian dựng model MILP (1 lần cho instance) và tổng thời gian giải
+    # (với --preprocess, mọi lần giải đều chạy trên model của instance rút gọn)
+    solved_inst = get_preprocessed(inst).inst if preprocess else inst
+    timing = get_model(solved_inst, backend).timing()
+    results["solver_timing"] = {
+        "backend": backend,
+        "model_build_time_seconds": round(timing["build_time_seconds"], 4),
+        "model_solve_time_seconds": round(timing["solve_time_seconds"], 4),
+        "num_solves": timing["num_solves"]
+    }
+    if cache is not None:
+        results["solver_timing"]["cache"] = cache.stats()
+        cache.save()
+    
     return results
 
 
@@ -127,6 +177,8 @@ def save_results(results):
         comp = results["comparison"]
         
         writer.writerow(['Cost', greedy["cost"], mfss["cost"], comp["cost_difference"]])
+        writer.writerow(['Optimality Gap (%)', greedy["optimality_gap_percentage"],
+                        mfss["optimality_gap_percentage"], ''])
         writer.writerow(['Execution Time (s)', greedy["execution_time_seconds"], 
                         mfss["execution_time_seconds"], comp["time_difference_seconds"]])
         writer.writerow(['Open Primary Facilities', greedy["num_open_primary"], 
@@ -159,6 +211,7 @@ def save_results(results):
         f.write("GREEDY ALGORITHM (Algorithm 1)\n")
         f.write("-"*70 + "\n")
         f.write(f"Cost: {greedy['cost']}\n")
+        f.write(f"Optimality Gap: {greedy['optimality_gap_percentage']}%\n")
         f.write(f"Execution Time: {greedy['execution_time_seconds']} seconds\n")
         f.write(f"Open Primary Facilities: {greedy['open_primary_facilities']}\n")
         f.write(f"Open Secondary Facilities: {greedy['open_secondary_facilities']}\n")
@@ -168,6 +221,7 @@ def save_results(results):
         f.write("MFSS ALGORITHM (Algorithm 2)\n")
         f.write("-"*70 + "\n")
         f.write(f"Cost: {mfss['cost']}\n")
+        f.write(f"Optimality Gap: {mfss['optimality_gap_percentage']}%\n")
         f.write(f"Execution Time: {mfss['execution_time_seconds']} seconds\n")
         f.write(f"Open Primary Facilities: {mfss['open_primary_facilities']}\n")
         f.write(f"Open Secondary Facilities: {mfss['open_secondary_facilities']}\n")
@@ -179,10 +233,24 @@ def save_results(results):
         f.write(f"Cost Difference: {comp['cost_difference']} ")
         f.write(f"({'MFSS better' if comp['cost_difference'] > 0 else 'Greedy better'})\n")
         f.write(f"Cost Improvement: {comp['cost_improvement_percentage']}%\n")
+        f.write(f"Lower Bound (Lagrangian): {results['lower_bound']['value']}\n")
         f.write(f"Better Algorithm: {comp['better_algorithm']}\n")
         f.write(f"Time Difference: {comp['time_difference_seconds']} seconds ")
         f.write(f"({'Greedy faster' if comp['greedy_faster'] else 'MFSS faster'})\n\n")
         
+        f.write("-"*70 + "\n")
+        f.write("SOLVER TIMING\n")
+        f.write("-"*70 + "\n")
+        timing = results["solver_timing"]
+        f.write(f"Backend: {timing.get('backend', DEFAULT_BACKEND)}\n")
+        f.write(f"Model Build Time: {timing['model_build_time_seconds']} seconds\n")
+        f.write(f"Model Solve Time: {timing['model_solve_time_seconds']} seconds ")
+        f.write(f"({timing['num_solves']} solves)\n")
+        if "cache" in timing:
+            f.write(f"Pattern Cache: {timing['cache']['hits']} hits, ")
+            f.write(f"{timing['cache']['misses']} misses\n")
+        f.write("\n")
+        
         f.write("="*70 + "\n")
         
     print(f"✓ Detailed report saved to: {detailed_filename}")
@@ -202,6 +270,8 @@ def print_summary(results):
     print(f"\n{'Metric':<30} {'Greedy':<20} {'MFSS':<20}")
     print("-"*70)
     print(f"{'Cost':<30} {greedy['cost']:<20} {mfss['cost']:<20}")
+    print(f"{'Optimality Gap (%)':<30} {greedy['optimality_gap_percentage']:<20} "
+          f"{mfss['optimality_gap_percentage']:<20}")
     print(f"{'Execution Time (s)':<30} {greedy['execution_time_seconds']:<20} {mfss['execution_time_seconds']:<20}")
     print(f"{'Open Primary Facilities':<30} {greedy['num_open_primary']:<20} {mfss['num_open_primary']:<20}")
     print(f"{'Open Secondary Facilities':<30} {greedy['num_open_secondary']:<20} {mfss['num_open_secondary']:<20}")
@@ -213,10 +283,29 @@ def print_summary(results):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="So sánh Greedy và MFSS")
+    parser.add_argument("--backend", choices=sorted(SOLVER_BACKENDS),
+                        default=DEFAULT_BACKEND,
+                        help="solver MILP cho subproblem (mặc định: %(default)s)")
+    parser.add_argument("--profile", metavar="TRACE_JSON",
+                        help="đo thời gian từng pha + counter, ghi Chrome trace ra file")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="kèm peak memory (tracemalloc) khi --profile")
+    parser.add_argument("--preprocess", action="store_true",
+                        help="rút gọn instance trước (facility bị trội / bắt buộc mở, ...)")
+    args = parser.parse_args()
+
     print("Starting algorithm comparison...\n")
     
     # Run comparison
-    results = run_comparison()
+    if args.profile:
+        with profiling(memory=args.profile_memory) as prof:
+            results = run_comparison(backend=args.backend, preprocess=args.preprocess)
+        results["profile"] = prof.summary()
+        prof.save(args.profile)
+        print(f"✓ Profile trace đã lưu vào: {args.profile}")
+    else:
+        results = run_comparison(backend=args.backend, preprocess=args.preprocess)
     
     # Save results to files
     save_results(results)
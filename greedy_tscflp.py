@@ -6,138 +6,279 @@ Cài đặt Algorithm 1: Greedy Algorithm for the TSCFLP.
   + chọn dần các primary (nhà máy) theo heuristic h_p(i, S)
   + với mỗi primary, chọn các secondary (kho) theo h_s(i, j, S)
   + với mỗi secondary, gán cho các khách có chi phí d_jk nhỏ nhất
-- Sau khi đã chọn tập facility, gọi lại MILP để tối ưu luồng (SolveMinCostFlow)
+- Sau khi đã chọn tập facility, tối ưu luồng (SolveMinCostFlow): mọi facility
+  đều bị fix nên solve_full_mip giải bằng min-cost flow (tscflp_flow.py), không gọi CBC
 """
 
 import random
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 import numpy as np
 
-from tscflp_core import TSCFLPInstance, Solution, solve_full_mip, build_small_example
+from tscflp_core import (TSCFLPInstance, Solution, solve_full_mip, build_small_example,
+                         DEFAULT_BACKEND)
+from tscflp_profile import span
+from tscflp_localsearch import improve_solution
+from tscflp_preprocess import get_preprocessed
 
+EPS = 1e-6   # ngưỡng coi capacity / demand còn lại là 0 (giống Algorithm 1)
 
-def greedy_tscflp(inst: TSCFLPInstance, rcl_size: int = 1) -> Solution:
+
+def rcl_pick(idx: np.ndarray, scores: np.ndarray, rcl_size: int, rng=random) -> int:
     """
-    Cài đặt gần sát Algorithm 1 trong paper.
+    Chọn 1 phần tử trong RCL (Restricted Candidate List).
 
-    Parameters
-    ----------
-    inst : TSCFLPInstance
-        Instance bài toán.
-    rcl_size : int
-        - Nếu rcl_size = 1  -> thuần greedy (luôn chọn ứng viên tốt nhất).
-        - Nếu rcl_size > 1  -> dùng RCL (Restricted Candidate List):
-                              chọn ngẫu nhiên trong top rcl_size ứng viên tốt nhất.
-                              Dùng khi cần randomization để sinh nhiều lời giải khác nhau
-                              (ví dụ dùng cho population khởi tạo của MFSS).
+    idx    : các ứng viên (theo thứ tự tăng dần)
+    scores : giá trị heuristic tương ứng (càng nhỏ càng tốt)
 
-    Returns
-    -------
-    Solution
-        Lời giải (pattern facility mở + cost) sau khi giải lại MILP để tối ưu luồng.
+    Lấy top rcl_size ứng viên theo (score, thứ tự trong idx) bằng argpartition
+    (không sort toàn bộ), rồi chọn ngẫu nhiên 1 phần tử bằng rng.choice.
+    Thứ tự RCL giống hệt sorted(..., key=score) nên cùng seed cho cùng kết quả.
     """
-    I, J, K = inst.I, inst.J, inst.K
-    f, g, U0, V0, D0 = inst.f, inst.g, inst.U, inst.V, inst.D
-    c, d = inst.c, inst.d
+    r = max(1, min(rcl_size, len(idx)))
+    if r < len(idx):
+        kth = scores[np.argpartition(scores, r - 1)[:r]].max()
+        keep = scores <= kth            # giữ cả các phần tử bằng điểm (tie) ở biên
+        idx, scores = idx[keep], scores[keep]
+    top = np.argsort(scores, kind='stable')[:r]
+    return rng.choice(idx[top].tolist())
+
 
-    # Copy capacity/demand vì chúng ta sẽ giảm dần trong quá trình xây dựng lời giải
-    U = U0.copy()   # capacity còn lại của nhà máy
-    V = V0.copy()   # capacity còn lại của kho
-    D = D0.copy()   # demand còn lại của khách
+class GreedyConstructor:
+    """
+    Phần dữ liệu của Algorithm 1 chỉ phụ thuộc vào instance, tính 1 lần
+    rồi dùng lại cho mọi lần dựng lời giải (xem get_constructor):
 
-    total_demand = sum(D)
+    - fU[i] = f_i / U_i,  gV[j] = g_j / V_j  (phần cố định của h_p, h_s)
+    - thứ tự khách hàng của từng kho theo d_jk tăng dần (argsort của d[j]),
+      chỉ tính khi kho j được chọn lần đầu
+    """
 
-    selected_I = set()  # nhà máy được chọn
-    selected_J = set()  # kho được chọn
+    def __init__(self, inst: TSCFLPInstance):
+        self.inst = inst
+        self.c = np.asarray(inst.c, dtype=np.float64)
+        # d có thể là LazyCostMatrix (tscflp_lazy.py): chỉ lấy từng hàng / cột khi cần
+        self.d = (np.asarray(inst.d, dtype=np.float64)
+                  if isinstance(inst.d, np.ndarray) else inst.d)
+        self.U0 = np.asarray(inst.U, dtype=np.float64)
+        self.V0 = np.asarray(inst.V, dtype=np.float64)
+        self.D0 = np.asarray(inst.D, dtype=np.float64)
+        self.fU = np.asarray(inst.f, dtype=np.float64) / (self.U0 + 1e-9)
+        self.gV = np.asarray(inst.g, dtype=np.float64) / (self.V0 + 1e-9)
+        self.total_demand = sum(self.D0.tolist())
+        # Tổng d_jk trên các khách có demand > 0 (giá trị đầu của running sum)
+        if isinstance(self.d, np.ndarray):
+            self.d_sum0 = self.d[:, self.D0 > 0].sum(axis=1)
+        else:
+            self.d_sum0 = self.d.masked_row_sums(self.D0 > 0)
+        self._orders: Dict[int, np.ndarray] = {}
 
-    # Tập khách hàng chưa được đáp ứng hoàn toàn
-    unmet_customers = set(k for k in K if D[k] > 0)
+    def customer_order(self, j: int) -> np.ndarray:
+        """Mảng khách sắp theo d_jk tăng dần (ổn định theo chỉ số khi bằng nhau)."""
+        order = self._orders.get(j)
+        if order is None:
+            order = np.argsort(self.d[j], kind='stable').astype(np.int32)
+            self._orders[j] = order
+        return order
 
-    def choose_with_rcl(scores: List[Tuple[int, float]], rcl_sz: int):
+    def construct(self, rcl_size: int = 1, rng=random) -> Tuple[List[int], List[int]]:
         """
-        scores: list[(index, heuristic_value)].
-        Sắp xếp tăng dần theo heuristic_value,
-        lấy top rcl_sz phần tử tốt nhất, rồi chọn ngẫu nhiên 1 phần tử trong đó.
+        Dựng 1 lời giải theo Algorithm 1, trả về pattern (open_I, open_J).
+
+        Các trung bình trong h_p, h_s được giữ bằng tổng chạy (running sum):
+            sum_c[i] = tổng c_ij trên các kho còn capacity
+            sum_d[j] = tổng d_jk trên các khách chưa được đáp ứng
+        và chỉ trừ đi 1 cột khi 1 kho hết capacity / 1 khách được đáp ứng đủ.
         """
-        scores = sorted(scores, key=lambda x: x[1])
-        rcl = scores[:max(1, min(rcl_sz, len(scores)))]
-        return random.choice(rcl)[0]
-
-    # ----------------- Vòng lặp chính: while T > 0 trong Algorithm 1 -----------------
-    while total_demand > 1e-6:
-        # ======== 1) Chọn primary facility i (dòng 4 trong pseudocode) ========
-        cand_I = [i for i in I if U[i] > 1e-6]   # chỉ xét những nhà máy còn capacity
-        if not cand_I:
-            raise RuntimeError("Không đủ capacity primary để đáp ứng demand")
-
-        # J_available: những kho còn capacity, dùng để tính avg cost trong h_p
-        J_available = [j for j in J if V[j] > 1e-6]
-
-        scores_i = []
-        for i in cand_I:
+        c, d = self.c, self.d
+        nI, nJ = c.shape
+
+        # Copy capacity/demand vì chúng ta sẽ giảm dần trong quá trình xây dựng lời giải
+        U = self.U0.copy()   # capacity còn lại của nhà máy
+        V = self.V0.copy()   # capacity còn lại của kho
+        D = self.D0.tolist()  # demand còn lại của khách (list: truy cập từng phần tử nhanh hơn)
+        total_demand = self.total_demand
+
+        selected_I = np.zeros(nI, dtype=int)
+        selected_J = np.zeros(nJ, dtype=int)
+
+        # Kho còn capacity + tổng chạy c_ij trên các kho đó
+        avail_J = V > EPS
+        n_avail = int(avail_J.sum())
+        sum_c = c[:, avail_J].sum(axis=1)
+
+        # Khách chưa được đáp ứng hoàn toàn + tổng chạy d_jk trên các khách đó
+        unmet = self.D0 > 0
+        n_unmet = int(unmet.sum())
+        sum_d = self.d_sum0.copy()
+        # khách vừa được đáp ứng đủ nhưng chưa trừ khỏi sum_d (trừ gộp trước
+        # lần dùng sum_d kế tiếp; với d dạng LazyCostMatrix chỉ tính 1 khối)
+        met = []
+        dense_d = isinstance(d, np.ndarray)
+        # Thứ tự khách của từng kho (bản sao riêng, được nén bớt khách đã hết demand)
+        # và con trỏ head: mọi khách đứng trước head đều đã hết demand
+        orders: Dict[int, List[int]] = {}
+        head = [0] * nJ
+
+        all_I = np.arange(nI)
+        rcl_k = max(1, rcl_size)
+
+        # ----------------- Vòng lặp chính: while T > 0 trong Algorithm 1 -----------------
+        while total_demand > EPS:
+            # ======== 1) Chọn primary facility i (dòng 4 trong pseudocode) ========
+            cand_I = all_I[U > EPS]   # chỉ xét những nhà máy còn capacity
+            if len(cand_I) == 0:
+                raise RuntimeError("Không đủ capacity primary để đáp ứng demand")
+
             # hp(i, S) = f_i / U_i + average(chi phí i -> các kho còn dùng được)
-            avg_c = np.mean([c[i][j] for j in J_available]) if J_available else 0.0
-            hp = f[i] / (U0[i] + 1e-9) + avg_c
-            scores_i.append((i, hp))
-
-        i_star = choose_with_rcl(scores_i, rcl_size)
-        selected_I.add(i_star)
-
-        # U_used = lượng capacity của i_star dùng để đáp ứng một phần tổng demand T
-        U_used = min(total_demand, U[i_star])
-        U[i_star] -= U_used
-        remaining_from_i = U_used
-        total_demand -= U_used
-
-        # ======== 2) Chọn lần lượt các secondary facility j (dòng 10) ========
-        while remaining_from_i > 1e-6:
-            cand_J = [j for j in J if V[j] > 1e-6]
-            if not cand_J:
-                raise RuntimeError("Không đủ capacity secondary để nhận hàng")
-
-            scores_j = []
-            for j in cand_J:
+            avg_c = sum_c[cand_I] / n_avail if n_avail else 0.0
+            hp = self.fU[cand_I] + avg_c
+            i_star = rcl_pick(cand_I, hp, rcl_size, rng)
+            selected_I[i_star] = 1
+
+            # U_used = lượng capacity của i_star dùng để đáp ứng một phần tổng demand T
+            U_used = min(total_demand, U[i_star])
+            U[i_star] -= U_used
+            remaining_from_i = U_used
+            total_demand -= U_used
+
+            # ======== 2) Chọn lần lượt các secondary facility j (dòng 10) ========
+            while remaining_from_i > EPS:
+                cand_J = np.flatnonzero(avail_J)
+                if len(cand_J) == 0:
+                    raise RuntimeError("Không đủ capacity secondary để nhận hàng")
+
+                if met:
+                    if dense_d:
+                        for k in met:
+                            sum_d -= d[:, k]
+                    else:
+                        sum_d -= d[:, met].sum(axis=1)
+                    met = []
+
                 # hs(i,j,S) = c_ij + g_j / V_j + avg(d_jk) với các khách chưa được phục vụ
-                avg_d = np.mean([d[j][k] for k in unmet_customers]) if unmet_customers else 0.0
-                hs = c[i_star][j] + g[j] / (V0[j] + 1e-9) + avg_d
-                scores_j.append((j, hs))
+                avg_d = sum_d[cand_J] / n_unmet if n_unmet else 0.0
+                hs = c[i_star, cand_J] + self.gV[cand_J] + avg_d
+                j_star = rcl_pick(cand_J, hs, rcl_size, rng)
+                selected_J[j_star] = 1
+
+                # V_used = lượng hàng từ i_star chuyển sang kho j_star (không quá capacity V[j_star])
+                V_used = min(remaining_from_i, V[j_star])
+                V[j_star] -= V_used
+                remaining_from_i -= V_used
+                if V[j_star] <= EPS:
+                    avail_J[j_star] = False
+                    n_avail -= 1
+                    sum_c -= c[:, j_star]
+
+                remaining_from_j = V_used
+
+                # ======== 3) Gán hàng từ kho j_star cho các khách k (dòng 15) ========
+                order = orders.get(j_star)
+                if order is None:
+                    # chỉ giữ các khách còn demand (thứ tự giữ nguyên)
+                    full = self.customer_order(j_star)
+                    order = orders[j_star] = full[unmet[full]].tolist()
+                while remaining_from_j > EPS:
+                    # bỏ qua các khách đầu danh sách đã hết demand
+                    p, n = head[j_star], len(order)
+                    while p < n and D[order[p]] <= EPS:
+                        p += 1
+                    head[j_star] = p
+
+                    # RCL = rcl_size khách còn demand có d_jk nhỏ nhất
+                    rcl = []
+                    skipped = 0
+                    while p < n and len(rcl) < rcl_k:
+                        k = order[p]
+                        if D[k] > EPS:
+                            rcl.append(k)
+                        else:
+                            skipped += 1
+                        p += 1
+                    if not rcl:
+                        break
+                    if skipped > 16:
+                        # quá nhiều khách đã hết demand nằm xen giữa -> nén danh sách
+                        order = orders[j_star] = [k for k in order[head[j_star]:] if D[k] > EPS]
+                        head[j_star] = 0
+                    k_star = rng.choice(rcl)
 
-            j_star = choose_with_rcl(scores_j, rcl_size)
-            selected_J.add(j_star)
+                    # lượng giao cho khách k_star
+                    amount = min(remaining_from_j, D[k_star])
+                    D[k_star] -= amount
+                    remaining_from_j -= amount
 
-            # V_used = lượng hàng từ i_star chuyển sang kho j_star (không quá capacity V[j_star])
-            V_used = min(remaining_from_i, V[j_star])
-            V[j_star] -= V_used
-            remaining_from_i -= V_used
+                    if D[k_star] <= EPS and unmet[k_star]:
+                        unmet[k_star] = False
+                        n_unmet -= 1
+                        met.append(k_star)
 
-            remaining_from_j = V_used
+        return selected_I.tolist(), selected_J.tolist()
 
-            # ======== 3) Gán hàng từ kho j_star cho các khách k (dòng 15) ========
-            while remaining_from_j > 1e-6:
-                # chỉ xem các khách còn nhu cầu
-                cand_K = [k for k in unmet_customers if D[k] > 1e-6]
-                if not cand_K:
-                    break
 
-                # hc(j,k) = d_jk (chi phí vận chuyển kho -> khách)
-                scores_k = [(k, d[j_star][k]) for k in cand_K]
-                k_star = choose_with_rcl(scores_k, rcl_size)
+def get_constructor(inst: TSCFLPInstance) -> GreedyConstructor:
+    """Lấy GreedyConstructor của instance (chỉ tính ở lần gọi đầu tiên)."""
+    return inst.get_cached("greedy_constructor", GreedyConstructor)
 
-                # lượng giao cho khách k_star
-                amount = min(remaining_from_j, D[k_star])
-                D[k_star] -= amount
-                remaining_from_j -= amount
 
-                if D[k_star] <= 1e-6 and k_star in unmet_customers:
-                    unmet_customers.remove(k_star)
+def greedy_tscflp(inst: TSCFLPInstance, rcl_size: int = 1, cache=None,
+                  rng=None, backend: str = DEFAULT_BACKEND,
+                  local_search: bool = False, preprocess: bool = False) -> Solution:
+    """
+    Cài đặt gần sát Algorithm 1 trong paper.
+
+    Phần dựng lời giải nằm trong GreedyConstructor.construct (tổng chạy,
+    thứ tự khách tính sẵn, RCL bằng argpartition).
+
+    Parameters
+    ----------
+    inst : TSCFLPInstance
+        Instance bài toán.
+    rcl_size : int
+        - Nếu rcl_size = 1  -> thuần greedy (luôn chọn ứng viên tốt nhất).
+        - Nếu rcl_size > 1  -> dùng RCL (Restricted Candidate List):
+                              chọn ngẫu nhiên trong top rcl_size ứng viên tốt nhất.
+                              Dùng khi cần randomization để sinh nhiều lời giải khác nhau
+                              (ví dụ dùng cho population khởi tạo của MFSS).
+    cache : PatternCache, optional
+        Cache kết quả solve_full_mip theo pattern (xem tscflp_cache.py).
+    rng : random.Random, optional
+        Nguồn ngẫu nhiên cho RCL (mặc định: module random toàn cục).
+    backend : str
+        Backend của solve_full_mip (pattern đã fix toàn bộ nên thường chỉ
+        giải min-cost flow, không gọi tới backend).
+    local_search : bool
+        True: cải thiện thêm lời giải greedy bằng local search open / close /
+        swap (xem tscflp_localsearch.py), không gọi solver MILP.
+    preprocess : bool
+        True: chạy trên instance đã rút gọn (xem tscflp_preprocess.py), lời
+        giải trả về theo chỉ số và cost của instance gốc.
+
+    Returns
+    -------
+    Solution
+        Lời giải (pattern facility mở + cost) sau khi tối ưu luồng cho pattern đó.
+    """
+    if preprocess:
+        pre = get_preprocessed(inst)
+        return pre.expand(greedy_tscflp(pre.inst, rcl_size=rcl_size, cache=cache, rng=rng,
+                                        backend=backend, local_search=local_search))
+
+    constructor = get_constructor(inst)
+    with span("greedy.construct"):
+        open_I, open_J = constructor.construct(rcl_size, rng=rng or random)
 
     # ----------------- Bước cuối: SolveMinCostFlow(S) -----------------
-    # Sau khi quyết định tập facility mở/đóng, ta giải lại MILP để tìm luồng tối ưu
+    # Sau khi quyết định tập facility mở/đóng, ta tìm luồng tối ưu
+    # (fix toàn bộ x_i, y_j -> solve_full_mip chỉ giải min-cost flow)
     fixed = {
-        'I': {i: (1 if i in selected_I else 0) for i in I},
-        'J': {j: (1 if j in selected_J else 0) for j in J},
+        'I': dict(enumerate(open_I)),
+        'J': dict(enumerate(open_J)),
     }
-    sol = solve_full_mip(inst, fixed=fixed)
+    sol = solve_full_mip(inst, fixed=fixed, cache=cache, backend=backend)
+    if local_search:
+        with span("greedy.local_search"):
+            sol = improve_solution(inst, sol)
     return sol
 
 
@@ -12,19 +12,47 @@ Luồng chính:
   + Gọi solver MILP với fixed-set F để tìm lời giải mới S_new.
   + Nếu S_new tốt hơn best hiện tại và chưa trùng pattern -> thêm vào P.
   + Nếu bị "kẹt" nhiều vòng không cải thiện -> tăng time limit.
+- Cận dưới Lagrangian (tscflp_lagrangian.py) dùng để báo gap tới tối ưu và
+  dừng sớm khi gap <= gap_tol.
+- Chế độ anytime: time_budget (giây), target_cost, và luồng sự kiện cải
+  thiện (elapsed, iteration, cost, pattern) qua mfss_iter (generator) hoặc
+  callback của mfss; người gọi có thể dừng sớm bất cứ lúc nào.
+- Checkpoint định kỳ (checkpoint_path) và tiếp tục đúng chỗ đã dừng
+  (resume_from), xem tscflp_checkpoint.py.
+- Trước khi gọi solver, các fixed-set của 1 lượt được sàng lọc (tscflp_screen.py):
+  không đủ capacity hoặc cận dưới rẻ >= cost của best thì bỏ qua.
 """
 
 import random
-from typing import List
+import time
+from typing import Callable, Generator, List, NamedTuple, Optional, Tuple
 
-from tscflp_core import TSCFLPInstance, Solution, solve_full_mip, build_small_example
-from greedy_tscflp import greedy_tscflp
+import numpy as np
+
+from tscflp_core import (TSCFLPInstance, Solution, solve_full_mip, build_small_example,
+                         DEFAULT_BACKEND)
+from tscflp_population import build_population, build_population_batched
+from tscflp_parallel import SubproblemPool
+from tscflp_lagrangian import LagrangianBound, lagrangian_bound
+from tscflp_cache import PatternCache
+from tscflp_localsearch import improve_solution
+from tscflp_patterns import PatternIndex, SubproblemMemory
+from tscflp_lp import get_lp_relaxation
+from tscflp_screen import get_screen
+from tscflp_preprocess import get_preprocessed
+from tscflp_checkpoint import SearchState, save_checkpoint, load_checkpoint
+from tscflp_profile import span, count
+
+# Các cách xếp hạng facility trong build_fixed_set
+FIX_RULES = ("frequency", "lp")
 
 
 def build_fixed_set(base: Solution,
                     Skn: List[Solution],
                     Size: int,
-                    inst: TSCFLPInstance):
+                    inst: TSCFLPInstance,
+                    rng=random,
+                    rule: str = "frequency"):
     """
     Xây fixed set F giống ý tưởng trong bài:
 
@@ -39,21 +67,40 @@ def build_fixed_set(base: Solution,
     Điều này phản ánh ý tưởng:
       "những pattern hay xuất hiện trong nhiều lời giải tốt thì có khả năng là 'tốt',
        nên ta giữ cố định chúng và chỉ tối ưu phần còn lại."
+
+    rule = "lp": xếp hạng trước hết theo relaxation LP của instance (giải 1 lần,
+    xem tscflp_lp.py), chia 3 mức: LP chắc chắn mở / đóng đúng như base
+    (x_i, y_j nguyên) -> fix trước; LP phân số nhưng làm tròn giống base;
+    LP làm tròn ngược với base -> fix sau cùng. Trong cùng 1 mức vẫn xếp theo
+    tần suất và random khi bằng điểm, để F không lặp lại giữa các lượt.
     """
+    if rule not in FIX_RULES:
+        raise ValueError(f"rule phải là một trong {FIX_RULES}, nhận được {rule!r}")
     I, J = inst.I, inst.J
+    # Giải nén pattern 1 lần (open_I / open_J của Solution được lưu dạng bit)
+    base_I, base_J = base.open_I, base.open_J
+    sk_I = [S.open_I for S in Skn]
+    sk_J = [S.open_J for S in Skn]
 
     scores = []  # mỗi phần tử: (score, ('I', i) or ('J', j))
 
     # Đánh điểm cho các nhà máy
     for i in I:
-        cnt = sum(1 for S in Skn if S.open_I[i] == base.open_I[i])
+        cnt = sum(1 for oI in sk_I if oI[i] == base_I[i])
         scores.append((cnt, ('I', i)))
 
     # Đánh điểm cho các kho
     for j in J:
-        cnt = sum(1 for S in Skn if S.open_J[j] == base.open_J[j])
+        cnt = sum(1 for oJ in sk_J if oJ[j] == base_J[j])
         scores.append((cnt, ('J', j)))
 
+    if rule == "lp":
+        # mức LP: 2 = chắc chắn giống base (confidence >= 1), 1 = giống base, 0 = ngược
+        lp_I, lp_J = get_lp_relaxation(inst).agreement(base_I, base_J)
+        lp_score = np.concatenate((lp_I, lp_J))
+        tier = ((lp_score > 0).astype(int) + (lp_score >= 1 - 1e-9)).tolist()
+        scores = [((t, cnt), key) for t, (cnt, key) in zip(tier, scores)]
+
     # Sắp xếp giảm dần theo score (tần suất)
     scores.sort(key=lambda x: x[0], reverse=True)
 
@@ -70,26 +117,345 @@ def build_fixed_set(base: Solution,
         tied = [s for s in scores if s[0] == cutoff]
         needed = Size - len(prefix)
         # random lấy "needed" phần tử trong group tie
-        chosen = prefix + random.sample(tied, needed)
+        chosen = prefix + rng.sample(tied, needed)
 
     # Chuyển thành dict fixed-set cho solver
     fixed_I = {}
     fixed_J = {}
     for _, (typ, idx) in chosen:
         if typ == 'I':
-            fixed_I[idx] = base.open_I[idx]
+            fixed_I[idx] = base_I[idx]
         else:
-            fixed_J[idx] = base.open_J[idx]
+            fixed_J[idx] = base_J[idx]
 
     return {'I': fixed_I, 'J': fixed_J}
 
 
+class ImprovementEvent(NamedTuple):
+    """
+    1 lần MFSS tìm được lời giải tốt hơn (xem mfss_iter).
+
+    elapsed   : số giây từ lúc bắt đầu mfss
+    iteration : số subproblem đã giải (0 = lời giải tốt nhất của population ban đầu)
+    cost      : cost của lời giải mới
+    pattern   : (open_I, open_J)
+    """
+    elapsed: float
+    iteration: int
+    cost: float
+    pattern: Tuple[List[int], List[int]]
+
+
+def mfss_iter(inst: TSCFLPInstance,
+              Npop: int = 10,
+              n_best: int = 5,
+              Sizemax: int = 10,
+              tinit: float = 1.0,
+              max_iter: int = 50,
+              cache=None,
+              batch_init: bool = False,
+              workers: int = 1,
+              round_size: Optional[int] = None,
+              seed: Optional[int] = 0,
+              backend: str = DEFAULT_BACKEND,
+              gap_tol: Optional[float] = None,
+              lb_iter: int = 200,
+              time_budget: Optional[float] = None,
+              target_cost: Optional[float] = None,
+              checkpoint_path: Optional[str] = None,
+              checkpoint_every: int = 10,
+              resume_from: Optional[str] = None,
+              local_search: bool = False,
+              fix_rule: str = "frequency",
+              preprocess: bool = False
+              ) -> Generator[ImprovementEvent, None, Solution]:
+    """
+    MFSS dạng generator: yield 1 ImprovementEvent mỗi khi best được cải thiện
+    (kể cả lời giải tốt nhất của population ban đầu, hoặc best lúc tiếp tục
+    từ checkpoint), return Solution tốt nhất khi dừng. Tham số giống mfss.
+
+    Người gọi có thể dừng bất cứ lúc nào (break / close()): pool worker vẫn
+    được đóng. Ví dụ:
+        for ev in mfss_iter(inst, time_budget=30):
+            print(ev.elapsed, ev.cost)
+            if ev.cost <= good_enough:
+                break
+    """
+    if preprocess:
+        # Chạy trên instance đã rút gọn; event / kết quả đổi về instance gốc
+        pre = get_preprocessed(inst)
+        print("Preprocess:", pre.stats())
+        search = mfss_iter(pre.inst, Npop=Npop, n_best=n_best, Sizemax=Sizemax,
+                           tinit=tinit, max_iter=max_iter, cache=cache,
+                           batch_init=batch_init, workers=workers, round_size=round_size,
+                           seed=seed, backend=backend, gap_tol=gap_tol, lb_iter=lb_iter,
+                           time_budget=time_budget,
+                           target_cost=None if target_cost is None else target_cost - pre.offset,
+                           checkpoint_path=checkpoint_path,
+                           checkpoint_every=checkpoint_every, resume_from=resume_from,
+                           local_search=local_search, fix_rule=fix_rule)
+        try:
+            while True:
+                try:
+                    ev = next(search)
+                except StopIteration as stop:
+                    return pre.expand(stop.value)
+                yield ev._replace(cost=ev.cost + pre.offset,
+                                  pattern=pre.expand_pattern(*ev.pattern))
+        finally:
+            search.close()
+
+    start = time.perf_counter()
+    rng = random.Random(seed)
+
+    # Tiếp tục từ checkpoint: thời gian đã chạy vẫn tính vào time_budget
+    state = load_checkpoint(resume_from, inst) if resume_from is not None else None
+    if state is not None:
+        start -= state.elapsed
+        rng.setstate(state.rng_state)
+        if state.cache_entries:
+            if cache is None:
+                cache = PatternCache()
+            cache.load_entries(state.cache_entries)
+
+    def remaining() -> float:
+        if time_budget is None:
+            return float('inf')
+        return time_budget - (time.perf_counter() - start)
+
+    # Pool giải song song (chỉ tạo khi workers > 1)
+    pool = (SubproblemPool(inst, workers, cache=cache, backend=backend)
+            if workers > 1 else None)
+    per_round = 1 if pool is None else max(1, round_size or workers)
+
+    # ---------- 1) Khởi tạo population P bằng randomized greedy ----------
+    # RCL size = 2 => tạo ra nhiều lời giải khác nhau
+    # Các subproblem (F, tau) đã giải: gặp lại thì trả lời từ bộ nhớ
+    memory = SubproblemMemory()
+    if state is not None and state.memory_entries:
+        memory.load_entries(state.memory_entries)
+    # Sàng lọc fixed-set trước khi gọi solver (capacity + cận dưới so với best)
+    screen = get_screen(inst)
+    screen_start = screen.stats()
+
+    def polish(sol: Solution) -> Solution:
+        """Local search từ sol; lời giải tốt hơn (pattern mới) được thêm vào P."""
+        with span("mfss.local_search"):
+            better = improve_solution(inst, sol)
+        if better is sol or better in index:
+            return sol
+        P.append(better)
+        index.add(better)
+        count("mfss.local_search_improvements")
+        print(f"[Iter {it}] Local search: cost = {better.cost:.4f}")
+        return better
+
+    try:
+        if state is None:
+            with span("mfss.population", size=Npop):
+                if batch_init:
+                    P = build_population_batched(inst, Npop, rcl_size=2, seed=seed,
+                                                 cache=cache, pool=pool)
+                else:
+                    P = build_population(inst, Npop, rcl_size=2, seed=seed,
+                                         cache=cache, pool=pool)
+
+            # tau = time limit hiện tại cho MILP
+            tau = tinit
+            # Chỉ mục băm các pattern trong P (kiểm tra trùng O(1))
+            index = PatternIndex(P)
+            # Lời giải tốt nhất hiện tại
+            best_sol = min(P, key=lambda s: s.cost)
+            stag = 0  # đếm số vòng không cải thiện (stagnation)
+            it = 0
+            if local_search:
+                best_sol = polish(best_sol)
+        else:
+            P = state.population
+            index = PatternIndex(P)
+            best_sol = P[state.best_index]
+            tau, stag, it = state.tau, state.stag, state.iteration
+            print(f"Tiếp tục từ checkpoint {resume_from}: {it} subproblem, "
+                  f"best cost = {best_sol.cost:.4f}")
+
+        # Số facility total
+        total_fac = len(inst.I) + len(inst.J)
+        # Số biến sẽ bị fix = total_fac - Sizemax
+        Size = min(total_fac - 1, total_fac - Sizemax)  # bảo đảm dương
+
+        def event(iteration: int) -> ImprovementEvent:
+            return ImprovementEvent(time.perf_counter() - start, iteration, best_sol.cost,
+                                    (list(best_sol.open_I), list(best_sol.open_J)))
+
+        def save_state():
+            engine = inst.get_cached("lagrangian", LagrangianBound) if lb_iter > 0 else None
+            save_checkpoint(checkpoint_path, inst, SearchState(
+                population=P, best_index=next(n for n, s in enumerate(P) if s is best_sol),
+                tau=tau, stag=stag, iteration=it, rng_state=rng.getstate(), gap=gap,
+                elapsed=time.perf_counter() - start,
+                lagrangian=engine.get_state() if engine is not None else None,
+                cache_entries=cache.entries() if cache is not None else None,
+                memory_entries=memory.entries()))
+
+        yield event(it)
+
+        # Cận dưới Lagrangian -> gap của best hiện tại
+        gap = None
+        if state is not None:
+            if state.lagrangian is not None and lb_iter > 0:
+                inst.get_cached("lagrangian", LagrangianBound).set_state(state.lagrangian)
+                gap = state.gap
+        elif lb_iter > 0:
+            with span("mfss.lagrangian"):
+                bound = lagrangian_bound(inst, upper_bound=best_sol.cost,
+                                         max_iter=lb_iter, gap_tol=gap_tol)
+            gap = bound.gap
+            print(f"Lower bound (Lagrangian) = {bound.lower_bound:.4f}, "
+                  f"gap = {100 * gap:.2f}%")
+
+        def done() -> bool:
+            return ((gap_tol is not None and gap is not None and gap <= gap_tol) or
+                    (target_cost is not None and best_sol.cost <= target_cost) or
+                    remaining() <= 0)
+
+        # ---------- 2) Vòng lặp học Fixed Set Search ----------
+        last_saved = it
+        while it < max_iter and not done():
+            # Sắp xếp P theo cost tăng dần, lấy top n_best
+            P.sort(key=lambda s: s.cost)
+            Sn = P[:min(n_best, len(P))]
+
+            # Rút các fixed-set của lượt này (tuần tự: 1 fixed-set / lượt)
+            fixed_sets, bases = [], []
+            for _ in range(min(per_round, max_iter - it)):
+                # Chọn base solution B ngẫu nhiên trong top-n
+                B = rng.choice(Sn)
+
+                # Chọn k lời giải từ Sn để tạo Skn (k ngẫu nhiên)
+                k = rng.randint(2, max(2, len(Sn)))
+                Skn = rng.sample(Sn, k=k)
+
+                # Xây fixed set F dựa trên B và Skn
+                with span("mfss.build_fixed_set"):
+                    fixed_sets.append(build_fixed_set(B, Skn, Size, inst, rng,
+                                                      rule=fix_rule))
+                bases.append(B)
+
+            # Giải MILP với các fixed-set F, time limit = tau (không vượt quá
+            # thời gian còn lại của time_budget).
+            # B luôn thỏa fixed-set của chính nó -> dùng làm MIP start (incumbent)
+            # F đã giải với time limit >= limit thì lấy kết quả từ bộ nhớ.
+            # F không đủ capacity hoặc có cận dưới >= best thì bỏ qua (kết quả None).
+            limit = min(tau, remaining())
+            results = [memory.get(inst, F, limit) for F in fixed_sets]
+            todo = [n for n, sol in enumerate(results) if sol is None]
+            with span("mfss.screen", size=len(todo)):
+                reasons = screen.screen_many([fixed_sets[n] for n in todo],
+                                             upper_bound=best_sol.cost)
+            todo = [n for n, reason in zip(todo, reasons) if reason is None]
+            count("mfss.subproblems_skipped", len(fixed_sets) - len(todo))
+            with span("mfss.solve_round", size=len(todo), time_limit=limit):
+                if pool is None:
+                    solved = [solve_full_mip(inst, time_limit=limit, fixed=fixed_sets[n],
+                                             cache=cache, backend=backend,
+                                             warm_start=bases[n])
+                              for n in todo]
+                else:
+                    solved = pool.solve_many([fixed_sets[n] for n in todo], time_limit=limit,
+                                             warm_starts=[bases[n] for n in todo])
+            for n, sol in zip(todo, solved):
+                memory.put(inst, fixed_sets[n], limit, sol)
+                results[n] = sol
+
+            # Gộp kết quả theo đúng thứ tự rút
+            improved = False
+            for S_new in results:
+                # Kiểm tra xem S_new đã tồn tại trong P chưa
+                # (S_new = None: bị loại ở bước sàng lọc, chắc chắn không tốt hơn best)
+                exists = S_new is not None and S_new in index
+                if exists:
+                    count("mfss.duplicate_patterns")
+
+                # Nếu mới + tốt hơn best_sol thì update
+                if S_new is not None and not exists and S_new.cost < best_sol.cost - 1e-6:
+                    P.append(S_new)
+                    index.add(S_new)
+                    best_sol = S_new
+                    stag = 0
+                    improved = True
+                    count("mfss.improvements")
+                    if local_search:
+                        best_sol = polish(best_sol)
+                    if lb_iter > 0:
+                        with span("mfss.lagrangian"):
+                            gap = lagrangian_bound(inst, upper_bound=best_sol.cost,
+                                                   max_iter=lb_iter // 4, gap_tol=gap_tol).gap
+                        print(f"[Iter {it}] Improved solution: cost = {best_sol.cost:.4f}, "
+                              f"gap = {100 * gap:.2f}%")
+                    else:
+                        print(f"[Iter {it}] Improved solution: cost = {best_sol.cost:.4f}")
+                else:
+                    stag += 1
+
+                # Nếu 5 vòng không cải thiện: tăng time limit lên 2x
+                # (gần giống ý tưởng paper tăng τ khi bị stagnation),
+                # nhưng không quá thời gian còn lại
+                if stag >= 5:
+                    count("mfss.stagnation")
+                    tau = min(tau * 2, max(remaining(), tinit))
+                    stag = 0
+                    print(f"[Iter {it}] No improvement, tăng time limit lên {tau} s")
+                it += 1
+            # Checkpoint tại ranh giới giữa 2 lượt (trạng thái nhất quán)
+            if checkpoint_path is not None and it - last_saved >= checkpoint_every:
+                save_state()
+                last_saved = it
+            if improved:
+                yield event(it)
+
+        if checkpoint_path is not None and it != last_saved:
+            save_state()
+
+        if gap_tol is not None and gap is not None and gap <= gap_tol:
+            print(f"Dừng sớm: gap = {100 * gap:.2f}% <= {100 * gap_tol:.2f}%")
+        elif target_cost is not None and best_sol.cost <= target_cost:
+            print(f"Dừng sớm: cost = {best_sol.cost:.4f} <= target {target_cost:.4f}")
+        elif remaining() <= 0:
+            print(f"Hết time budget ({time_budget} s) sau {it} subproblem")
+    finally:
+        if pool is not None:
+            pool.close()
+            print("Parallel subproblems:", pool.stats())
+        print("Subproblem memory:", memory.stats())
+        print("Screening:", {k: v - screen_start[k] for k, v in screen.stats().items()})
+
+    return best_sol
+
+
 def mfss(inst: TSCFLPInstance,
          Npop: int = 10,
          n_best: int = 5,
          Sizemax: int = 10,
          tinit: float = 1.0,
-         max_iter: int = 50) -> Solution:
+         max_iter: int = 50,
+         cache=None,
+         batch_init: bool = False,
+         workers: int = 1,
+         round_size: Optional[int] = None,
+         seed: Optional[int] = 0,
+         backend: str = DEFAULT_BACKEND,
+         gap_tol: Optional[float] = None,
+         lb_iter: int = 200,
+         time_budget: Optional[float] = None,
+         target_cost: Optional[float] = None,
+         callback: Optional[Callable[[ImprovementEvent], Optional[bool]]] = None,
+         checkpoint_path: Optional[str] = None,
+         checkpoint_every: int = 10,
+         resume_from: Optional[str] = None,
+         local_search: bool = False,
+         fix_rule: str = "frequency",
+         preprocess: bool = False
+         ) -> Solution:
     """
     Cài đặt MFSS (phiên bản đơn giản hóa so với paper, nhưng cùng ý tưởng).
 
@@ -108,74 +474,95 @@ def mfss(inst: TSCFLPInstance,
         Time limit ban đầu cho solver MILP (giây).
     max_iter : int
         Số vòng lặp MFSS.
+    cache : PatternCache, optional
+        Cache kết quả các subproblem theo fixed pattern (xem tscflp_cache.py).
+        Pattern đã giải rồi sẽ không phải gọi lại CBC.
+    batch_init : bool
+        True: dựng các pattern của population cùng lúc bằng
+        build_population_batched (pattern trùng nhau chỉ đánh giá 1 lần, xem
+        tscflp_population.py). Việc tối ưu luồng cho từng pattern vẫn chiếm
+        phần lớn thời gian, nên chỉ nhanh hơn khi có nhiều pattern trùng.
+    workers : int
+        Số worker process dựng population ban đầu và giải subproblem
+        song song (1 = tuần tự trong process hiện tại).
+    round_size : int, optional
+        Số fixed-set (B, Skn, F) rút ra mỗi lượt và giải cùng lúc
+        (mặc định = workers). Các kết quả được gộp vào P theo thứ tự rút,
+        nên với cùng seed và cùng workers / round_size thì kết quả như nhau.
+    seed : int, optional
+        Seed cho vòng lặp MFSS (random.Random riêng) và cho population:
+        mỗi thành viên population có luồng ngẫu nhiên riêng sinh từ seed
+        (xem tscflp_population.member_seeds), nên population giống nhau
+        với mọi số worker.
+    backend : str
+        Backend giải subproblem: "cbc" (PuLP + CBC), "highs"
+        (scipy.optimize.milp trong cùng process), "sparse" hoặc "benders"
+        (cut được giữ lại giữa các subproblem), xem solve_full_mip.
+    gap_tol : float, optional
+        Dừng sớm khi gap tương đối (cost - cận dưới) / cost <= gap_tol.
+    lb_iter : int
+        Số bước subgradient tính cận dưới Lagrangian sau khi dựng population
+        (mỗi lần cải thiện best chạy thêm lb_iter // 4 bước với cận trên mới).
+        0 = không tính cận dưới.
+    time_budget : float, optional
+        Tổng thời gian tối đa (giây, tính cả dựng population): không rút
+        subproblem mới khi hết giờ, time limit của mỗi subproblem (tau) không
+        vượt quá thời gian còn lại.
+    target_cost : float, optional
+        Dừng ngay khi tìm được lời giải có cost <= target_cost.
+    callback : callable, optional
+        callback(ImprovementEvent) được gọi mỗi khi best được cải thiện;
+        trả về True để dừng MFSS ngay (xem mfss_iter nếu muốn dùng generator).
+    checkpoint_path : str, optional
+        File .npz lưu toàn bộ trạng thái tìm kiếm (P, best, tau, stag, số
+        vòng, trạng thái RNG, nhân tử Lagrangian, cache pattern), ghi lại sau
+        mỗi checkpoint_every subproblem và khi kết thúc (xem tscflp_checkpoint.py).
+    checkpoint_every : int
+        Số subproblem giữa 2 lần ghi checkpoint.
+    resume_from : str, optional
+        Tiếp tục từ checkpoint (bỏ qua bước dựng population). Với cùng tham
+        số và seed, kết quả giống hệt lần chạy không bị ngắt (miễn là các
+        subproblem không bị cắt bởi time limit, tức kết quả solver tất định).
+    local_search : bool
+        True: mỗi khi có best mới (kể cả best của population ban đầu), cải
+        thiện thêm bằng local search open / close / swap với chấm điểm luồng
+        tăng dần (tscflp_localsearch.py) trước khi gọi subproblem MILP tiếp theo.
+    fix_rule : str
+        Cách chọn facility bị fix trong build_fixed_set: "frequency" (tần suất
+        giống base trong Skn, như paper) hoặc "lp" (theo relaxation LP, giải
+        1 lần cho instance, xem tscflp_lp.py).
+    preprocess : bool
+        True: chạy MFSS trên instance đã rút gọn (tscflp_preprocess.py: đóng
+        facility bị trội, bỏ khách không có demand, facility bắt buộc mở);
+        event, callback và lời giải trả về vẫn theo chỉ số và cost của
+        instance gốc. Checkpoint khi đó thuộc về instance rút gọn (tiếp tục
+        bằng cùng giá trị preprocess).
 
     Returns
     -------
     Solution
         Lời giải tốt nhất tìm được trong quá trình MFSS.
     """
-    random.seed(0)
-
-    # ---------- 1) Khởi tạo population P bằng randomized greedy ----------
-    P: List[Solution] = []
-    for _ in range(Npop):
-        # RCL size = 2 => tạo ra nhiều lời giải khác nhau
-        sol = greedy_tscflp(inst, rcl_size=2)
-        P.append(sol)
-
-    # tau = time limit hiện tại cho MILP
-    tau = tinit
-    # Số facility total
-    total_fac = len(inst.I) + len(inst.J)
-    # Số biến sẽ bị fix = total_fac - Sizemax
-    Size = min(total_fac - 1, total_fac - Sizemax)  # bảo đảm dương
-
-    # Lời giải tốt nhất hiện tại
-    best_sol = min(P, key=lambda s: s.cost)
-    stag = 0  # đếm số vòng không cải thiện (stagnation)
-
-    # ---------- 2) Vòng lặp học Fixed Set Search ----------
-    for it in range(max_iter):
-        # Sắp xếp P theo cost tăng dần, lấy top n_best
-        P.sort(key=lambda s: s.cost)
-        Sn = P[:min(n_best, len(P))]
-
-        # Chọn base solution B ngẫu nhiên trong top-n
-        B = random.choice(Sn)
-
-        # Chọn k lời giải từ Sn để tạo Skn (k ngẫu nhiên)
-        k = random.randint(2, max(2, len(Sn)))
-        Skn = random.sample(Sn, k=k)
-
-        # Xây fixed set F dựa trên B và Skn
-        F = build_fixed_set(B, Skn, Size, inst)
-
-        # Giải MILP với fixed-set F, time limit = tau
-        S_new = solve_full_mip(inst, time_limit=tau, fixed=F)
-
-        # Hàm so sánh pattern (facility mở/đóng) giữa 2 lời giải
-        def same_pattern(a: Solution, b: Solution) -> bool:
-            return a.open_I == b.open_I and a.open_J == b.open_J
-
-        # Kiểm tra xem S_new đã tồn tại trong P chưa
-        exists = any(same_pattern(S_new, s) for s in P)
-
-        # Nếu mới + tốt hơn best_sol thì update
-        if (not exists) and (S_new.cost < best_sol.cost - 1e-6):
-            P.append(S_new)
-            best_sol = S_new
-            stag = 0
-            print(f"[Iter {it}] Improved solution: cost = {best_sol.cost:.4f}")
-        else:
-            stag += 1
-
-        # Nếu 5 vòng không cải thiện: tăng time limit lên 2x
-        # (gần giống ý tưởng paper tăng τ khi bị stagnation)
-        if stag >= 5:
-            tau *= 2
-            stag = 0
-            print(f"[Iter {it}] No improvement, tăng time limit lên {tau} s")
-
+    search = mfss_iter(inst, Npop=Npop, n_best=n_best, Sizemax=Sizemax, tinit=tinit,
+                       max_iter=max_iter, cache=cache, batch_init=batch_init,
+                       workers=workers, round_size=round_size, seed=seed,
+                       backend=backend, gap_tol=gap_tol, lb_iter=lb_iter,
+                       time_budget=time_budget, target_cost=target_cost,
+                       checkpoint_path=checkpoint_path, checkpoint_every=checkpoint_every,
+                       resume_from=resume_from, local_search=local_search,
+                       fix_rule=fix_rule, preprocess=preprocess)
+    best_sol = None
+    try:
+        while True:
+            ev = next(search)
+            best_sol = Solution(cost=ev.cost, open_I=list(ev.pattern[0]),
+                                open_J=list(ev.pattern[1]))
+            if callback is not None and callback(ev):
+                break
+    except StopIteration as stop:
+        best_sol = stop.value
+    finally:
+        search.close()
     return best_sol
 
 
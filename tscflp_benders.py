@@ -0,0 +1,434 @@
+# tscflp_benders.py
+"""
+Backend giải chính xác TSCFLP bằng phân rã Benders.
+
+Master chỉ có biến nhị phân x_i, y_j và biến theta (cận dưới của chi phí
+vận chuyển):
+    min  sum f_i x_i + sum g_j y_j + theta
+    s.t. sum_i U_i x_i >= sum D,  sum_j V_j y_j >= sum D      (feasibility cut)
+         các optimality cut đã sinh
+Subproblem với pattern (x, y) cố định là LP luồng (2)-(5) trên các facility
+mở (scipy.optimize.linprog, HiGHS). Mạng 2 tầng là đồ thị đầy đủ nên LP vô
+nghiệm khi và chỉ khi 1 trong 2 ràng buộc phủ demand ở trên bị vi phạm ->
+2 feasibility cut đó được thêm ngay từ đầu và subproblem luôn có nghiệm.
+
+Optimality cut (từ đối ngẫu alpha >= 0, beta >= 0 của (2), (3), pi của (4),
+u của (5)):
+    theta >= sum_k D_k u_k - sum_i U_i alpha_i x_i - sum_j V_j beta_j y_j
+Đối ngẫu của facility đóng (không có trong LP thu hẹp) được bổ sung nhỏ
+nhất có thể mà vẫn khả thi đối ngẫu, nên cut hợp lệ với mọi (x, y).
+
+Chế độ multi-cut: thêm theta >= sum_k theta_k với theta_k là cận dưới chi
+phí phục vụ khách k, không tính capacity. Với p_jk = d_jk + min_i c_ij và
+rho_k = min p_jk trên các kho đang mở, mỗi pattern sinh cho từng khách cut
+    theta_k >= D_k (rho_k - sum_j max(0, rho_k - p_jk) y_j)
+(hợp lệ vì khách k luôn đi qua 1 kho mở j với chi phí >= p_jk). Nhờ đó
+master biết ngay "đóng kho gần khách thì tốn thêm bao nhiêu" (ít vòng hơn
+khi capacity rộng, nhưng master lớn hơn nhiều nên mặc định tắt).
+
+Cut caching: cut và giá trị subproblem theo pattern được giữ lại trong
+model (không phụ thuộc fixed-set), nên các lần giải sau (ví dụ các
+subproblem của MFSS) bắt đầu với toàn bộ cut đã có và pattern đã gặp không
+phải giải lại LP.
+
+Trước vòng lặp nguyên, ở lần solve đầu tiên, cut được sinh từ nghiệm LP
+relaxation của master (x, y phân số, subproblem vẫn là LP với capacity
+U_i x_i, V_j y_j) - rẻ hơn nhiều so với giải master MILP mỗi vòng và cho
+sẵn cận dưới bằng LP relaxation của bài toán.
+
+Dừng khi cận trên (pattern tốt nhất + chi phí vận chuyển thật) - cận dưới
+(tối ưu của master) <= mip_gap x cận trên, hoặc hết time limit.
+
+Nếu HiGHS không giải được master (status 4 "Solve error") thì giải lại không
+presolve, rồi với các cut đã chia theo hệ số lớn nhất của từng hàng; nếu vẫn
+lỗi thì fixed-set đó được giải bằng model MILP đầy đủ (backend "highs"),
+không trả về incumbent như thể đã tối ưu.
+"""
+
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import milp, linprog, LinearConstraint, Bounds
+
+from tscflp_core import TSCFLPInstance, Solution
+from tscflp_highs import build_constraint_matrix
+
+# Số kho trong 1 khối khi duyệt ma trận d theo hàng
+ROW_BLOCK = 64
+# Cut bị vi phạm ít hơn ngưỡng này (tương đối) thì không thêm
+CUT_TOL = 1e-7
+# Sai số tương đối của master ở vòng đầu (giảm dần tới mip_gap / 2)
+MASTER_GAP_INIT = 1e-2
+
+
+class BendersModel:
+    """
+    Model Benders của TSCFLP, cùng giao diện với TSCFLPModel
+    (solve / timing / last_optimal). Đăng ký sẵn là backend "benders"
+    (1 cut / pattern); chế độ multi-cut:
+        register_backend("benders-multi", lambda inst: BendersModel(inst, multicut=True))
+
+    Parameters
+    ----------
+    inst : TSCFLPInstance
+    multicut : bool
+        Thêm các cut theo từng khách (xem đầu file).
+    max_iter : int
+        Số vòng master / subproblem tối đa cho 1 lần solve.
+    mip_gap : float
+        Sai số tương đối chấp nhận (cận trên - cận dưới) / cận trên.
+    lp_rounds : int
+        Số vòng sinh cut tối đa trên LP relaxation của master ở lần solve
+        đầu tiên (0 = bỏ qua).
+
+    Thống kê:
+        n_iter        : tổng số lần giải master
+        n_subproblems : số lần giải LP subproblem (pattern mới)
+        n_cut_hits    : số pattern lấy lại từ cache, không giải LP
+        master_time, subproblem_time : thời gian tương ứng (giây)
+    """
+
+    def __init__(self, inst: TSCFLPInstance, multicut: bool = False,
+                 max_iter: int = 500, mip_gap: float = 1e-4, lp_rounds: int = 100):
+        start = time.perf_counter()
+
+        self.inst = inst
+        self.nI, self.nJ, self.nK = len(inst.I), len(inst.J), len(inst.K)
+        self.multicut = multicut
+        self.max_iter = max_iter
+        self.mip_gap = mip_gap
+        self.lp_rounds = lp_rounds
+
+        self.f = np.asarray(inst.f, dtype=np.float64)
+        self.g = np.asarray(inst.g, dtype=np.float64)
+        self.U = np.asarray(inst.U, dtype=np.float64)
+        self.V = np.asarray(inst.V, dtype=np.float64)
+        self.D = np.asarray(inst.D, dtype=np.float64)
+        self.c = np.asarray(inst.c, dtype=np.float64)      # |I| x |J|: nhỏ
+        self.total = float(self.D.sum())
+        self.c_min = self.c.min(axis=0)                     # min_i c_ij
+
+        # Cận dưới tầm thường của chi phí phục vụ từng khách: D_k min_j p_jk
+        p_min = np.full(self.nK, np.inf)
+        for j0, p in self._path_blocks():
+            np.minimum(p_min, p.min(axis=0), out=p_min)
+        self.theta_k_lb = self.D * p_min
+
+        # Biến master: [ x (|I|) | y (|J|) | theta | theta_k (|K|, nếu multicut) ]
+        self.n_var = self.nI + self.nJ + 1 + (self.nK if multicut else 0)
+        self.obj = np.zeros(self.n_var)
+        self.obj[:self.nI], self.obj[self.nI:self.nI + self.nJ] = self.f, self.g
+        self.obj[self.nI + self.nJ] = 1.0
+
+        # Các hàng của master dạng COO: sum coef * var >= rhs
+        self._rows, self._cols, self._vals, self._rhs = [], [], [], []
+        self._add_row(np.arange(self.nI), self.U, self.total)                   # phủ demand (x)
+        self._add_row(self.nI + np.arange(self.nJ), self.V, self.total)         # phủ demand (y)
+        if multicut:
+            self._add_row(np.r_[self.nI + self.nJ, self.nI + self.nJ + 1 + np.arange(self.nK)],
+                          np.r_[1.0, -np.ones(self.nK)], 0.0)                    # theta >= sum theta_k
+
+        # Cache: pattern (bytes) -> chi phí vận chuyển tối ưu
+        self.patterns: Dict[bytes, float] = {}
+
+        self.build_time = time.perf_counter() - start
+        self.solve_time = 0.0
+        self.master_time = 0.0
+        self.subproblem_time = 0.0
+        self.n_solves = 0
+        self.n_iter = 0
+        self.n_subproblems = 0
+        self.n_cut_hits = 0
+        self.n_fallbacks = 0
+        self.last_optimal = False
+
+    # -----------------------------------------------------------------
+    # Master
+    # -----------------------------------------------------------------
+    def _add_row(self, cols, vals, rhs):
+        self._rows.append(np.full(len(cols), len(self._rhs)))
+        self._cols.append(np.asarray(cols))
+        self._vals.append(np.asarray(vals, dtype=np.float64))
+        self._rhs.append(float(rhs))
+
+    def _master_bounds(self, fixed) -> Bounds:
+        nI, nJ = self.nI, self.nJ
+        lb = np.zeros(self.n_var)
+        ub = np.full(self.n_var, np.inf)
+        ub[:nI + nJ] = 1
+        lb[nI + nJ] = self.theta_k_lb.sum()
+        if self.multicut:
+            lb[nI + nJ + 1:] = self.theta_k_lb
+        if fixed is not None:
+            for i, val in fixed.get('I', {}).items():
+                lb[i] = ub[i] = int(val)
+            for j, val in fixed.get('J', {}).items():
+                lb[nI + j] = ub[nI + j] = int(val)
+        return Bounds(lb, ub)
+
+    def _solve_master(self, bounds: Bounds, time_left: Optional[float],
+                      relaxed: bool = False, gap: Optional[float] = None):
+        start = time.perf_counter()
+        A = sp.csr_matrix((np.concatenate(self._vals),
+                           (np.concatenate(self._rows), np.concatenate(self._cols))),
+                          shape=(len(self._rhs), self.n_var))
+        integrality = np.zeros(self.n_var)
+        if not relaxed:
+            integrality[:self.nI + self.nJ] = 1
+        options = {"disp": False, "mip_rel_gap": self.mip_gap / 2 if gap is None else gap}
+        if time_left is not None:
+            options["time_limit"] = max(time_left, 0.0)
+        cons = LinearConstraint(A, np.array(self._rhs), np.inf)
+        res = milp(self.obj, constraints=cons, integrality=integrality,
+                   bounds=bounds, options=options)
+        if res.status == 4:
+            # presolve của HiGHS đôi khi báo "Solve error" với master nhỏ: giải lại không presolve
+            options["presolve"] = False
+            res = milp(self.obj, constraints=cons, integrality=integrality,
+                       bounds=bounds, options=options)
+        if res.status == 4:
+            # hệ số các cut chênh nhau nhiều bậc: chia mỗi hàng cho hệ số lớn nhất rồi giải lại
+            scale = 1.0 / np.maximum(abs(A).max(axis=1).toarray().ravel(), 1e-12)
+            options.pop("presolve")
+            res = milp(self.obj,
+                       constraints=LinearConstraint(sp.diags(scale) @ A,
+                                                    np.array(self._rhs) * scale, np.inf),
+                       integrality=integrality, bounds=bounds, options=options)
+        self.master_time += time.perf_counter() - start
+        self.n_iter += 1
+        return res
+
+    # -----------------------------------------------------------------
+    # Subproblem
+    # -----------------------------------------------------------------
+    def _path_blocks(self, rows=None):
+        """Duyệt p_jk = d_jk + min_i c_ij theo khối hàng j (mặc định mọi kho)."""
+        rows = np.arange(self.nJ) if rows is None else rows
+        for r0 in range(0, len(rows), ROW_BLOCK):
+            blk = rows[r0:r0 + ROW_BLOCK]
+            p = np.asarray(self.inst.d[blk], dtype=np.float64) + self.c_min[blk, None]
+            yield r0, p
+
+    def _duals(self, x: np.ndarray, y: np.ndarray):
+        """
+        Giải LP luồng với pattern (x, y). Trả về (chi phí vận chuyển,
+        alpha, beta, pi, u) - đối ngẫu đã bổ sung cho facility đóng.
+        """
+        nI, nJ, nK = self.nI, self.nJ, self.nK
+        Ia, Ja = np.flatnonzero(x), np.flatnonzero(y)
+        w_arcs = (np.repeat(Ia, len(Ja)), np.tile(Ja, len(Ia)))
+        z_arcs = (np.repeat(Ja, nK), np.tile(np.arange(nK), len(Ja)))
+        A, lo, hi = build_constraint_matrix(self.inst, w_arcs, z_arcs)
+        A = A.tocsc()[:, nI + nJ:].tocsr()
+        cost = np.concatenate([self.c[w_arcs].ravel(),
+                               np.asarray(self.inst.d[Ja], dtype=np.float64).ravel()])
+        n_ub = nI + nJ
+        b_ub = np.concatenate([self.U * x, self.V * y])
+        res = linprog(cost, A_ub=A[:n_ub], b_ub=b_ub, A_eq=A[n_ub:], b_eq=hi[n_ub:],
+                      bounds=(0, None), method="highs")
+        if res.status != 0:
+            raise RuntimeError(f"Subproblem Benders không giải được: {res.message}")
+
+        alpha = np.maximum(0.0, -res.ineqlin.marginals[:nI])
+        beta = np.maximum(0.0, -res.ineqlin.marginals[nI:])
+        pi = res.eqlin.marginals[:nJ].copy()
+        u = res.eqlin.marginals[nJ:]
+
+        # Bổ sung đối ngẫu cho facility đóng (giữ ràng buộc đối ngẫu
+        # pi_j - alpha_i <= c_ij, u_k - beta_j - pi_j <= d_jk với mọi cung)
+        closed_J = np.flatnonzero(y == 0)
+        if len(closed_J):
+            pi[closed_J] = (self.c[np.ix_(Ia, closed_J)] + alpha[Ia, None]).min(axis=0)
+            for r0 in range(0, len(closed_J), ROW_BLOCK):
+                blk = closed_J[r0:r0 + ROW_BLOCK]
+                need = u[None, :] - np.asarray(self.inst.d[blk], dtype=np.float64) - pi[blk, None]
+                beta[blk] = np.maximum(0.0, need.max(axis=1))
+        closed_I = np.flatnonzero(x == 0)
+        if len(closed_I):
+            alpha[closed_I] = np.maximum(0.0, (pi[None, :] - self.c[closed_I]).max(axis=1))
+        return float(res.fun), alpha, beta, pi, u
+
+    def _customer_cuts(self, y: np.ndarray, theta_k: Optional[np.ndarray]):
+        """
+        Cut theo từng khách cho pattern có tập kho mở y (chế độ multi-cut),
+        chỉ thêm cut bị vi phạm bởi giá trị theta_k hiện tại của master.
+        """
+        nI, nJ, nK = self.nI, self.nJ, self.nK
+        rho = np.full(nK, np.inf)
+        for _, p in self._path_blocks(np.flatnonzero(y)):
+            np.minimum(rho, p.min(axis=0), out=rho)
+        rows, cols, vals = [], [], []
+        for j0, p in self._path_blocks():
+            e = rho[None, :] - p
+            jj, kk = np.nonzero(e > 0)
+            rows.append(kk)
+            cols.append(nI + j0 + jj)
+            vals.append(self.D[kk] * e[jj, kk])
+        rows, cols, vals = np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+        rhs = self.D * rho
+        current = self.theta_k_lb if theta_k is None else np.maximum(theta_k, self.theta_k_lb)
+        useful = np.flatnonzero(rhs > current + CUT_TOL * np.maximum(1.0, rhs))
+        order = np.argsort(rows, kind='stable')
+        rows, cols, vals = rows[order], cols[order], vals[order]
+        starts = np.searchsorted(rows, useful)
+        ends = np.searchsorted(rows, useful, side='right')
+        for k, s, e in zip(useful, starts, ends):
+            self._add_row(np.r_[nI + nJ + 1 + k, cols[s:e]], np.r_[1.0, vals[s:e]], rhs[k])
+
+    def _evaluate(self, x: np.ndarray, y: np.ndarray,
+                  theta_k: Optional[np.ndarray] = None) -> float:
+        """
+        Chi phí vận chuyển tối ưu với (x, y) (có thể là phân số, khi đó
+        capacity là U_i x_i, V_j y_j); điểm mới thì sinh cut.
+        Chỉ pattern nguyên được lưu vào cache.
+        """
+        integral = np.all((x == 0) | (x == 1)) and np.all((y == 0) | (y == 1))
+        key = np.packbits(np.r_[x, y].astype(bool)).tobytes() if integral else None
+        if key is not None and key in self.patterns:
+            self.n_cut_hits += 1
+            return self.patterns[key]
+
+        start = time.perf_counter()
+        value, alpha, beta, pi, u = self._duals(x, y)
+        nI, nJ = self.nI, self.nJ
+        self._add_row(np.r_[nI + nJ, np.arange(nI + nJ)],
+                      np.r_[1.0, self.U * alpha, self.V * beta], float(self.D @ u))
+        if self.multicut:
+            self._customer_cuts(y, theta_k)
+        if key is not None:
+            self.patterns[key] = value
+        self.n_subproblems += 1
+        self.subproblem_time += time.perf_counter() - start
+        return value
+
+    def _lp_phase(self, time_left):
+        """
+        Sinh cut từ LP relaxation của master (x, y trong [0, 1]) tới khi cận
+        dưới LP không tăng nữa. Chỉ chạy ở lần solve đầu: cut hợp lệ toàn cục
+        và được giữ lại cho mọi lần solve sau.
+        """
+        nI, nJ = self.nI, self.nJ
+        bounds = self._master_bounds(None)
+        last = -np.inf
+        for _ in range(self.lp_rounds):
+            if time_left() is not None and time_left() <= 0:
+                break
+            res = self._solve_master(bounds, time_left(), relaxed=True)
+            if res.x is None:
+                # vô nghiệm / hết giờ / lỗi solver: chỉ là bớt cut ban đầu,
+                # vòng lặp nguyên ở solve vẫn bảo đảm kết quả đúng
+                break
+            xy = np.clip(res.x[:nI + nJ], 0.0, 1.0)
+            xy[xy < 1e-9] = 0.0
+            theta = res.x[nI + nJ]
+            theta_k = res.x[nI + nJ + 1:] if self.multicut else None
+            value = self._evaluate(xy[:nI], xy[nI:], theta_k)
+            if value - theta <= self.mip_gap * max(1.0, abs(value)) or \
+                    res.fun - last <= self.mip_gap * max(1.0, abs(res.fun)) / 10:
+                break
+            last = res.fun
+
+    # -----------------------------------------------------------------
+    # Giải
+    # -----------------------------------------------------------------
+    def solve(self,
+              time_limit: Optional[float] = None,
+              fixed: Optional[Dict[str, Dict[int, int]]] = None,
+              warm_start=None
+              ) -> Solution:
+        """
+        Giải bằng Benders với fixed-set cho trước (xem solve_full_mip).
+        warm_start = (open_I, open_J, w, z): pattern incumbent được đánh giá
+        trước (cận trên ban đầu + cut của nó).
+        """
+        start = time.perf_counter()
+        nI, nJ = self.nI, self.nJ
+
+        def time_left():
+            return None if time_limit is None else time_limit - (time.perf_counter() - start)
+
+        best: Optional[Solution] = None
+
+        def consider(x, y, transport):
+            nonlocal best
+            cost = float(self.f @ x + self.g @ y + transport)
+            if best is None or cost < best.cost:
+                best = Solution(cost=cost, open_I=x.tolist(), open_J=y.tolist())
+
+        if warm_start is not None:
+            x = np.asarray(warm_start[0], dtype=int)
+            y = np.asarray(warm_start[1], dtype=int)
+            consider(x, y, self._evaluate(x, y))
+
+        if self.n_solves == 0:
+            self._lp_phase(time_left)
+
+        bounds = self._master_bounds(fixed)
+        lower = -np.inf
+        proven = False
+        # Master giải với sai số lớn ở các vòng đầu (rẻ hơn nhiều), thu nhỏ
+        # dần theo gap hiện tại; cận dưới luôn lấy dual bound của master
+        master_gap = MASTER_GAP_INIT
+        for _ in range(self.max_iter):
+            if time_left() is not None and time_left() <= 0:
+                break
+            res = self._solve_master(bounds, time_left(), gap=master_gap)
+            if res.x is None:
+                if res.status == 2:
+                    # master vô nghiệm -> bài toán (với fixed-set này) vô nghiệm
+                    proven = True
+                elif res.status != 1 and (time_left() is None or time_left() > 0):
+                    # HiGHS không giải được master (không phải do hết time limit):
+                    # giải fixed-set này bằng model MILP đầy đủ thay vì trả về incumbent
+                    # (hết thời gian thì giữ incumbent như khi hết time limit)
+                    best, proven = self._fallback(time_left(), fixed, warm_start, best)
+                break
+            if res.status == 0:
+                lower = max(lower, float(getattr(res, "mip_dual_bound", res.fun)))
+            xy = np.rint(res.x[:nI + nJ]).astype(int)
+            theta_k = res.x[nI + nJ + 1:] if self.multicut else None
+            hits = self.n_cut_hits
+            consider(xy[:nI], xy[nI:], self._evaluate(xy[:nI], xy[nI:], theta_k))
+            if best.cost - lower <= self.mip_gap * abs(best.cost):
+                proven = True
+                break
+            gap = (best.cost - lower) / abs(best.cost) if np.isfinite(lower) else np.inf
+            if self.n_cut_hits > hits:
+                # pattern đã có cut -> master cần chính xác hơn mới ra pattern mới
+                master_gap /= 10
+            master_gap = max(self.mip_gap / 2, min(master_gap, gap / 4))
+
+        self.last_optimal = proven
+        if best is None:
+            best = Solution(cost=float('inf'), open_I=[0] * nI, open_J=[0] * nJ)
+
+        self.solve_time += time.perf_counter() - start
+        self.n_solves += 1
+        return best
+
+    def _fallback(self, time_left, fixed, warm_start, best):
+        """Giải bằng backend "highs" (model đầy đủ). Trả về (lời giải tốt hơn, đã tối ưu)."""
+        from tscflp_core import get_model
+        self.n_fallbacks += 1
+        model = get_model(self.inst, "highs")
+        sol = model.solve(time_limit=time_left, fixed=fixed, warm_start=warm_start)
+        if best is not None and not sol.cost < best.cost:
+            sol = best
+        return sol, model.last_optimal
+
+    def timing(self) -> Dict[str, float]:
+        """Thống kê thời gian dựng / giải (giây), số vòng và số cut."""
+        return {
+            "build_time_seconds": self.build_time,
+            "solve_time_seconds": self.solve_time,
+            "num_solves": self.n_solves,
+            "iterations": self.n_iter,
+            "subproblems": self.n_subproblems,
+            "cut_cache_hits": self.n_cut_hits,
+            "num_cuts": len(self._rhs),
+            "master_time_seconds": self.master_time,
+            "subproblem_time_seconds": self.subproblem_time,
+            "fallbacks": self.n_fallbacks,
+        }
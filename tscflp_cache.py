@@ -0,0 +1,180 @@
+# tscflp_cache.py
+"""
+Cache kết quả solve_full_mip theo (instance, fixed pattern).
+
+- Khóa cache = fingerprint của instance + pattern fix của x_i, y_j + time limit
+- Giới hạn số phần tử, loại bỏ theo LRU (least recently used)
+- Có thể lưu ra / đọc lại từ file JSON để các lần chạy sau dùng lại kết quả
+  (luồng sol.flow chỉ giữ trong bộ nhớ, không ghi ra file)
+- Lời giải tối ưu (solver chứng minh optimal) được lưu thêm dưới khóa
+  "fully fixed" của chính pattern đó, nên lần sau hỏi đúng pattern đó
+  sẽ trả lời ngay mà không gọi solver
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+from tscflp_core import TSCFLPInstance, Solution
+
+
+def instance_fingerprint(inst: TSCFLPInstance) -> str:
+    """
+    Mã băm ngắn đại diện cho dữ liệu của instance (f, U, g, V, D, c, d).
+    Hai instance có cùng dữ liệu sẽ có cùng fingerprint.
+    """
+    def compute(inst):
+        h = hashlib.sha1()
+        for arr in inst.fingerprint_arrays():
+            a = np.asarray(arr, dtype=np.float64)
+            h.update(str(a.shape).encode())
+            h.update(a.tobytes())
+        return h.hexdigest()[:16]
+
+    return inst.get_cached("fingerprint", compute)
+
+
+def pattern_key(inst: TSCFLPInstance,
+                fixed: Optional[Dict[str, Dict[int, int]]]) -> str:
+    """
+    Chuỗi mô tả fixed-set: mỗi facility 1 ký tự '0' / '1' (bị fix) hoặc '-' (tự do).
+    Ví dụ: "1-0|01--" (nhà máy | kho).
+    """
+    fixed = fixed or {}
+    fI = fixed.get('I', {})
+    fJ = fixed.get('J', {})
+    part_I = ''.join(str(int(fI[i])) if i in fI else '-' for i in inst.I)
+    part_J = ''.join(str(int(fJ[j])) if j in fJ else '-' for j in inst.J)
+    return part_I + '|' + part_J
+
+
+class PatternCache:
+    """
+    Cache LRU cho kết quả giải các fixed-set.
+
+    Parameters
+    ----------
+    maxsize : int
+        Số phần tử tối đa giữ trong cache (vượt quá thì bỏ phần tử
+        lâu không dùng nhất).
+    path : str, optional
+        File JSON để lưu cache. Nếu file đã tồn tại thì đọc vào ngay.
+
+    Thống kê:
+        hits, misses : số lần tra cache trúng / trượt
+    """
+
+    def __init__(self, maxsize: int = 10000, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        # key -> (cost, open_I, open_J, flow); flow = SparseFlow hoặc None
+        self._data = OrderedDict()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self._data)
+
+    # -----------------------------------------------------------------
+    # Khóa
+    # -----------------------------------------------------------------
+    @staticmethod
+    def _make_key(fp: str, pattern: str, tau) -> str:
+        return f"{fp}:{pattern}:{tau}"
+
+    def _keys(self, inst, fixed, time_limit):
+        """
+        Các khóa (theo thứ tự ưu tiên) có thể trả lời cho fixed-set này.
+        - Pattern fix toàn bộ: time limit không ảnh hưởng -> khóa "opt".
+        - Pattern fix một phần: khóa đúng time limit, sau đó khóa "opt"
+          (kết quả đã chứng minh tối ưu thì đúng với mọi time limit).
+        """
+        fp = instance_fingerprint(inst)
+        pattern = pattern_key(inst, fixed)
+        if '-' not in pattern:
+            return [self._make_key(fp, pattern, "opt")]
+        return [self._make_key(fp, pattern, time_limit),
+                self._make_key(fp, pattern, "opt")]
+
+    # -----------------------------------------------------------------
+    # Tra cứu / lưu
+    # -----------------------------------------------------------------
+    def get(self, inst: TSCFLPInstance,
+            fixed: Optional[Dict[str, Dict[int, int]]],
+            time_limit: Optional[float] = None) -> Optional[Solution]:
+        """Trả về Solution đã lưu cho fixed-set này, hoặc None nếu chưa có."""
+        for key in self._keys(inst, fixed, time_limit):
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                cost, open_I, open_J, flow = self._data[key]
+                return Solution(cost=cost, open_I=list(open_I), open_J=list(open_J),
+                                flow=flow)
+        self.misses += 1
+        return None
+
+    def put(self, inst: TSCFLPInstance,
+            fixed: Optional[Dict[str, Dict[int, int]]],
+            time_limit: Optional[float],
+            sol: Solution,
+            optimal: bool = False):
+        """
+        Lưu kết quả giải fixed-set.
+
+        Nếu optimal=True (solver chứng minh tối ưu trong không gian của fixed-set)
+        thì luồng của pattern kết quả cũng tối ưu cho chính pattern đó,
+        nên lưu thêm dưới khóa fully fixed của sol.
+        """
+        fp = instance_fingerprint(inst)
+        value = (sol.cost, list(sol.open_I), list(sol.open_J), sol.flow)
+        pattern = pattern_key(inst, fixed)
+        tau = "opt" if (optimal or '-' not in pattern) else time_limit
+        self._store(self._make_key(fp, pattern, tau), value)
+        if optimal:
+            full = {'I': dict(enumerate(sol.open_I)), 'J': dict(enumerate(sol.open_J))}
+            self._store(self._make_key(fp, pattern_key(inst, full), "opt"), value)
+
+    def _store(self, key: str, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Thống kê hit / miss / kích thước cache."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+    # -----------------------------------------------------------------
+    # Lưu ra đĩa
+    # -----------------------------------------------------------------
+    def save(self, path: Optional[str] = None):
+        """Ghi cache ra file JSON (mặc định là self.path)."""
+        path = path or self.path
+        if path is None:
+            raise ValueError("Chưa chỉ định file để lưu cache")
+        tmp = path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump({"version": 1, "entries": self.entries()}, fh)
+        os.replace(tmp, path)
+
+    def load(self, path: str):
+        """Đọc cache từ file JSON (giữ thứ tự LRU như lúc lưu)."""
+        with open(path, 'r', encoding='utf-8') as fh:
+            payload = json.load(fh)
+        self.load_entries(payload.get("entries", []))
+
+    def entries(self):
+        """Các phần tử [key, cost, open_I, open_J] theo thứ tự LRU (cũ -> mới), không kèm luồng."""
+        return [[key, cost, list(open_I), list(open_J)]
+                for key, (cost, open_I, open_J, _) in self._data.items()]
+
+    def load_entries(self, entries):
+        """Thêm các phần tử dạng entries() vào cache."""
+        for key, cost, open_I, open_J in entries:
+            self._store(key, (cost, open_I, open_J, None))
@@ -0,0 +1,142 @@
+# tscflp_checkpoint.py
+"""
+Lưu / đọc checkpoint trạng thái tìm kiếm của MFSS (xem mfss_iter).
+
+1 checkpoint là 1 file .npz nén (np.savez_compressed) gồm:
+    meta        : JSON (version, fingerprint instance, vòng lặp, tau, stag,
+                  gap, thời gian đã chạy, chỉ số best trong P, ...)
+    costs       : cost của từng lời giải trong population P
+    open_I      : pattern nhà máy của P, nén bit (np.packbits), |P| x ceil(|I| / 8)
+    open_J      : pattern kho của P, nén bit
+    rng_state   : trạng thái random.Random (624 + 1 số uint32)
+    lag_lam, lag_mu : nhân tử Lagrangian tốt nhất (nếu có)
+    cache       : JSON các phần tử PatternCache (kết quả pattern đã giải)
+    memory      : JSON các phần tử SubproblemMemory (subproblem (F, tau) đã giải)
+
+File được ghi ra file tạm rồi os.replace nên checkpoint cũ không bị hỏng
+nếu process bị dừng giữa lúc ghi.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from tscflp_core import TSCFLPInstance, Solution
+from tscflp_cache import instance_fingerprint
+
+CHECKPOINT_VERSION = 1
+
+
+@dataclass
+class SearchState:
+    """
+    Trạng thái vòng lặp MFSS tại ranh giới giữa 2 lượt.
+
+    population  : population P (theo đúng thứ tự trong P)
+    best_index  : vị trí của best_sol trong P
+    tau         : time limit hiện tại của subproblem
+    stag        : số subproblem liên tiếp không cải thiện
+    iteration   : số subproblem đã giải
+    rng_state   : random.Random.getstate() của vòng lặp
+    gap         : gap Lagrangian hiện tại (None nếu không tính)
+    elapsed     : số giây đã chạy (tính cho time_budget)
+    lagrangian  : LagrangianBound.get_state() (None nếu không tính)
+    cache_entries : PatternCache.entries() (None nếu không dùng cache)
+    memory_entries : SubproblemMemory.entries() (None nếu không lưu)
+    """
+    population: List[Solution]
+    best_index: int
+    tau: float
+    stag: int
+    iteration: int
+    rng_state: tuple
+    gap: Optional[float] = None
+    elapsed: float = 0.0
+    lagrangian: Optional[dict] = None
+    cache_entries: Optional[list] = None
+    memory_entries: Optional[list] = None
+
+
+def save_checkpoint(path: str, inst: TSCFLPInstance, state: SearchState) -> str:
+    """Ghi state ra file path (.npz). Trả về path."""
+    P = state.population
+    version, mt, gauss_next = state.rng_state
+    meta = {
+        "version": CHECKPOINT_VERSION,
+        "fingerprint": instance_fingerprint(inst),
+        "num_primary": len(inst.I),
+        "num_secondary": len(inst.J),
+        "best_index": state.best_index,
+        "tau": state.tau,
+        "stag": state.stag,
+        "iteration": state.iteration,
+        "gap": state.gap,
+        "elapsed": state.elapsed,
+        "rng_version": version,
+        "rng_gauss_next": gauss_next,
+    }
+    arrays = {
+        "costs": np.array([s.cost for s in P], dtype=np.float64),
+        "open_I": np.packbits(np.array([s.open_I for s in P], dtype=np.uint8)
+                              .reshape(len(P), len(inst.I)), axis=1),
+        "open_J": np.packbits(np.array([s.open_J for s in P], dtype=np.uint8)
+                              .reshape(len(P), len(inst.J)), axis=1),
+        "rng_state": np.array(mt, dtype=np.uint32),
+    }
+    if state.lagrangian is not None:
+        lag = state.lagrangian
+        meta["lagrangian"] = {k: lag[k] for k in ("best", "theta", "n_iter")}
+        arrays["lag_lam"] = np.asarray(lag["lam"], dtype=np.float64)
+        arrays["lag_mu"] = np.asarray(lag["mu"], dtype=np.float64)
+    if state.cache_entries is not None:
+        arrays["cache"] = np.frombuffer(json.dumps(state.cache_entries).encode(),
+                                        dtype=np.uint8)
+    if state.memory_entries is not None:
+        arrays["memory"] = np.frombuffer(json.dumps(state.memory_entries).encode(),
+                                         dtype=np.uint8)
+    arrays["meta"] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as fh:
+        np.savez_compressed(fh, **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+def load_checkpoint(path: str, inst: TSCFLPInstance) -> SearchState:
+    """
+    Đọc checkpoint đã lưu bằng save_checkpoint.
+    ValueError nếu checkpoint không phải của instance này.
+    """
+    with np.load(path) as data:
+        meta = json.loads(data["meta"].tobytes().decode())
+        if meta.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Không hỗ trợ checkpoint version {meta.get('version')} ({path})")
+        if meta["fingerprint"] != instance_fingerprint(inst):
+            raise ValueError(f"Checkpoint {path} không thuộc instance này")
+
+        nI, nJ = meta["num_primary"], meta["num_secondary"]
+        open_I = np.unpackbits(data["open_I"], axis=1, count=nI).astype(int)
+        open_J = np.unpackbits(data["open_J"], axis=1, count=nJ).astype(int)
+        population = [Solution(cost=float(cost), open_I=oi.tolist(), open_J=oj.tolist())
+                      for cost, oi, oj in zip(data["costs"].tolist(), open_I, open_J)]
+
+        rng_state = (meta["rng_version"], tuple(int(v) for v in data["rng_state"]),
+                     meta["rng_gauss_next"])
+
+        lagrangian = None
+        if "lagrangian" in meta:
+            lagrangian = dict(meta["lagrangian"], lam=data["lag_lam"], mu=data["lag_mu"])
+        cache_entries = (json.loads(data["cache"].tobytes().decode())
+                         if "cache" in data else None)
+        memory_entries = (json.loads(data["memory"].tobytes().decode())
+                          if "memory" in data else None)
+
+    return SearchState(population=population, best_index=meta["best_index"],
+                       tau=meta["tau"], stag=meta["stag"], iteration=meta["iteration"],
+                       rng_state=rng_state, gap=meta["gap"], elapsed=meta["elapsed"],
+                       lagrangian=lagrangian, cache_entries=cache_entries,
+                       memory_entries=memory_entries)
@@ -2,22 +2,34 @@
 """
 File lõi dùng chung cho cả Greedy và MFSS.
 
-- Định nghĩa cấu trúc dữ liệu cho bài toán TSCFLP
-- Cài đặt hàm solve_full_mip() dùng PuLP để giải MILP
+- Định nghĩa cấu trúc dữ liệu cho bài toán TSCFLP (dữ liệu lưu bằng numpy array,
+  có hàm vector hóa để tính cost / kiểm tra khả thi của 1 lời giải)
+- Cài đặt class TSCFLPModel: model MILP PuLP dựng 1 lần cho mỗi instance,
+  mỗi lần giải fixed-set chỉ đổi bound của x_i, y_j
+- Cài đặt hàm solve_full_mip() giải MILP bằng backend chọn được:
+  "cbc" (PuLP + CBC, mặc định), "highs" (scipy.optimize.milp, xem tscflp_highs.py)
+  "sparse" (chỉ giữ các cung ứng viên + pricing, xem tscflp_sparse.py)
+  hoặc "benders" (phân rã Benders, xem tscflp_benders.py)
+  (nếu mọi facility đều bị fix thì chỉ cần giải min-cost flow, xem tscflp_flow.py)
 - Có thêm hàm build_vietnam_example() với dữ liệu "thật" mô phỏng TP.HCM
 - Hàm build_small_example() chỉ là alias gọi sang build_vietnam_example()
 """
 
-from dataclasses import dataclass
-from typing import List, Dict, Optional
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Dict, Optional
+import numpy as np
 import pulp as pl
 
+from tscflp_flow import solve_min_cost_flow, SparseFlow
+from tscflp_profile import span, count
+
 
 # =====================================================================
 # 1. ĐỊNH NGHĨA INSTANCE BÀI TOÁN & CẤU TRÚC LƯU LỜI GIẢI
 # =====================================================================
 
-@dataclass
+@dataclass(eq=False)   # so sánh 2 instance theo id (các field là numpy array)
 class TSCFLPInstance:
     """
     Mô tả 1 instance của bài toán Two-Stage Capacitated Facility Location Problem (TSCFLP)
@@ -35,54 +47,414 @@ class TSCFLPInstance:
                là nhỏ nhất, đồng thời thỏa:
                     - capacity của nhà máy, kho
                     - thỏa mãn demand khách hàng
+
+    Các field có thể truyền vào dạng list (list of lists) hoặc numpy array;
+    sau khi khởi tạo đều được chuyển thành numpy array liên tục (contiguous)
+    kiểu dtype (float64 mặc định, float32 để tiết kiệm bộ nhớ). Cách truy cập
+    cũ như c[i][j], d[j][k], U.copy(), sum(D) vẫn dùng được.
     """
     # primary facilities (nhà máy)
-    f: List[float]     # fixed cost mở tại i
-    U: List[float]     # capacity (công suất tối đa) tại i
+    f: np.ndarray      # fixed cost mở tại i                       shape (|I|,)
+    U: np.ndarray      # capacity (công suất tối đa) tại i         shape (|I|,)
 
     # secondary facilities (kho)
-    g: List[float]     # fixed cost mở tại j
-    V: List[float]     # capacity tại j
+    g: np.ndarray      # fixed cost mở tại j                       shape (|J|,)
+    V: np.ndarray      # capacity tại j                            shape (|J|,)
 
     # customers
-    D: List[float]     # nhu cầu của khách hàng k
+    D: np.ndarray      # nhu cầu của khách hàng k                  shape (|K|,)
 
     # transport costs
-    c: List[List[float]]  # chi phí đơn vị i -> j
-    d: List[List[float]]  # chi phí đơn vị j -> k
+    c: np.ndarray      # chi phí đơn vị i -> j                     shape (|I|, |J|)
+    d: np.ndarray      # chi phí đơn vị j -> k                     shape (|J|, |K|)
+
+    dtype: type = np.float64   # kiểu số thực dùng để lưu dữ liệu
+
+    # Các object dựng 1 lần cho instance (model MILP, ...), không phải dữ liệu bài toán
+    _cache: Dict[str, object] = field(default_factory=dict, init=False,
+                                      repr=False, compare=False)
 
     def __post_init__(self):
         """
-        Sau khi khởi tạo, tạo luôn các tập chỉ số I, J, K
-        để dùng cho vòng lặp cho tiện.
+        Sau khi khởi tạo:
+        - chuyển dữ liệu sang numpy array liên tục, kiểm tra kích thước
+        - tạo luôn các tập chỉ số I, J, K để dùng cho vòng lặp cho tiện.
         """
+        self._convert_arrays()
+
         self.I = list(range(len(self.f)))   # index nhà máy
         self.J = list(range(len(self.g)))   # index kho
         self.K = list(range(len(self.D)))   # index khách hàng
 
+    def _convert_arrays(self):
+        dt = np.dtype(self.dtype)
+        for name in ('f', 'U', 'g', 'V', 'D'):
+            setattr(self, name, np.ascontiguousarray(getattr(self, name), dtype=dt))
+        nI, nJ, nK = len(self.f), len(self.g), len(self.D)
+        self.c = np.ascontiguousarray(self.c, dtype=dt).reshape(nI, nJ)
+        self.d = np.ascontiguousarray(self.d, dtype=dt).reshape(nJ, nK)
+        if len(self.U) != nI or len(self.V) != nJ:
+            raise ValueError("Kích thước f/U hoặc g/V không khớp nhau")
+
+    # -----------------------------------------------------------------
+    # Đánh giá lời giải (vector hóa)
+    # -----------------------------------------------------------------
+    def evaluate(self, open_I, open_J, w, z) -> float:
+        """
+        Tổng chi phí (1) của lời giải (open_I, open_J, w, z):
+            sum f_i x_i + sum g_j y_j + sum c_ij w_ij + sum d_jk z_jk
+        w: array |I| x |J|, z: array |J| x |K|.
+        """
+        x = np.asarray(open_I, dtype=np.float64)
+        y = np.asarray(open_J, dtype=np.float64)
+        w = np.asarray(w, dtype=np.float64)
+        z = np.asarray(z, dtype=np.float64)
+        return float(self.f @ x + self.g @ y +
+                     np.einsum('ij,ij->', self.c, w) +
+                     np.einsum('jk,jk->', self.d, z))
+
+    def max_violation(self, open_I, open_J, w, z) -> float:
+        """
+        Mức vi phạm lớn nhất của các ràng buộc (2)-(5) và w, z >= 0
+        (0 nếu lời giải khả thi).
+        """
+        x = np.asarray(open_I, dtype=np.float64)
+        y = np.asarray(open_J, dtype=np.float64)
+        w = np.asarray(w, dtype=np.float64)
+        z = np.asarray(z, dtype=np.float64)
+        out_I = w.sum(axis=1)          # hàng rời nhà máy i
+        in_J = w.sum(axis=0)           # hàng vào kho j
+        out_J = z.sum(axis=1)          # hàng rời kho j
+        in_K = z.sum(axis=0)           # hàng khách k nhận
+        return float(max(
+            np.max(out_I - self.U * x, initial=0.0),       # (2)
+            np.max(out_J - self.V * y, initial=0.0),       # (3)
+            np.max(np.abs(in_J - out_J), initial=0.0),     # (4)
+            np.max(np.abs(in_K - self.D), initial=0.0),    # (5)
+            -np.min(w, initial=0.0),
+            -np.min(z, initial=0.0),
+        ))
+
+    def is_feasible(self, open_I, open_J, w, z, tol: float = 1e-6) -> bool:
+        """True nếu (open_I, open_J, w, z) thỏa mọi ràng buộc (sai số tol)."""
+        return self.max_violation(open_I, open_J, w, z) <= tol
+
+    def fingerprint_arrays(self):
+        """Các mảng xác định dữ liệu instance (dùng cho tscflp_cache.instance_fingerprint)."""
+        return (self.f, self.U, self.g, self.V, self.D, self.c, self.d)
+
+    def get_cached(self, key: str, builder):
+        """
+        Lấy object đã dựng sẵn cho instance này (ví dụ model MILP),
+        nếu chưa có thì gọi builder(self) để dựng và lưu lại.
+        """
+        if key not in self._cache:
+            self._cache[key] = builder(self)
+        return self._cache[key]
+
+    def __getstate__(self):
+        # Không pickle phần cache (model PuLP, ...): bên nhận tự dựng lại khi cần
+        state = self.__dict__.copy()
+        state['_cache'] = {}
+        return state
+
 
-@dataclass
 class Solution:
     """
-    Lưu lời giải ở mức "facility mở hay không" + cost.
-    (Phần luồng chi tiết w(i,j), z(j,k) không lưu lại ở đây
-     vì mục đích chính là so sánh cost và pattern mở/đóng.)
+    Lưu lời giải ở mức "facility mở hay không" + cost, dạng gọn:
+
+    - cờ mở/đóng của nhà máy và kho nén bit (np.packbits) trong 1 chuỗi bytes
+      (packed, dùng luôn làm khóa băm của pattern)
+    - flow (tùy chọn): luồng w(i,j), z(j,k) dạng thưa SparseFlow, chỉ có khi
+      đã tính sẵn (min-cost flow, local search, backend "highs", ...) để các
+      bước sau (warm start, local search, báo cáo) không phải giải lại
+
+    open_I / open_J vẫn trả về list 0/1 như trước (giải nén khi được hỏi).
     """
-    cost: float
-    open_I: List[int]   # 0/1 cho từng nhà máy i
-    open_J: List[int]   # 0/1 cho từng kho j
+    __slots__ = ('cost', 'packed', 'n_I', 'n_J', 'flow')
+
+    def __init__(self, cost: float, open_I, open_J, flow: Optional[SparseFlow] = None):
+        bits_I = np.asarray(open_I, dtype=np.uint8).ravel()
+        bits_J = np.asarray(open_J, dtype=np.uint8).ravel()
+        self.cost = cost
+        self.n_I, self.n_J = len(bits_I), len(bits_J)
+        self.packed = np.packbits(np.concatenate((bits_I, bits_J))).tobytes()
+        self.flow = flow
+
+    def _bits(self) -> np.ndarray:
+        return np.unpackbits(np.frombuffer(self.packed, dtype=np.uint8),
+                             count=self.n_I + self.n_J)
+
+    @property
+    def open_I(self) -> List[int]:   # 0/1 cho từng nhà máy i
+        return self._bits()[:self.n_I].tolist()
+
+    @property
+    def open_J(self) -> List[int]:   # 0/1 cho từng kho j
+        return self._bits()[self.n_I:].tolist()
+
+    @property
+    def nbytes(self) -> int:
+        """Bộ nhớ của pattern + luồng (không tính phần đầu object Python)."""
+        return len(self.packed) + (self.flow.nbytes if self.flow is not None else 0)
+
+    def __eq__(self, other):
+        if not isinstance(other, Solution):
+            return NotImplemented
+        return (self.cost == other.cost and self.packed == other.packed and
+                (self.n_I, self.n_J) == (other.n_I, other.n_J))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Solution(cost={self.cost!r}, open_I={self.open_I!r}, open_J={self.open_J!r})"
+
+    def __reduce__(self):
+        return (_restore_solution, (self.cost, self.packed, self.n_I, self.n_J, self.flow))
+
+
+def _restore_solution(cost, packed, n_I, n_J, flow) -> Solution:
+    sol = Solution.__new__(Solution)
+    sol.cost, sol.packed, sol.n_I, sol.n_J, sol.flow = cost, packed, n_I, n_J, flow
+    return sol
 
 
 # =====================================================================
-# 2. HÀM GIẢI MILP ĐẦY ĐỦ CHO TSCFLP (DÙNG CHUNG CHO GREEDY + MFSS)
+# 2. MODEL MILP DÙNG LẠI NHIỀU LẦN + HÀM GIẢI (DÙNG CHUNG CHO GREEDY + MFSS)
 # =====================================================================
 
+class TSCFLPModel:
+    """
+    Model MILP của TSCFLP (PuLP), dựng 1 lần cho mỗi instance.
+
+    Toàn bộ biến x, y, w, z, hàm mục tiêu và ràng buộc (2)-(5) chỉ được tạo
+    trong __init__. Mỗi lần giải với fixed-set khác nhau ta chỉ đổi bound của
+    biến (x_i, y_j bị fix thì lowBound = upBound = giá trị fix), không thêm
+    ràng buộc mới vào model.
+
+    Thống kê thời gian:
+        build_time  : thời gian dựng model (giây)
+        solve_time  : tổng thời gian các lần gọi solve() (giây)
+        n_solves    : số lần đã gọi solve()
+    """
+
+    def __init__(self, inst: TSCFLPInstance):
+        start = time.perf_counter()
+
+        I, J, K = inst.I, inst.J, inst.K
+        # PuLP dựng biểu thức nhanh hơn với float của Python -> chuyển sang list
+        f, g, U, V, D = (np.asarray(a).tolist() for a in (inst.f, inst.g, inst.U, inst.V, inst.D))
+        c, d = np.asarray(inst.c).tolist(), np.asarray(inst.d).tolist()
+
+        # Tạo model tối thiểu hóa
+        prob = pl.LpProblem("TSCFLP", pl.LpMinimize)
+
+        # Biến nhị phân: x_i = 1 nếu mở nhà máy i
+        x = pl.LpVariable.dicts("x", I, lowBound=0, upBound=1, cat="Binary")
+        # Biến nhị phân: y_j = 1 nếu mở kho j
+        y = pl.LpVariable.dicts("y", J, lowBound=0, upBound=1, cat="Binary")
+
+        # Biến luồng: w_ij = lượng hàng từ nhà máy i -> kho j
+        w = pl.LpVariable.dicts("w", (I, J), lowBound=0, cat="Continuous")
+        # Biến luồng: z_jk = lượng hàng từ kho j -> khách k
+        z = pl.LpVariable.dicts("z", (J, K), lowBound=0, cat="Continuous")
+
+        # --------- Objective: (1) trong bài báo ---------
+        prob += (
+            pl.lpSum(f[i] * x[i] for i in I) +                     # chi phí mở nhà máy
+            pl.lpSum(g[j] * y[j] for j in J) +                     # chi phí mở kho
+            pl.lpSum(c[i][j] * w[i][j] for i in I for j in J) +    # chi phí vận chuyển i->j
+            pl.lpSum(d[j][k] * z[j][k] for j in J for k in K)      # chi phí vận chuyển j->k
+        )
+
+        # --------- Ràng buộc capacity nhà máy: (2) ---------
+        for i in I:
+            prob += pl.lpSum(w[i][j] for j in J) <= U[i] * x[i]
+
+        # --------- Ràng buộc capacity kho: (3) ---------
+        for j in J:
+            prob += pl.lpSum(z[j][k] for k in K) <= V[j] * y[j]
+
+        # --------- Bảo toàn luồng qua kho: (4) ---------
+        for j in J:
+            prob += pl.lpSum(w[i][j] for i in I) == pl.lpSum(z[j][k] for k in K)
+
+        # --------- Thỏa nhu cầu khách hàng: (5) ---------
+        for k in K:
+            prob += pl.lpSum(z[j][k] for j in J) == D[k]
+
+        self.inst = inst
+        self.prob = prob
+        self.x, self.y, self.w, self.z = x, y, w, z
+
+        self.build_time = time.perf_counter() - start
+        self.solve_time = 0.0
+        self.n_solves = 0
+        # True nếu lần solve() gần nhất được solver chứng minh tối ưu
+        self.last_optimal = False
+
+    def _apply_fixed(self, fixed: Optional[Dict[str, Dict[int, int]]]):
+        """
+        Đặt lại bound [0, 1] cho mọi x_i, y_j rồi fix các biến trong fixed-set
+        bằng cách cho lowBound = upBound = giá trị fix.
+        """
+        for var in self.x.values():
+            var.lowBound, var.upBound = 0, 1
+        for var in self.y.values():
+            var.lowBound, var.upBound = 0, 1
+
+        if fixed is None:
+            return
+        for i, val in fixed.get('I', {}).items():
+            self.x[i].lowBound = self.x[i].upBound = int(val)
+        for j, val in fixed.get('J', {}).items():
+            self.y[j].lowBound = self.y[j].upBound = int(val)
+
+    def _set_start(self, warm_start):
+        """
+        Gán giá trị ban đầu (MIP start) cho mọi biến từ
+        warm_start = (open_I, open_J, w, z), w: |I| x |J|, z: |J| x |K|.
+        """
+        open_I, open_J, w, z = warm_start
+        for i in self.inst.I:
+            self.x[i].setInitialValue(int(open_I[i]))
+        for j in self.inst.J:
+            self.y[j].setInitialValue(int(open_J[j]))
+        for i, row in enumerate(np.asarray(w).tolist()):
+            wi = self.w[i]
+            for j, val in enumerate(row):
+                wi[j].setInitialValue(val)
+        for j, row in enumerate(np.asarray(z).tolist()):
+            zj = self.z[j]
+            for k, val in enumerate(row):
+                zj[k].setInitialValue(val)
+
+    def solve(self,
+              time_limit: Optional[float] = None,
+              fixed: Optional[Dict[str, Dict[int, int]]] = None,
+              warm_start=None
+              ) -> Solution:
+        """
+        Giải model với fixed-set cho trước (xem solve_full_mip).
+        warm_start = (open_I, open_J, w, z) là lời giải khả thi cho fixed-set,
+        được đưa cho CBC làm MIP start.
+        """
+        start = time.perf_counter()
+
+        self._apply_fixed(fixed)
+        if warm_start is not None:
+            self._set_start(warm_start)
+
+        # Chọn solver CBC (mặc định của PuLP) + giới hạn thời gian
+        solver = pl.PULP_CBC_CMD(msg=True, timeLimit=time_limit,
+                                 warmStart=warm_start is not None)
+        self.prob.solve(solver)
+
+        with span("mip.extract"):
+            # Không tìm được lời giải nào (hết giờ / vô nghiệm) -> cost = inf
+            found = self.prob.sol_status in (pl.LpSolutionOptimal, pl.LpSolutionIntegerFeasible)
+            cost = pl.value(self.prob.objective) if found else float('inf')
+            self.last_optimal = self.prob.sol_status == pl.LpSolutionOptimal
+            open_I = [int(round(self.x[i].value())) for i in self.inst.I]
+            open_J = [int(round(self.y[j].value())) for j in self.inst.J]
+
+        self.solve_time += time.perf_counter() - start
+        self.n_solves += 1
+
+        return Solution(cost=cost, open_I=open_I, open_J=open_J)
+
+    def timing(self) -> Dict[str, float]:
+        """Thống kê thời gian dựng model / giải model (giây)."""
+        return {
+            "build_time_seconds": self.build_time,
+            "solve_time_seconds": self.solve_time,
+            "num_solves": self.n_solves,
+        }
+
+
+def _highs_model(inst: TSCFLPInstance):
+    # import trễ: chỉ cần scipy khi thực sự dùng backend "highs"
+    from tscflp_highs import HighsModel
+    return HighsModel(inst)
+
+
+def _sparse_model(inst: TSCFLPInstance):
+    from tscflp_sparse import SparseModel
+    return SparseModel(inst)
+
+
+def _benders_model(inst: TSCFLPInstance):
+    from tscflp_benders import BendersModel
+    return BendersModel(inst)
+
+
+# Backend giải MILP: tên -> hàm dựng model từ instance.
+# Model cần có solve(time_limit, fixed, warm_start) -> Solution, last_optimal và timing().
+SOLVER_BACKENDS: Dict[str, Callable[[TSCFLPInstance], object]] = {
+    "cbc": TSCFLPModel,
+    "highs": _highs_model,
+    "sparse": _sparse_model,
+    "benders": _benders_model,
+}
+
+DEFAULT_BACKEND = "cbc"
+
+
+def register_backend(name: str, factory: Callable[[TSCFLPInstance], object]):
+    """Đăng ký thêm 1 backend giải MILP cho solve_full_mip."""
+    SOLVER_BACKENDS[name] = factory
+
+
+def get_model(inst: TSCFLPInstance, backend: str = DEFAULT_BACKEND):
+    """Lấy model MILP của instance cho backend (chỉ dựng ở lần gọi đầu tiên)."""
+    if backend not in SOLVER_BACKENDS:
+        raise ValueError(f"Không có solver backend '{backend}' "
+                         f"(có: {', '.join(SOLVER_BACKENDS)})")
+    key = "mip_model" if backend == "cbc" else f"mip_model:{backend}"
+    factory = SOLVER_BACKENDS[backend]
+
+    def build(inst):
+        with span("mip.model_build", backend=backend):
+            return factory(inst)
+
+    return inst.get_cached(key, build)
+
+
+def is_fully_fixed(inst: TSCFLPInstance,
+                   fixed: Optional[Dict[str, Dict[int, int]]]) -> bool:
+    """True nếu fixed-set fix toàn bộ x_i và y_j."""
+    if fixed is None:
+        return False
+    fI, fJ = fixed.get('I', {}), fixed.get('J', {})
+    return all(i in fI for i in inst.I) and all(j in fJ for j in inst.J)
+
+
+def _satisfies_fixed(sol: Solution,
+                     fixed: Optional[Dict[str, Dict[int, int]]]) -> bool:
+    """True nếu pattern mở/đóng của sol đúng với mọi biến bị fix."""
+    fixed = fixed or {}
+    return (all(int(sol.open_I[i]) == int(v) for i, v in fixed.get('I', {}).items()) and
+            all(int(sol.open_J[j]) == int(v) for j, v in fixed.get('J', {}).items()))
+
+
 def solve_full_mip(inst: TSCFLPInstance,
                    time_limit: Optional[float] = None,
-                   fixed: Optional[Dict[str, Dict[int, int]]] = None
+                   fixed: Optional[Dict[str, Dict[int, int]]] = None,
+                   cache=None,
+                   backend: str = DEFAULT_BACKEND,
+                   warm_start: Optional[Solution] = None,
+                   preprocess: bool = False
                    ) -> Solution:
     """
-    Giải đầy đủ mô hình MILP của TSCFLP bằng PuLP (CBC).
+    Giải đầy đủ mô hình MILP của TSCFLP bằng PuLP (CBC) hoặc backend khác.
+
+    Model chỉ được dựng 1 lần cho mỗi instance và backend (xem get_model),
+    các lần gọi sau chỉ đổi bound của các biến bị fix.
+
+    Nếu fixed-set fix toàn bộ x_i và y_j thì không gọi CBC: phần còn lại là
+    min-cost flow, giải trực tiếp bằng solve_min_cost_flow (cost trùng với MILP,
+    bằng inf nếu pattern không đủ capacity; trường hợp này được phát hiện bằng
+    phép so sánh tổng capacity trước, không cần giải luồng, xem tscflp_screen.py).
 
     Parameters
     ----------
@@ -97,71 +469,90 @@ def solve_full_mip(inst: TSCFLPInstance,
               'I': {i: 0 hoặc 1, ...},
               'J': {j: 0 hoặc 1, ...}
             }
+    cache : PatternCache, optional
+        Cache kết quả theo fixed pattern (xem tscflp_cache.py).
+        Nếu pattern đã có trong cache thì trả về ngay, không gọi solver.
+    backend : str
+        Tên backend trong SOLVER_BACKENDS: "cbc" (PuLP, gọi CBC bên ngoài),
+        "highs" (scipy.optimize.milp, giải ngay trong process),
+        "sparse" (HiGHS trên tập cung ứng viên, cho instance lớn) hoặc
+        "benders" (master x, y + subproblem LP luồng, cut giữ lại giữa các lần giải).
+    warm_start : Solution, optional
+        Lời giải đã biết (incumbent), ví dụ base solution B của MFSS.
+        Nếu pattern của nó thỏa fixed-set thì luồng tối ưu của pattern đó
+        (tính bằng min-cost flow) được đưa cho solver làm MIP start,
+        và kết quả trả về không bao giờ tệ hơn incumbent.
+        (scipy.optimize.milp chưa nhận MIP start nên backend "highs"
+        chỉ dùng incumbent làm cận trên cho kết quả trả về.)
+    preprocess : bool
+        True: giải trên instance đã rút gọn (tscflp_preprocess.py: đóng facility
+        bị trội / không có capacity, bỏ khách không có demand, facility bắt
+        buộc mở có chi phí mở tính sẵn), lời giải được đổi về chỉ số và cost
+        của instance gốc. Nếu fixed-set mở 1 facility đã bị đóng khi rút gọn
+        thì giải trên instance gốc như bình thường.
 
     Returns
     -------
     Solution
         Cost tối ưu (hoặc tốt nhất trong time limit) và pattern mở/đóng facility.
     """
-    I, J, K = inst.I, inst.J, inst.K
-    f, g, U, V, D = inst.f, inst.g, inst.U, inst.V, inst.D
-    c, d = inst.c, inst.d
-
-    # Tạo model tối thiểu hóa
-    prob = pl.LpProblem("TSCFLP", pl.LpMinimize)
-
-    # Biến nhị phân: x_i = 1 nếu mở nhà máy i
-    x = pl.LpVariable.dicts("x", I, lowBound=0, upBound=1, cat="Binary")
-    # Biến nhị phân: y_j = 1 nếu mở kho j
-    y = pl.LpVariable.dicts("y", J, lowBound=0, upBound=1, cat="Binary")
-
-    # Biến luồng: w_ij = lượng hàng từ nhà máy i -> kho j
-    w = pl.LpVariable.dicts("w", (I, J), lowBound=0, cat="Continuous")
-    # Biến luồng: z_jk = lượng hàng từ kho j -> khách k
-    z = pl.LpVariable.dicts("z", (J, K), lowBound=0, cat="Continuous")
-
-    # --------- Objective: (1) trong bài báo ---------
-    prob += (
-        pl.lpSum(f[i] * x[i] for i in I) +                     # chi phí mở nhà máy
-        pl.lpSum(g[j] * y[j] for j in J) +                     # chi phí mở kho
-        pl.lpSum(c[i][j] * w[i][j] for i in I for j in J) +    # chi phí vận chuyển i->j
-        pl.lpSum(d[j][k] * z[j][k] for j in J for k in K)      # chi phí vận chuyển j->k
-    )
-
-    # --------- Ràng buộc capacity nhà máy: (2) ---------
-    for i in I:
-        prob += pl.lpSum(w[i][j] for j in J) <= U[i] * x[i]
-
-    # --------- Ràng buộc capacity kho: (3) ---------
-    for j in J:
-        prob += pl.lpSum(z[j][k] for k in K) <= V[j] * y[j]
-
-    # --------- Bảo toàn luồng qua kho: (4) ---------
-    for j in J:
-        prob += pl.lpSum(w[i][j] for i in I) == pl.lpSum(z[j][k] for k in K)
-
-    # --------- Thỏa nhu cầu khách hàng: (5) ---------
-    for k in K:
-        prob += pl.lpSum(z[j][k] for j in J) == D[k]
-
-    # --------- Nếu có fixed-set: thêm ràng buộc x_i / y_j = 0/1 ---------
-    if fixed is not None:
-        # fixed['I'] chứa list i phải fix
-        for i, val in fixed.get('I', {}).items():
-            prob += x[i] == int(val)
-        # fixed['J'] chứa list j phải fix
-        for j, val in fixed.get('J', {}).items():
-            prob += y[j] == int(val)
-
-    # Chọn solver CBC (mặc định của PuLP) + giới hạn thời gian
-    solver = pl.PULP_CBC_CMD(msg=True, timeLimit=time_limit)
-    prob.solve(solver)
-
-    cost = pl.value(prob.objective)
-    open_I = [int(round(x[i].value())) for i in I]
-    open_J = [int(round(y[j].value())) for j in J]
-
-    return Solution(cost=cost, open_I=open_I, open_J=open_J)
+    if preprocess:
+        from tscflp_preprocess import get_preprocessed
+        pre = get_preprocessed(inst)
+        if pre.representable(fixed):
+            sol = solve_full_mip(pre.inst, time_limit=time_limit,
+                                 fixed=pre.reduce_fixed(fixed), cache=cache,
+                                 backend=backend,
+                                 warm_start=pre.reduce_solution(warm_start))
+            return pre.expand(sol)
+
+    if cache is not None:
+        sol = cache.get(inst, fixed, time_limit)
+        if sol is not None:
+            count("cache_hits")
+            return sol
+
+    if is_fully_fixed(inst, fixed):
+        open_I = [int(fixed['I'][i]) for i in inst.I]
+        open_J = [int(fixed['J'][j]) for j in inst.J]
+        from tscflp_screen import get_screen
+        if not get_screen(inst).capacity_feasible(open_I, open_J):
+            return Solution(cost=float('inf'), open_I=open_I, open_J=open_J)
+        count("flow_calls")
+        with span("mip.flow"):
+            flow = solve_min_cost_flow(inst, open_I, open_J)
+        sol = Solution(cost=float(flow.cost), open_I=open_I, open_J=open_J,
+                       flow=flow.sparse() if flow.feasible else None)
+        if cache is not None:
+            cache.put(inst, fixed, time_limit, sol, optimal=True)
+        return sol
+
+    model = get_model(inst, backend)
+
+    start = None
+    if warm_start is not None and _satisfies_fixed(warm_start, fixed):
+        if warm_start.flow is not None:
+            # luồng đã lưu kèm lời giải: không phải giải lại min-cost flow
+            start_cost, start_flow = float(warm_start.cost), warm_start.flow
+        else:
+            with span("mip.warm_start"):
+                flow = solve_min_cost_flow(inst, warm_start.open_I, warm_start.open_J)
+            start_cost = float(flow.cost)
+            start_flow = flow.sparse() if flow.feasible else None
+        if start_flow is not None:
+            start = (warm_start.open_I, warm_start.open_J, start_flow.w, start_flow.z)
+
+    count("solver_calls")
+    with span("mip.solve", backend=backend):
+        sol = model.solve(time_limit=time_limit, fixed=fixed, warm_start=start)
+    if start is not None and not sol.cost <= start_cost:
+        # solver không tìm được lời giải tốt hơn incumbent trong time limit
+        sol = Solution(cost=start_cost, open_I=[int(v) for v in start[0]],
+                       open_J=[int(v) for v in start[1]], flow=start_flow)
+
+    if cache is not None:
+        cache.put(inst, fixed, time_limit, sol, optimal=model.last_optimal)
+    return sol
 
 
 # =====================================================================
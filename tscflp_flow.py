@@ -0,0 +1,401 @@
+# tscflp_flow.py
+"""
+Bước SolveMinCostFlow: khi mọi facility đã được quyết định mở/đóng,
+bài toán còn lại chỉ là min-cost flow 2 tầng (nhà máy -> kho -> khách).
+
+Cài đặt thuật toán Successive Shortest Paths (SSP) bằng NumPy:
+- Mạng: nguồn s -> nhà máy i (capacity U_i) -> kho j (capacity V_j, tách
+  thành 2 nút j_in, j_out) -> khách k (nhu cầu D_k) -> đích t
+- Mỗi bước tìm đường đi ngắn nhất s -> t trên đồ thị thặng dư bằng
+  Bellman-Ford theo từng tầng (vector hóa trên ma trận c, d), rồi đẩy
+  lượng hàng lớn nhất có thể dọc đường đó
+- Tầng khách hàng được gộp thành ma trận "chuyển khách" |J| x |J| cập nhật
+  dần, nên mỗi bước chỉ tốn O(|J|^2) cộng phần khách bị ảnh hưởng
+- Kết quả là luồng tối ưu w(i,j), z(j,k) và cost, trùng với cost của MILP
+  khi fix toàn bộ x_i, y_j
+
+Không cần gọi CBC, nên nhanh hơn nhiều so với solve_full_mip cho bước này.
+"""
+
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+EPS = 1e-9      # ngưỡng coi 1 lượng hàng / capacity là 0
+INF = np.inf
+
+
+@dataclass
+class FlowResult:
+    """
+    Kết quả bước min-cost flow cho 1 pattern mở/đóng facility.
+
+    cost            : tổng chi phí (mở facility + vận chuyển), inf nếu không khả thi
+    transport_cost  : chi phí vận chuyển i->j và j->k
+    w               : ma trận |I| x |J| lượng hàng nhà máy -> kho
+    z               : ma trận |J| x |K| lượng hàng kho -> khách
+    feasible        : False nếu các facility mở không đủ capacity
+    """
+    cost: float
+    transport_cost: float
+    w: np.ndarray
+    z: np.ndarray
+    feasible: bool
+
+    def sparse(self) -> "SparseFlow":
+        """Luồng dạng thưa (chỉ các cung có hàng) để lưu kèm Solution."""
+        return SparseFlow.from_dense(self.w, self.z)
+
+
+class SparseFlow:
+    """
+    Luồng w(i,j), z(j,k) dạng COO: chỉ lưu các cung có hàng (> EPS).
+
+    w_idx, z_idx : chỉ số phẳng (int32 / int64) của cung trong ma trận |I| x |J|, |J| x |K|
+    w_val, z_val : lượng hàng tương ứng (float64)
+    shape_w, shape_z : kích thước ma trận đầy đủ
+    """
+    __slots__ = ('shape_w', 'shape_z', 'w_idx', 'w_val', 'z_idx', 'z_val')
+
+    def __init__(self, shape_w, shape_z, w_idx, w_val, z_idx, z_val):
+        self.shape_w, self.shape_z = tuple(shape_w), tuple(shape_z)
+        self.w_idx, self.w_val = w_idx, w_val
+        self.z_idx, self.z_val = z_idx, z_val
+
+    @staticmethod
+    def _coo(a: np.ndarray):
+        flat = np.asarray(a, dtype=np.float64).ravel()
+        idx = np.flatnonzero(flat > EPS)
+        dtype = np.int32 if flat.size < 2 ** 31 else np.int64
+        return idx.astype(dtype), flat[idx]
+
+    @classmethod
+    def from_dense(cls, w: np.ndarray, z: np.ndarray) -> "SparseFlow":
+        return cls(np.shape(w), np.shape(z), *cls._coo(w), *cls._coo(z))
+
+    def _dense(self, shape, idx, val) -> np.ndarray:
+        out = np.zeros(shape)
+        out.ravel()[idx] = val
+        return out
+
+    @property
+    def w(self) -> np.ndarray:
+        """Ma trận w đầy đủ |I| x |J| (tạo mới mỗi lần gọi)."""
+        return self._dense(self.shape_w, self.w_idx, self.w_val)
+
+    @property
+    def z(self) -> np.ndarray:
+        """Ma trận z đầy đủ |J| x |K| (tạo mới mỗi lần gọi)."""
+        return self._dense(self.shape_z, self.z_idx, self.z_val)
+
+    def z_arcs(self):
+        """Các cung kho -> khách có hàng: (j, k, lượng)."""
+        j, k = np.divmod(self.z_idx, self.shape_z[1])
+        return j, k, self.z_val
+
+    def w_arcs(self):
+        """Các cung nhà máy -> kho có hàng: (i, j, lượng)."""
+        i, j = np.divmod(self.w_idx, self.shape_w[1])
+        return i, j, self.w_val
+
+    @property
+    def nbytes(self) -> int:
+        return (self.w_idx.nbytes + self.w_val.nbytes +
+                self.z_idx.nbytes + self.z_val.nbytes)
+
+    def __reduce__(self):
+        return (SparseFlow, (self.shape_w, self.shape_z, self.w_idx, self.w_val,
+                             self.z_idx, self.z_val))
+
+
+def _upstream_distances(res_U, thr, V, w, c, T, tol):
+    """
+    Bellman-Ford trên phần "thượng nguồn" của đồ thị thặng dư:
+    các nút nhà máy i, j_in, j_out (tầng khách hàng đã được gộp vào ma trận
+    T: chuyển 1 đơn vị hàng của 1 khách từ kho j sang kho j').
+
+    Trả về khoảng cách từ nguồn s và con trỏ truy vết:
+        pred_I[i]    : -1 nếu từ s, j nếu qua cạnh ngược j_in -> i
+        pred_Jin[j]  : i nếu từ nhà máy i, -1 nếu qua cạnh ngược j_out -> j_in
+        pred_Jout[j] : -1 nếu từ j_in, j' nếu qua cạnh chuyển khách j'_out -> j_out
+    """
+    nI, nJ = c.shape
+    ar_I, ar_J = np.arange(nI), np.arange(nJ)
+
+    dI = np.where(res_U > EPS, 0.0, INF)
+    pred_I = np.full(nI, -1)
+    dJin = np.full(nJ, INF)
+    pred_Jin = np.full(nJ, -1)
+    dJout = np.full(nJ, INF)
+    pred_Jout = np.full(nJ, -1)
+
+    has_w = w > EPS
+    has_thr = thr > EPS
+    has_cap = thr < V - EPS
+
+    for _ in range(2 * (nI + 2 * nJ) + 2):
+        changed = False
+
+        # i -> j_in (cạnh xuôi, capacity vô hạn, chi phí c_ij)
+        cand = dI[:, None] + c
+        best = cand.argmin(axis=0)
+        val = cand[best, ar_J]
+        upd = val < dJin - tol
+        if upd.any():
+            dJin[upd], pred_Jin[upd] = val[upd], best[upd]
+            changed = True
+
+        # j_out -> j_in (cạnh ngược, có khi đang có hàng đi qua kho)
+        val = np.where(has_thr, dJout, INF)
+        upd = val < dJin - tol
+        if upd.any():
+            dJin[upd], pred_Jin[upd] = val[upd], -1
+            changed = True
+
+        # j_in -> j_out (cạnh xuôi, còn capacity kho)
+        val = np.where(has_cap, dJin, INF)
+        upd = val < dJout - tol
+        if upd.any():
+            dJout[upd], pred_Jout[upd] = val[upd], -1
+            changed = True
+
+        # j'_out -> k -> j_out (chuyển 1 khách đang nhận hàng từ j sang j')
+        cand = dJout[:, None] + T
+        best = cand.argmin(axis=0)
+        val = cand[best, ar_J]
+        upd = val < dJout - tol
+        if upd.any():
+            dJout[upd], pred_Jout[upd] = val[upd], best[upd]
+            changed = True
+
+        # j_in -> i (cạnh ngược, có khi w_ij > 0)
+        # (cạnh không có: c = inf, w = 0 -> thay bằng 0 để tránh inf - inf)
+        cand = np.where(has_w, dJin[None, :] - np.where(has_w, c, 0.0), INF)
+        best = cand.argmin(axis=1)
+        val = cand[ar_I, best]
+        upd = val < dI - tol
+        if upd.any():
+            dI[upd], pred_I[upd] = val[upd], best[upd]
+            changed = True
+
+        if not changed:
+            return dI, pred_I, dJin, pred_Jin, dJout, pred_Jout
+
+    raise RuntimeError("Bellman-Ford không hội tụ (chu trình âm?)")
+
+
+def min_cost_flow(U, V, D, c, d):
+    """
+    Giải min-cost flow 2 tầng bằng Successive Shortest Paths.
+
+    Parameters
+    ----------
+    U : array (nI,)       capacity nhà máy (nhà máy đóng -> truyền vào 0 hoặc bỏ ra)
+    V : array (nJ,)       capacity kho
+    D : array (nK,)       nhu cầu khách
+    c : array (nI, nJ)    chi phí đơn vị nhà máy -> kho (inf = không có cạnh)
+    d : array (nJ, nK)    chi phí đơn vị kho -> khách (inf = không có cạnh)
+
+    Returns
+    -------
+    (transport_cost, w, z, feasible)
+
+    Ghi chú cài đặt
+    ---------------
+    Tầng khách hàng chiếm phần lớn đồ thị (|J| x |K| cạnh), nên:
+    - Các cạnh ngược k -> j_out được gộp thành ma trận T (|J| x |J|):
+      T[j', j] = min_{k đang nhận hàng từ j} (d[j', k] - d[j, k]),
+      chỉ cập nhật lại cột j khi tập khách của kho j thay đổi.
+    - Khoảng cách tới khách chưa đủ hàng chỉ tính lại cho những khách có
+      kho "tốt nhất" vừa thay đổi khoảng cách (khoảng cách trong SSP không giảm).
+    - Nếu lần đẩy hàng chỉ làm đầy nhu cầu của khách cuối đường (không cạnh
+      nào khác bị bão hòa) thì không cạnh nào biến mất khỏi đồ thị thặng dư,
+      nên khoảng cách cũ vẫn đúng và bỏ qua bước Bellman-Ford ở vòng sau.
+    """
+    U = np.asarray(U, dtype=np.float64)
+    V = np.asarray(V, dtype=np.float64)
+    D = np.asarray(D, dtype=np.float64)
+    c = np.asarray(c, dtype=np.float64)
+    d = np.asarray(d, dtype=np.float64)
+    nI, nJ, nK = len(U), len(V), len(D)
+
+    w = np.zeros((nI, nJ))
+    z = np.zeros((nJ, nK))
+
+    total = D.sum()
+    # Đồ thị 2 tầng đầy đủ: khả thi <=> đủ capacity ở cả 2 tầng
+    # (nếu có cạnh inf thì phần tìm đường bên dưới sẽ phát hiện)
+    if U.sum() < total - EPS or V.sum() < total - EPS:
+        return INF, w, z, False
+
+    res_U = U.copy()          # capacity còn lại của nhà máy
+    thr = np.zeros(nJ)        # lượng hàng đang đi qua kho j
+    res_D = D.copy()          # nhu cầu còn lại của khách
+
+    finite = np.concatenate([c[np.isfinite(c)], d[np.isfinite(d)], [1.0]])
+    tol = 1e-12 * (1.0 + np.abs(finite).max()) * (nI + nJ + nK)
+
+    # Ma trận chuyển khách giữa các kho (xem docstring) + khách đạt min
+    T = np.full((nJ, nJ), INF)
+    T_arg = np.full((nJ, nJ), -1)
+
+    def refresh_T(j):
+        ks = np.flatnonzero(z[j] > EPS)
+        if len(ks) == 0:
+            T[:, j], T_arg[:, j] = INF, -1
+            return
+        vals = d[:, ks] - d[j, ks]
+        best = vals.argmin(axis=1)
+        T[:, j] = vals[np.arange(nJ), best]
+        T_arg[:, j] = ks[best]
+        T[j, j], T_arg[j, j] = INF, -1
+
+    # Khoảng cách tới từng khách (chỉ có nghĩa với khách còn nhu cầu)
+    dK = np.full(nK, INF)
+    arg_K = np.full(nK, -1)
+    dJout_prev = None
+    need_distances = True
+
+    def refresh_dK(ks, dJout):
+        if len(ks) == 0:
+            return
+        cand = dJout[:, None] + d[:, ks]
+        best = cand.argmin(axis=0)
+        dK[ks] = cand[best, np.arange(len(ks))]
+        arg_K[ks] = best
+
+    while True:
+        unmet = np.flatnonzero(res_D > EPS)
+        if len(unmet) == 0:
+            break
+
+        if need_distances:
+            dI, pred_I, dJin, pred_Jin, dJout, pred_Jout = _upstream_distances(
+                res_U, thr, V, w, c, T, tol)
+
+            # --------- Cập nhật khoảng cách tới các khách còn nhu cầu ---------
+            if dJout_prev is None:
+                refresh_dK(unmet, dJout)
+            else:
+                # kho không tới được (inf ở cả 2 lần) chỉ so sánh bằng, tránh inf - inf
+                same = dJout == dJout_prev
+                both = np.isfinite(dJout) & np.isfinite(dJout_prev)
+                same[both] |= np.abs(dJout[both] - dJout_prev[both]) <= tol
+                if np.any(~same & ~(dJout > dJout_prev)):
+                    # có kho giảm khoảng cách (chỉ do sai số) -> tính lại toàn bộ
+                    refresh_dK(unmet, dJout)
+                else:
+                    refresh_dK(unmet[~same[arg_K[unmet]]], dJout)
+            dJout_prev = dJout
+
+        # ------------- Chọn khách còn nhu cầu có đường đi rẻ nhất -------------
+        k_end = int(unmet[dK[unmet].argmin()])
+        if not np.isfinite(dK[k_end]):
+            return INF, w, z, False
+
+        # ------------- Truy vết đường đi, tính lượng hàng đẩy được -------------
+        # Mỗi cạnh: (loại, a, b); loại dùng để biết cập nhật biến nào
+        path = [('z+', arg_K[k_end], k_end)]
+        delta = res_D[k_end]
+        node, idx = 'Jout', arg_K[k_end]
+        while True:
+            if node == 'Jout':
+                jp = pred_Jout[idx]
+                if jp >= 0:
+                    # khách k chuyển từ kho idx sang kho jp
+                    k = T_arg[jp, idx]
+                    path.append(('z-', idx, k))
+                    path.append(('z+', jp, k))
+                    delta = min(delta, z[idx, k])
+                    idx = jp
+                else:
+                    path.append(('thr+', idx, None))
+                    delta = min(delta, V[idx] - thr[idx])
+                    node = 'Jin'
+            elif node == 'Jin':
+                i = pred_Jin[idx]
+                if i >= 0:
+                    path.append(('w+', i, idx))
+                    node, idx = 'I', i
+                else:
+                    path.append(('thr-', idx, None))
+                    delta = min(delta, thr[idx])
+                    node = 'Jout'
+            else:  # node == 'I'
+                j = pred_I[idx]
+                if j >= 0:
+                    path.append(('w-', idx, j))
+                    delta = min(delta, w[idx, j])
+                    node, idx = 'Jin', j
+                else:
+                    delta = min(delta, res_U[idx])
+                    res_U[idx] -= delta
+                    path_source = idx
+                    break
+
+        # ------------- Đẩy delta đơn vị hàng dọc đường đi -------------
+        # need_distances: có cạnh nào (ngoài nhu cầu khách cuối) bị bão hòa không
+        touched = set()
+        need_distances = res_U[path_source] <= EPS
+        for kind, a, b in path:
+            if kind == 'z+':
+                z[a, b] += delta
+                touched.add(a)
+            elif kind == 'z-':
+                z[a, b] -= delta
+                touched.add(a)
+                need_distances |= z[a, b] <= EPS
+            elif kind == 'w+':
+                w[a, b] += delta
+            elif kind == 'w-':
+                w[a, b] -= delta
+                need_distances |= w[a, b] <= EPS
+            elif kind == 'thr+':
+                thr[a] += delta
+                need_distances |= thr[a] >= V[a] - EPS
+            else:
+                thr[a] -= delta
+                need_distances |= thr[a] <= EPS
+        res_D[k_end] -= delta
+        need_distances |= res_D[k_end] > EPS
+        for j in touched:
+            refresh_T(j)
+
+    np.clip(w, 0.0, None, out=w)
+    np.clip(z, 0.0, None, out=z)
+    # chỉ nhân trên các cung có hàng (cạnh không có = inf, inf * 0 -> nan)
+    has_w, has_z = w > 0, z > 0
+    transport = float(np.sum(c[has_w] * w[has_w]) + np.sum(d[has_z] * z[has_z]))
+    return transport, w, z, True
+
+
+def solve_min_cost_flow(inst, open_I: List[int], open_J: List[int]) -> FlowResult:
+    """
+    Giải luồng tối ưu cho pattern (open_I, open_J) của instance.
+
+    Chỉ đưa các facility đang mở vào mạng, rồi trả w, z về đúng kích thước
+    |I| x |J| và |J| x |K| của instance.
+    """
+    oI = np.flatnonzero(np.asarray(open_I) > 0)
+    oJ = np.flatnonzero(np.asarray(open_J) > 0)
+
+    U = np.asarray(inst.U, dtype=np.float64)[oI]
+    V = np.asarray(inst.V, dtype=np.float64)[oJ]
+    D = np.asarray(inst.D, dtype=np.float64)
+    # chỉ lấy các hàng / cột của facility mở (c, d có thể là LazyCostMatrix)
+    c = np.asarray(inst.c[np.ix_(oI, oJ)], dtype=np.float64)
+    d = np.asarray(inst.d[oJ], dtype=np.float64)
+
+    fixed_cost = (float(np.sum(np.asarray(inst.f, dtype=np.float64)[oI])) +
+                  float(np.sum(np.asarray(inst.g, dtype=np.float64)[oJ])))
+
+    transport, w_sub, z_sub, feasible = min_cost_flow(U, V, D, c, d)
+
+    w = np.zeros((len(inst.I), len(inst.J)))
+    z = np.zeros((len(inst.J), len(inst.K)))
+    w[np.ix_(oI, oJ)] = w_sub
+    z[oJ] = z_sub
+
+    cost = fixed_cost + transport if feasible else INF
+    return FlowResult(cost=cost, transport_cost=transport, w=w, z=z, feasible=feasible)
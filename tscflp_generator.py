@@ -0,0 +1,187 @@
+# tscflp_generator.py
+"""
+Sinh instance TSCFLP ngẫu nhiên kích thước lớn để đo hiệu năng.
+
+- Tọa độ nhà máy / kho / khách trong hình vuông [0, 1]^2:
+    + "uniform"   : rải đều ngẫu nhiên (random geometric)
+    + "clustered" : khách và kho tập trung quanh một số tâm (như các khu đô thị),
+                    nhà máy vẫn rải đều
+- Chi phí vận chuyển c, d = khoảng cách Euclid x đơn giá, tính vector hóa
+  (ma trận vài triệu phần tử chỉ mất vài giây)
+- Độ "chật" capacity điều khiển bằng tightness = tổng capacity / tổng demand
+  của từng tầng (càng gần 1 càng phải mở nhiều facility)
+- Cùng seed -> cùng instance
+"""
+
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from tscflp_core import TSCFLPInstance
+
+# Một số kích thước chuẩn (|I|, |J|, |K|) để benchmark
+PRESETS = {
+    "small": (10, 50, 1000),
+    "medium": (30, 200, 10000),
+    "large": (50, 500, 100000),
+}
+
+
+def generate_points(n_primary: int,
+                    n_secondary: int,
+                    n_customers: int,
+                    layout: str = "uniform",
+                    n_clusters: int = 10,
+                    cluster_std: float = 0.05,
+                    rng: Optional[np.random.Generator] = None
+                    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sinh tọa độ (mảng n x 2 trong [0, 1]^2) cho nhà máy, kho, khách.
+
+    layout = "clustered": chọn n_clusters tâm ngẫu nhiên, mỗi khách / kho
+    nằm quanh 1 tâm (phân phối chuẩn, độ lệch cluster_std).
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    pos_I = rng.random((n_primary, 2))
+
+    if layout == "uniform":
+        pos_J = rng.random((n_secondary, 2))
+        pos_K = rng.random((n_customers, 2))
+    elif layout == "clustered":
+        centers = rng.random((n_clusters, 2))
+        # tâm đông dân hơn thì nhiều khách hơn
+        weights = rng.random(n_clusters) + 0.5
+        weights /= weights.sum()
+
+        def around(n):
+            which = rng.choice(n_clusters, size=n, p=weights)
+            pts = centers[which] + rng.normal(0.0, cluster_std, size=(n, 2))
+            return np.clip(pts, 0.0, 1.0)
+
+        pos_J = around(n_secondary)
+        pos_K = around(n_customers)
+    else:
+        raise ValueError(f"layout không hợp lệ: {layout!r} (uniform / clustered)")
+    return pos_I, pos_J, pos_K
+
+
+def distance_matrix(a: np.ndarray, b: np.ndarray, scale: float = 1.0,
+                    dtype=np.float64) -> np.ndarray:
+    """Ma trận khoảng cách Euclid |a| x |b| nhân với scale."""
+    dx = np.subtract.outer(a[:, 0].astype(dtype), b[:, 0].astype(dtype))
+    dy = np.subtract.outer(a[:, 1].astype(dtype), b[:, 1].astype(dtype))
+    np.hypot(dx, dy, out=dx)
+    if scale != 1.0:
+        dx *= dtype(scale)
+    return dx
+
+
+def _capacities(rng: np.random.Generator, n: int, total: float) -> np.ndarray:
+    """n capacity ngẫu nhiên (chênh nhau tối đa 3 lần) có tổng = total."""
+    raw = rng.uniform(1.0, 3.0, n)
+    return raw * (total / raw.sum())
+
+
+def generate_instance(n_primary: int,
+                      n_secondary: int,
+                      n_customers: int,
+                      layout: str = "uniform",
+                      tightness: float = 1.5,
+                      tightness_secondary: Optional[float] = None,
+                      demand_range: Tuple[int, int] = (5, 35),
+                      c_rate: float = 50.0,
+                      d_rate: float = 100.0,
+                      n_clusters: int = 10,
+                      seed: Optional[int] = 0,
+                      dtype=np.float64) -> TSCFLPInstance:
+    """
+    Sinh 1 instance TSCFLP ngẫu nhiên.
+
+    Parameters
+    ----------
+    n_primary, n_secondary, n_customers : int
+        |I|, |J|, |K|.
+    layout : str
+        "uniform" hoặc "clustered" (xem generate_points).
+    tightness : float
+        Tổng capacity nhà máy / tổng demand (> 1; càng nhỏ càng chật).
+    tightness_secondary : float, optional
+        Tổng capacity kho / tổng demand (mặc định = tightness).
+    demand_range : (int, int)
+        Demand mỗi khách là số nguyên ngẫu nhiên trong [a, b].
+    c_rate, d_rate : float
+        Đơn giá vận chuyển trên 1 đơn vị khoảng cách (hàng / đơn vị hàng)
+        cho chặng nhà máy -> kho và kho -> khách.
+    n_clusters : int
+        Số cụm khi layout = "clustered".
+    seed : int, optional
+        Seed cho numpy Generator.
+    dtype : type
+        Kiểu số thực của instance (np.float32 để giảm một nửa bộ nhớ).
+
+    Returns
+    -------
+    TSCFLPInstance
+    """
+    points, data = generate_data(n_primary, n_secondary, n_customers, layout=layout,
+                                 tightness=tightness,
+                                 tightness_secondary=tightness_secondary,
+                                 demand_range=demand_range, c_rate=c_rate,
+                                 d_rate=d_rate, n_clusters=n_clusters, seed=seed)
+    pos_I, pos_J, pos_K = points
+    c = distance_matrix(pos_I, pos_J, c_rate, dtype)
+    d = distance_matrix(pos_J, pos_K, d_rate, dtype)
+    return TSCFLPInstance(c=c, d=d, dtype=dtype, **data)
+
+
+def generate_data(n_primary: int,
+                  n_secondary: int,
+                  n_customers: int,
+                  layout: str = "uniform",
+                  tightness: float = 1.5,
+                  tightness_secondary: Optional[float] = None,
+                  demand_range: Tuple[int, int] = (5, 35),
+                  c_rate: float = 50.0,
+                  d_rate: float = 100.0,
+                  n_clusters: int = 10,
+                  seed: Optional[int] = 0):
+    """
+    Phần ngẫu nhiên của generate_instance (cùng tham số):
+    trả về ((pos_I, pos_J, pos_K), {'f', 'U', 'g', 'V', 'D'}), chưa tính c, d.
+    """
+    if tightness <= 1.0 or (tightness_secondary is not None and tightness_secondary <= 1.0):
+        raise ValueError("tightness phải > 1 (tổng capacity phải lớn hơn tổng demand)")
+    tightness_secondary = tightness if tightness_secondary is None else tightness_secondary
+
+    rng = np.random.default_rng(seed)
+    points = generate_points(n_primary, n_secondary, n_customers,
+                             layout=layout, n_clusters=n_clusters, rng=rng)
+
+    D = rng.integers(demand_range[0], demand_range[1] + 1, n_customers).astype(np.float64)
+    total = D.sum()
+    U = _capacities(rng, n_primary, tightness * total)
+    V = _capacities(rng, n_secondary, tightness_secondary * total)
+
+    # Chi phí mở tăng chậm hơn capacity (lợi thế quy mô) + nhiễu ngẫu nhiên,
+    # cỡ chi phí vận chuyển trung bình của lượng hàng facility đó phục vụ
+    f = np.sqrt(U) * rng.uniform(0.8, 1.2, n_primary) * c_rate * np.sqrt(total / n_primary)
+    g = np.sqrt(V) * rng.uniform(0.8, 1.2, n_secondary) * d_rate * np.sqrt(total / n_secondary)
+
+    return points, {'f': f, 'U': U, 'g': g, 'V': V, 'D': D}
+
+
+def generate_preset(name: str, seed: Optional[int] = 0, **kwargs) -> TSCFLPInstance:
+    """Sinh instance theo kích thước chuẩn trong PRESETS ("small" / "medium" / "large")."""
+    if name not in PRESETS:
+        raise ValueError(f"Không có preset '{name}' (có: {', '.join(PRESETS)})")
+    return generate_instance(*PRESETS[name], seed=seed, **kwargs)
+
+
+if __name__ == "__main__":
+    for name, (nI, nJ, nK) in PRESETS.items():
+        start = time.perf_counter()
+        inst = generate_preset(name, layout="clustered")
+        elapsed = time.perf_counter() - start
+        print(f"{name:>6}: |I|={nI}, |J|={nJ}, |K|={nK}, "
+              f"d có {inst.d.size:,} phần tử, sinh trong {elapsed:.2f} s")
@@ -0,0 +1,186 @@
+# tscflp_highs.py
+"""
+Backend giải MILP trong cùng process: scipy.optimize.milp (HiGHS).
+
+- Ma trận ràng buộc (2)-(5) được dựng 1 lần dưới dạng scipy.sparse
+  (CSR) trực tiếp từ các mảng của instance, không qua biểu thức PuLP
+- Mỗi lần giải chỉ đổi mảng bound của x_i, y_j theo fixed-set
+- Không ghi file LP/MPS, không gọi process CBC bên ngoài
+
+Thứ tự biến trong vector nghiệm:
+    [ x (|I|) | y (|J|) | w (|I|*|J|, theo hàng i) | z (|J|*|K|, theo hàng j) ]
+"""
+
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import milp, LinearConstraint, Bounds
+
+from tscflp_core import TSCFLPInstance, Solution
+from tscflp_flow import SparseFlow
+from tscflp_profile import span
+
+
+def build_constraint_matrix(inst: TSCFLPInstance, w_arcs=None, z_arcs=None):
+    """
+    Dựng ma trận ràng buộc A (CSR) và vector lb, ub của các ràng buộc:
+
+        (2)  sum_j w_ij - U_i x_i <= 0          (|I| hàng)
+        (3)  sum_k z_jk - V_j y_j <= 0          (|J| hàng)
+        (4)  sum_i w_ij - sum_k z_jk = 0        (|J| hàng)
+        (5)  sum_j z_jk = D_k                   (|K| hàng)
+
+    w_arcs = (i_idx, j_idx), z_arcs = (j_idx, k_idx): chỉ tạo biến luồng
+    cho các cung này (mặc định: mọi cung, theo hàng i / hàng j), xem
+    tscflp_sparse.py.
+
+    Returns
+    -------
+    (A, lb, ub)
+    """
+    nI, nJ, nK = len(inst.I), len(inst.J), len(inst.K)
+    if w_arcs is None:
+        w_arcs = np.divmod(np.arange(nI * nJ), nJ)
+    if z_arcs is None:
+        z_arcs = np.divmod(np.arange(nJ * nK), nK)
+    ii, jj = w_arcs                                  # w_ij -> (i, j)
+    jz, kz = z_arcs                                  # z_jk -> (j, k)
+    nW, nZ = len(ii), len(jz)
+
+    ox, oy, ow = 0, nI, nI + nJ
+    oz = ow + nW
+    n_var = oz + nZ
+
+    r2, r3, r4, r5 = 0, nI, nI + nJ, nI + 2 * nJ
+    n_row = r5 + nK
+
+    w_col = ow + np.arange(nW)
+    z_col = oz + np.arange(nZ)
+
+    rows = np.concatenate([
+        r2 + ii, r2 + np.arange(nI),                 # (2)
+        r3 + jz, r3 + np.arange(nJ),                 # (3)
+        r4 + jj, r4 + jz,                            # (4)
+        r5 + kz,                                     # (5)
+    ])
+    cols = np.concatenate([
+        w_col, ox + np.arange(nI),
+        z_col, oy + np.arange(nJ),
+        w_col, z_col,
+        z_col,
+    ])
+    vals = np.concatenate([
+        np.ones(nW), -np.asarray(inst.U, dtype=np.float64),
+        np.ones(nZ), -np.asarray(inst.V, dtype=np.float64),
+        np.ones(nW), -np.ones(nZ),
+        np.ones(nZ),
+    ])
+    A = sp.csr_matrix((vals, (rows, cols)), shape=(n_row, n_var))
+
+    D = np.asarray(inst.D, dtype=np.float64)
+    lb = np.concatenate([np.full(nI + nJ, -np.inf), np.zeros(nJ), D])
+    ub = np.concatenate([np.zeros(nI + 2 * nJ), D])
+    return A, lb, ub
+
+
+class HighsModel:
+    """
+    Model MILP của TSCFLP cho scipy.optimize.milp, dựng 1 lần cho mỗi instance.
+
+    Cùng giao diện với TSCFLPModel (solve / timing / last_optimal), nên
+    solve_full_mip dùng được cả hai (xem SOLVER_BACKENDS trong tscflp_core).
+    """
+
+    def __init__(self, inst: TSCFLPInstance):
+        start = time.perf_counter()
+
+        nI, nJ = len(inst.I), len(inst.J)
+        self.inst = inst
+        self.nI, self.nJ = nI, nJ
+
+        # --------- Objective: (1) ---------
+        self.cost = np.concatenate([
+            np.asarray(inst.f, dtype=np.float64),
+            np.asarray(inst.g, dtype=np.float64),
+            np.asarray(inst.c, dtype=np.float64).ravel(),
+            np.asarray(inst.d, dtype=np.float64).ravel(),
+        ])
+        n_var = len(self.cost)
+
+        A, lb, ub = build_constraint_matrix(inst)
+        self.constraints = LinearConstraint(A, lb, ub)
+
+        self.integrality = np.zeros(n_var)
+        self.integrality[:nI + nJ] = 1
+        self.var_lb = np.zeros(n_var)
+        self.var_ub = np.full(n_var, np.inf)
+        self.var_ub[:nI + nJ] = 1
+
+        self.build_time = time.perf_counter() - start
+        self.solve_time = 0.0
+        self.n_solves = 0
+        self.last_optimal = False
+
+    def _bounds(self, fixed: Optional[Dict[str, Dict[int, int]]]) -> Bounds:
+        """Bound của biến: x_i, y_j trong [0, 1], biến bị fix thì lb = ub."""
+        lb, ub = self.var_lb.copy(), self.var_ub.copy()
+        if fixed is not None:
+            for i, val in fixed.get('I', {}).items():
+                lb[i] = ub[i] = int(val)
+            for j, val in fixed.get('J', {}).items():
+                lb[self.nI + j] = ub[self.nI + j] = int(val)
+        return Bounds(lb, ub)
+
+    def solve(self,
+              time_limit: Optional[float] = None,
+              fixed: Optional[Dict[str, Dict[int, int]]] = None,
+              warm_start=None
+              ) -> Solution:
+        """
+        Giải model với fixed-set cho trước (xem solve_full_mip).
+        scipy.optimize.milp không nhận MIP start nên warm_start bị bỏ qua
+        (solve_full_mip vẫn dùng incumbent làm cận trên cho kết quả).
+        """
+        start = time.perf_counter()
+
+        options = {"disp": False}
+        if time_limit is not None:
+            # time limit âm: HiGHS bỏ qua option và giải không giới hạn
+            options["time_limit"] = max(0.0, float(time_limit))
+        res = milp(self.cost, constraints=self.constraints,
+                   integrality=self.integrality, bounds=self._bounds(fixed),
+                   options=options)
+
+        # status 0: tối ưu; 1: hết giờ / giới hạn (có thể đã có nghiệm);
+        # còn lại: vô nghiệm / lỗi -> không có lời giải
+        self.last_optimal = res.status == 0
+        with span("mip.extract"):
+            flow = None
+            if res.x is not None:
+                cost = float(res.fun)
+                n_xy, n_w = self.nI + self.nJ, self.nI * self.nJ
+                xy = np.rint(res.x[:n_xy]).astype(int)
+                open_I = xy[:self.nI].tolist()
+                open_J = xy[self.nI:].tolist()
+                # luồng w, z nằm ngay sau x, y trong vector biến
+                flow = SparseFlow.from_dense(res.x[n_xy:n_xy + n_w].reshape(self.nI, self.nJ),
+                                             res.x[n_xy + n_w:].reshape(self.nJ, -1))
+            else:
+                cost = float('inf')
+                open_I = [0] * self.nI
+                open_J = [0] * self.nJ
+
+        self.solve_time += time.perf_counter() - start
+        self.n_solves += 1
+
+        return Solution(cost=cost, open_I=open_I, open_J=open_J, flow=flow)
+
+    def timing(self) -> Dict[str, float]:
+        """Thống kê thời gian dựng model / giải model (giây)."""
+        return {
+            "build_time_seconds": self.build_time,
+            "solve_time_seconds": self.solve_time,
+            "num_solves": self.n_solves,
+        }
@@ -0,0 +1,252 @@
+# tscflp_io.py
+"""
+Lưu / đọc instance TSCFLP dạng nhị phân gọn + đọc file text benchmark.
+
+Định dạng nhị phân: 1 thư mục gồm
+    header.json          : version, kích thước |I|, |J|, |K|, dtype, tên file từng mảng
+    f.npy U.npy g.npy V.npy D.npy c.npy d.npy   : mảng numpy (np.save)
+
+- load_instance đọc các mảng bằng np.load(mmap_mode='r'): ma trận c, d
+  không bị chép vào RAM, chỉ trang nào được đọc mới nạp từ đĩa
+- Instance đọc từ file được pickle dưới dạng đường dẫn, nên worker
+  process (tscflp_parallel.py) tự mở lại cùng file ở chế độ chỉ đọc
+  thay vì nhận bản sao của cả ma trận
+
+Đọc file text (convert_text), đọc từng dòng và ghi thẳng ra file .npy
+(np.lib.format.open_memmap), không giữ cả file trong bộ nhớ:
+    "orlib-cflp" : file CFLP của OR-Library (cap41.txt, capa.txt, ...)
+    "tscflp"     : định dạng text TSCFLP (xem read_tscflp_text)
+"""
+
+import json
+import os
+from typing import Dict, Iterator
+
+import numpy as np
+
+from tscflp_core import TSCFLPInstance
+
+FORMAT_VERSION = 1
+ARRAYS = ('f', 'U', 'g', 'V', 'D', 'c', 'd')
+HEADER_FILE = "header.json"
+
+
+class MappedInstance(TSCFLPInstance):
+    """
+    TSCFLPInstance có dữ liệu memory-map từ thư mục lưu bởi save_instance.
+    Khi pickle chỉ gửi đường dẫn; bên nhận gọi lại load_instance(path).
+    """
+    source_path: str = ""
+
+    def __reduce__(self):
+        return (load_instance, (self.source_path,))
+
+
+# =====================================================================
+# 1. ĐỊNH DẠNG NHỊ PHÂN
+# =====================================================================
+
+def save_instance(inst: TSCFLPInstance, path: str) -> str:
+    """
+    Ghi instance vào thư mục path (tạo mới nếu chưa có).
+    Trả về path.
+    """
+    os.makedirs(path, exist_ok=True)
+    dt = np.dtype(inst.dtype)
+    for name in ARRAYS:
+        np.save(os.path.join(path, name + ".npy"), np.asarray(getattr(inst, name), dtype=dt))
+    _write_header(path, len(inst.I), len(inst.J), len(inst.K), dt)
+    return path
+
+
+def _write_header(path: str, nI: int, nJ: int, nK: int, dt: np.dtype):
+    header = {
+        "version": FORMAT_VERSION,
+        "num_primary": nI,
+        "num_secondary": nJ,
+        "num_customers": nK,
+        "dtype": dt.name,
+        "arrays": {name: name + ".npy" for name in ARRAYS},
+    }
+    with open(os.path.join(path, HEADER_FILE), 'w', encoding='utf-8') as fh:
+        json.dump(header, fh, indent=2)
+
+
+def read_header(path: str) -> Dict:
+    """Đọc header.json của thư mục instance (kiểm tra version)."""
+    with open(os.path.join(path, HEADER_FILE), 'r', encoding='utf-8') as fh:
+        header = json.load(fh)
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Không hỗ trợ instance version {header.get('version')} ({path})")
+    return header
+
+
+def load_instance(path: str, mmap: bool = True) -> TSCFLPInstance:
+    """
+    Đọc instance đã lưu bằng save_instance / convert_text.
+
+    Parameters
+    ----------
+    path : str
+        Thư mục chứa header.json và các file .npy.
+    mmap : bool
+        True: memory-map các mảng ở chế độ chỉ đọc (không chép dữ liệu);
+        False: đọc hết vào RAM.
+    """
+    header = read_header(path)
+    mode = 'r' if mmap else None
+    arrays = {name: np.load(os.path.join(path, fname), mmap_mode=mode)
+              for name, fname in header["arrays"].items()}
+    dt = np.dtype(header["dtype"]).type
+    if not mmap:
+        return TSCFLPInstance(dtype=dt, **arrays)
+
+    inst = MappedInstance(dtype=dt, **arrays)
+    inst.source_path = os.path.abspath(path)
+    return inst
+
+
+# =====================================================================
+# 2. ĐỌC FILE TEXT (STREAMING)
+# =====================================================================
+
+class _TokenStream:
+    """Đọc lần lượt các số trong file text, mỗi lần lấy n số."""
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._buf = np.empty(0)
+        self._pos = 0
+
+    def take(self, n: int) -> np.ndarray:
+        parts = []
+        while n > 0:
+            if self._pos >= len(self._buf):
+                line = next(self._lines, None)
+                if line is None:
+                    raise ValueError("File kết thúc trước khi đọc đủ dữ liệu")
+                self._buf = np.array(line.split(), dtype=np.float64)
+                self._pos = 0
+                continue
+            chunk = self._buf[self._pos:self._pos + n]
+            self._pos += len(chunk)
+            n -= len(chunk)
+            parts.append(chunk)
+        return np.concatenate(parts) if len(parts) != 1 else parts[0]
+
+
+def _open_arrays(path: str, nI: int, nJ: int, nK: int, dt: np.dtype):
+    """Tạo sẵn các file .npy (memmap ghi được) cho instance kích thước cho trước."""
+    os.makedirs(path, exist_ok=True)
+    shapes = {'f': (nI,), 'U': (nI,), 'g': (nJ,), 'V': (nJ,), 'D': (nK,),
+              'c': (nI, nJ), 'd': (nJ, nK)}
+    return {name: np.lib.format.open_memmap(os.path.join(path, name + ".npy"),
+                                            mode='w+', dtype=dt, shape=shape)
+            for name, shape in shapes.items()}
+
+
+def read_orlib_cflp(lines: Iterator[str], path: str, dtype=np.float64,
+                    block: int = 4096):
+    """
+    Chuyển file CFLP của OR-Library sang định dạng nhị phân tại path.
+
+    Định dạng nguồn:
+        m n                       (số kho, số khách)
+        V_j g_j                   (m dòng: capacity, chi phí mở)
+        với mỗi khách k: D_k rồi m số = chi phí phục vụ TOÀN BỘ demand
+        của k từ từng kho (có thể xuống dòng tùy ý)
+
+    CFLP 1 tầng được đưa về TSCFLP bằng 1 nhà máy giả: f = 0, U = tổng
+    demand, c = 0; d_jk = chi phí phục vụ / D_k (chi phí đơn vị).
+    """
+    tokens = _TokenStream(lines)
+    m, n = (int(v) for v in tokens.take(2))
+    dt = np.dtype(dtype)
+    out = _open_arrays(path, 1, m, n, dt)
+
+    fac = tokens.take(2 * m).reshape(m, 2)
+    out['V'][:] = fac[:, 0]
+    out['g'][:] = fac[:, 1]
+
+    total = 0.0
+    for k0 in range(0, n, block):
+        k1 = min(n, k0 + block)
+        rows = np.empty((k1 - k0, m + 1))
+        for r in range(k1 - k0):
+            rows[r] = tokens.take(m + 1)
+        D = rows[:, 0]
+        out['D'][k0:k1] = D
+        out['d'][:, k0:k1] = (rows[:, 1:] / np.where(D > 0, D, 1.0)[:, None]).T
+        total += float(D.sum())
+
+    out['f'][:] = 0.0
+    out['U'][:] = total
+    out['c'][:] = 0.0
+    for arr in out.values():
+        arr.flush()
+    _write_header(path, 1, m, n, dt)
+
+
+def read_tscflp_text(lines: Iterator[str], path: str, dtype=np.float64):
+    """
+    Chuyển file text TSCFLP sang định dạng nhị phân tại path.
+
+    Định dạng nguồn (các số cách nhau bởi khoảng trắng / xuống dòng):
+        |I| |J| |K|
+        f_i U_i                   (|I| dòng)
+        g_j V_j                   (|J| dòng)
+        D_k                       (|K| số)
+        c                         (|I| x |J| số, theo hàng i)
+        d                         (|J| x |K| số, theo hàng j)
+    """
+    tokens = _TokenStream(lines)
+    nI, nJ, nK = (int(v) for v in tokens.take(3))
+    dt = np.dtype(dtype)
+    out = _open_arrays(path, nI, nJ, nK, dt)
+
+    prim = tokens.take(2 * nI).reshape(nI, 2)
+    out['f'][:], out['U'][:] = prim[:, 0], prim[:, 1]
+    sec = tokens.take(2 * nJ).reshape(nJ, 2)
+    out['g'][:], out['V'][:] = sec[:, 0], sec[:, 1]
+    out['D'][:] = tokens.take(nK)
+    out['c'][:] = tokens.take(nI * nJ).reshape(nI, nJ)
+    for j in range(nJ):
+        out['d'][j] = tokens.take(nK)
+
+    for arr in out.values():
+        arr.flush()
+    _write_header(path, nI, nJ, nK, dt)
+
+
+def write_tscflp_text(inst: TSCFLPInstance, filename: str):
+    """Ghi instance ra định dạng text TSCFLP (xem read_tscflp_text)."""
+    with open(filename, 'w', encoding='utf-8') as fh:
+        fh.write(f"{len(inst.I)} {len(inst.J)} {len(inst.K)}\n")
+        for fi, Ui in zip(inst.f.tolist(), inst.U.tolist()):
+            fh.write(f"{fi!r} {Ui!r}\n")
+        for gj, Vj in zip(inst.g.tolist(), inst.V.tolist()):
+            fh.write(f"{gj!r} {Vj!r}\n")
+        fh.write(' '.join(map(repr, inst.D.tolist())) + "\n")
+        for row in np.asarray(inst.c).tolist():
+            fh.write(' '.join(map(repr, row)) + "\n")
+        for row in np.asarray(inst.d):
+            fh.write(' '.join(map(repr, row.tolist())) + "\n")
+
+
+TEXT_READERS = {
+    "orlib-cflp": read_orlib_cflp,
+    "tscflp": read_tscflp_text,
+}
+
+
+def convert_text(src: str, dst: str, fmt: str = "tscflp", dtype=np.float64,
+                 mmap: bool = True) -> TSCFLPInstance:
+    """
+    Đọc file text benchmark src (fmt trong TEXT_READERS), ghi sang định dạng
+    nhị phân tại thư mục dst (chỉ cần làm 1 lần), rồi trả về instance đọc từ dst.
+    """
+    if fmt not in TEXT_READERS:
+        raise ValueError(f"Không hỗ trợ định dạng '{fmt}' (có: {', '.join(TEXT_READERS)})")
+    with open(src, 'r', encoding='utf-8') as fh:
+        TEXT_READERS[fmt](iter(fh), dst, dtype=dtype)
+    return load_instance(dst, mmap=mmap)
@@ -0,0 +1,304 @@
+# tscflp_lagrangian.py
+"""
+Cận dưới Lagrangian cho TSCFLP (đo khoảng cách tới tối ưu của Greedy / MFSS).
+
+Đối ngẫu hóa (5) với nhân tử lambda_k và (4) với nhân tử mu_j:
+    L(lambda, mu) = sum_k lambda_k D_k + min  sum f_i x_i + sum g_j y_j
+                        + sum (c_ij + mu_j) w_ij + sum (d_jk - lambda_k - mu_j) z_jk
+với các ràng buộc còn lại (2), (3) và các ràng buộc hợp lệ thêm vào:
+    z_jk <= D_k y_j,  w_ij <= V_j x_i                (cận trên của luồng)
+    sum_i U_i x_i >= sum D,  sum_j V_j y_j >= sum D   (đủ capacity)
+
+Bỏ qua 2 ràng buộc "đủ capacity", bài toán tách theo từng facility:
+    - kho j   : knapsack liên tục trên các khách có đơn giá rút gọn < 0
+                (sức chứa V_j, mỗi khách lấy tối đa D_k) -> giá trị v_j
+    - nhà máy i: tương tự trên các kho (sức chứa U_i, mỗi kho tối đa V_j) -> v_i
+Với y_j trong [0, 1] giá trị của kho j là v_j y_j, nên phần còn lại là 2
+knapsack liên tục "phủ" demand (1 cho x, 1 cho y), giải bằng sắp xếp.
+Mọi bước đều vector hóa theo khối hàng của d (dùng được với
+tscflp_lazy.CoordinateInstance), không tạo ma trận |J| x |K| tạm lớn.
+
+L(lambda, mu) <= tối ưu của TSCFLP với mọi lambda, mu (relaxation), nên mọi
+giá trị tính được đều là cận dưới hợp lệ. Nhân tử được cập nhật bằng
+subgradient với bước Polyak:
+    step = theta (UB - L) / ||h||^2,   s_k = D_k - sum_j z_jk,
+                                       s_j = sum_i w_ij - sum_k z_jk
+theo hướng h = s + beta h_truoc (Camerini-Fratta-Maffioli: beta > 0 khi s
+ngược chiều hướng trước, giảm hiện tượng zig-zag). theta giảm một nửa và
+quay về nhân tử tốt nhất khi cận dưới không tăng sau `patience` bước. Nhân
+tử tốt nhất được giữ lại trên instance, lần gọi sau bắt đầu từ đó.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+from tscflp_core import TSCFLPInstance
+from tscflp_flow import solve_min_cost_flow
+
+# Số kho mỗi khối khi duyệt ma trận d
+BLOCK_ROWS = 64
+# Tham số subgradient mặc định
+THETA_INIT = 2.0
+THETA_MIN = 1e-4
+PATIENCE = 20
+DEFLECTION = 1.5
+
+
+@dataclass
+class BoundResult:
+    """
+    Kết quả của 1 lần tính cận dưới.
+
+    lower_bound  : cận dưới tốt nhất (hợp lệ cho tối ưu của instance)
+    upper_bound  : cận trên dùng để tính bước / gap
+    gap          : (upper_bound - lower_bound) / upper_bound
+    iterations   : số bước subgradient của lần gọi này
+    time_seconds : thời gian của lần gọi này (giây)
+    """
+    lower_bound: float
+    upper_bound: float
+    gap: float
+    iterations: int
+    time_seconds: float
+
+
+def relative_gap(upper: float, lower: float) -> float:
+    """Gap tương đối (upper - lower) / |upper| (>= 0, inf nếu không có cận)."""
+    if not np.isfinite(upper) or not np.isfinite(lower):
+        return float('inf')
+    if upper == 0:
+        return 0.0 if lower >= upper else float('inf')
+    return max(0.0, (upper - lower) / abs(upper))
+
+
+def _knapsack_rows(rc: np.ndarray, size: np.ndarray, capacity: np.ndarray):
+    """
+    Knapsack liên tục cho từng hàng r (vector hóa):
+        min sum_c rc[r, c] a[r, c],  0 <= a[r, c] <= size[c],  sum_c a[r, c] <= capacity[r]
+    Lấy các cột có rc < 0 theo thứ tự rc tăng dần tới khi hết sức chứa; chỉ
+    sắp xếp các phần tử âm (thường rất ít so với cả hàng).
+    Trả về (giá trị từng hàng, rows, cols, a) với a > 0 tại (rows, cols).
+    """
+    rows, cols = np.nonzero(rc < 0)
+    vals = rc[rows, cols]
+    order = np.lexsort((vals, rows))
+    rows, cols, vals = rows[order], cols[order], vals[order]
+    sz = size[cols]
+    before = np.cumsum(sz) - sz
+    # trừ phần cộng dồn của các hàng trước -> cộng dồn trong từng hàng
+    first = np.searchsorted(rows, rows)
+    before -= before[first]
+    take = np.clip(capacity[rows] - before, 0.0, sz)
+    keep = take > 0
+    rows, cols, take = rows[keep], cols[keep], take[keep]
+    value = np.bincount(rows, weights=vals[keep] * take, minlength=len(rc))
+    return value, rows, cols, take
+
+
+def _cover(values: np.ndarray, cap: np.ndarray, demand: float) -> Optional[np.ndarray]:
+    """
+    min sum values_j y_j  s.t.  sum cap_j y_j >= demand,  0 <= y_j <= 1
+    (mở mọi facility có giá trị âm, rồi thêm theo values / cap tăng dần).
+    None nếu tổng capacity không đủ.
+    """
+    if cap.sum() < demand * (1 - 1e-12):
+        return None
+    y = (values < 0).astype(np.float64)
+    covered = float(cap @ y)
+    if covered < demand:
+        rest = np.flatnonzero((y == 0) & (cap > 0))
+        rest = rest[np.argsort(values[rest] / cap[rest], kind='stable')]
+        before = covered + np.cumsum(cap[rest]) - cap[rest]
+        y[rest] = np.clip((demand - before) / cap[rest], 0.0, 1.0)
+    return y
+
+
+class LagrangianBound:
+    """
+    Bộ tính cận dưới Lagrangian cho 1 instance (dùng lại giữa các lần gọi
+    qua lagrangian_bound, nhân tử tốt nhất được giữ lại).
+
+    Thống kê:
+        n_iter     : tổng số lần tính L(lambda, mu)
+        solve_time : tổng thời gian (giây)
+    """
+
+    def __init__(self, inst: TSCFLPInstance, block_rows: int = BLOCK_ROWS):
+        self.inst = inst
+        self.block_rows = max(1, int(block_rows))
+        self.f = np.asarray(inst.f, dtype=np.float64)
+        self.g = np.asarray(inst.g, dtype=np.float64)
+        self.U = np.asarray(inst.U, dtype=np.float64)
+        self.V = np.asarray(inst.V, dtype=np.float64)
+        self.D = np.asarray(inst.D, dtype=np.float64)
+        self.c = np.asarray(inst.c, dtype=np.float64)      # |I| x |J|: nhỏ
+        self.total = float(self.D.sum())
+
+        # Nhân tử ban đầu: mu_j = -min_i c_ij, lambda_k = min_j (d_jk - mu_j)
+        # (đơn giá rút gọn của cung rẻ nhất = 0)
+        nJ, nK = len(self.g), len(self.D)
+        self.mu = -self.c.min(axis=0) if self.c.size else np.zeros(nJ)
+        lam = np.full(nK, np.inf)
+        for j0 in range(0, nJ, self.block_rows):
+            j1 = min(nJ, j0 + self.block_rows)
+            blk = np.asarray(inst.d[j0:j1], dtype=np.float64) - self.mu[j0:j1, None]
+            np.minimum(lam, blk.min(axis=0), out=lam)
+        self.lam = lam
+
+        self.best = -np.inf
+        self.theta = THETA_INIT
+        self.n_iter = 0
+        self.solve_time = 0.0
+
+    def evaluate(self, lam: np.ndarray, mu: np.ndarray):
+        """
+        Tính L(lambda, mu) và 1 subgradient.
+        Trả về (giá trị, s_lambda, s_mu); giá trị = inf nếu tổng capacity không đủ.
+        """
+        inst, B = self.inst, self.block_rows
+        nJ, nK = len(self.g), len(self.D)
+
+        # Kho j: knapsack trên khách, lượng lấy lưu dạng thưa (j, k, a)
+        v_J = self.g.copy()
+        rows, cols, amts = [], [], []
+        for j0 in range(0, nJ, B):
+            j1 = min(nJ, j0 + B)
+            rc = np.asarray(inst.d[j0:j1], dtype=np.float64) - lam[None, :] - mu[j0:j1, None]
+            val, r, k, a = _knapsack_rows(rc, self.D, self.V[j0:j1])
+            v_J[j0:j1] += val
+            rows.append(r + j0)
+            cols.append(k)
+            amts.append(a)
+
+        # Nhà máy i: knapsack trên kho
+        val, w_rows, w_cols, w_amts = _knapsack_rows(self.c + mu[None, :], self.V, self.U)
+        v_I = self.f + val
+
+        y = _cover(v_J, self.V, self.total)
+        x = _cover(v_I, self.U, self.total)
+        if x is None or y is None:
+            return np.inf, None, None
+
+        value = float(lam @ self.D + v_I @ x + v_J @ y)
+
+        rows, cols, amts = np.concatenate(rows), np.concatenate(cols), np.concatenate(amts)
+        flow = amts * y[rows]
+        in_K = np.bincount(cols, weights=flow, minlength=nK)
+        out_J = np.bincount(rows, weights=flow, minlength=nJ)
+        in_J = np.bincount(w_cols, weights=w_amts * x[w_rows], minlength=nJ)
+        return value, self.D - in_K, in_J - out_J
+
+    def solve(self, upper_bound: Optional[float] = None,
+              max_iter: int = 200,
+              gap_tol: Optional[float] = None,
+              patience: int = PATIENCE) -> BoundResult:
+        """
+        Chạy tối đa max_iter bước subgradient bắt đầu từ nhân tử tốt nhất hiện có.
+
+        Parameters
+        ----------
+        upper_bound : float, optional
+            Cost của 1 lời giải khả thi (dùng cho bước Polyak và gap).
+            Mặc định: mở mọi facility rồi giải min-cost flow.
+        max_iter : int
+            Số bước subgradient tối đa.
+        gap_tol : float, optional
+            Dừng sớm khi gap tương đối <= gap_tol.
+        patience : int
+            Số bước không tăng cận dưới trước khi giảm theta một nửa.
+        """
+        start = time.perf_counter()
+        if upper_bound is None:
+            upper_bound = solve_min_cost_flow(self.inst, [1] * len(self.f),
+                                              [1] * len(self.g)).cost
+        if self.theta < THETA_MIN:
+            self.theta = THETA_INIT / 4
+
+        lam, mu = self.lam.copy(), self.mu.copy()
+        h_lam, h_mu = np.zeros_like(lam), np.zeros_like(mu)
+        if not np.isfinite(self.best):
+            self.best, _, _ = self.evaluate(lam, mu)
+            self.n_iter += 1
+        it, since = 0, 0
+        while it < max_iter and self.theta >= THETA_MIN:
+            if gap_tol is not None and relative_gap(upper_bound, self.best) <= gap_tol:
+                break
+            value, s_lam, s_mu = self.evaluate(lam, mu)
+            it += 1
+            if not np.isfinite(value):
+                break
+            if value > self.best + 1e-9 * max(1.0, abs(self.best)):
+                self.best = value
+                self.lam, self.mu = lam.copy(), mu.copy()
+                since = 0
+            else:
+                since += 1
+                if since >= patience:
+                    self.theta /= 2
+                    since = 0
+                    lam, mu = self.lam.copy(), self.mu.copy()
+                    h_lam[:], h_mu[:] = 0.0, 0.0
+                    continue
+
+            if float(s_lam @ s_lam + s_mu @ s_mu) <= 1e-12:
+                break   # subgradient = 0: nhân tử tối ưu
+            dot = float(s_lam @ h_lam + s_mu @ h_mu)
+            if dot < 0:
+                beta = -DEFLECTION * dot / float(h_lam @ h_lam + h_mu @ h_mu)
+                s_lam, s_mu = s_lam + beta * h_lam, s_mu + beta * h_mu
+            h_lam, h_mu = s_lam, s_mu
+            norm2 = float(s_lam @ s_lam + s_mu @ s_mu)
+            target = upper_bound if np.isfinite(upper_bound) else value + abs(value) * 0.05 + 1.0
+            step = self.theta * max(target - value, 1e-6 * max(1.0, abs(value))) / norm2
+            lam = lam + step * s_lam
+            mu = mu + step * s_mu
+
+        self.n_iter += it
+        elapsed = time.perf_counter() - start
+        self.solve_time += elapsed
+        return BoundResult(lower_bound=float(self.best), upper_bound=float(upper_bound),
+                           gap=relative_gap(upper_bound, self.best),
+                           iterations=it, time_seconds=elapsed)
+
+    def get_state(self) -> Dict[str, object]:
+        """Trạng thái (nhân tử tốt nhất, cận dưới, theta) để lưu checkpoint."""
+        return {"lam": self.lam.copy(), "mu": self.mu.copy(), "best": float(self.best),
+                "theta": float(self.theta), "n_iter": int(self.n_iter)}
+
+    def set_state(self, state: Dict[str, object]):
+        """Khôi phục trạng thái từ get_state."""
+        self.lam = np.array(state["lam"], dtype=np.float64)
+        self.mu = np.array(state["mu"], dtype=np.float64)
+        self.best = float(state["best"])
+        self.theta = float(state["theta"])
+        self.n_iter = int(state["n_iter"])
+
+    def stats(self) -> Dict[str, float]:
+        return {"lower_bound": float(self.best),
+                "iterations": self.n_iter,
+                "time_seconds": round(self.solve_time, 4)}
+
+
+def lagrangian_bound(inst: TSCFLPInstance,
+                     upper_bound: Optional[float] = None,
+                     max_iter: int = 200,
+                     gap_tol: Optional[float] = None) -> BoundResult:
+    """
+    Cận dưới Lagrangian của instance (xem LagrangianBound.solve).
+    Bộ tính được lưu trên instance nên các lần gọi sau tiếp tục từ nhân tử
+    tốt nhất (chỉ tốn thêm max_iter bước).
+    """
+    engine = inst.get_cached("lagrangian", LagrangianBound)
+    return engine.solve(upper_bound=upper_bound, max_iter=max_iter, gap_tol=gap_tol)
+
+
+if __name__ == "__main__":
+    from tscflp_core import build_small_example
+
+    inst = build_small_example()
+    res = lagrangian_bound(inst)
+    print(f"Lower bound = {res.lower_bound:.4f}, upper bound = {res.upper_bound:.4f}, "
+          f"gap = {100 * res.gap:.2f}% ({res.iterations} bước, {res.time_seconds:.3f} s)")
@@ -0,0 +1,214 @@
+# tscflp_lazy.py
+"""
+Instance TSCFLP lưu tọa độ thay vì ma trận chi phí đầy đủ.
+
+- Chi phí vận chuyển = scale * cost_fn(tọa độ nguồn, tọa độ đích)
+  (mặc định khoảng cách Euclid, xem tscflp_generator.distance_matrix)
+- LazyCostMatrix chỉ tính các hàng / cột / khối được hỏi tới, theo block
+  vector hóa; các hàng vừa dùng được giữ trong cache LRU có giới hạn
+- Bộ nhớ của instance tỉ lệ với |I| + |J| + |K| thay vì |J| x |K|
+
+CoordinateInstance dùng được như TSCFLPInstance cho greedy_tscflp,
+min-cost flow (tscflp_flow.py) và solve_full_mip; riêng model MILP và
+population theo lô (tscflp_population.py) vẫn cần toàn bộ ma trận nên sẽ
+tính đủ (np.asarray) khi dựng.
+"""
+
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from tscflp_core import TSCFLPInstance
+from tscflp_generator import distance_matrix, generate_data
+
+# Số dòng tối đa của 1 khối khi cần duyệt cả ma trận (tổng, tích vô hướng, ...)
+BLOCK_ROWS = 64
+
+
+class LazyCostMatrix:
+    """
+    Ma trận chi phí |A| x |B| tính từ tọa độ khi cần:
+        M[a, b] = scale * cost_fn(A[a:a+1], B[b:b+1])
+
+    Hỗ trợ các kiểu truy cập mà code hiện tại dùng:
+        M[r]            : 1 hàng (có cache LRU)
+        M[:, k]         : 1 cột
+        M[rows, cols]   : khối (rows, cols là int / slice / mảng chỉ số / mask,
+                          kể cả dạng np.ix_)
+        np.asarray(M)   : tính đủ cả ma trận (chỉ dùng khi bắt buộc)
+
+    Parameters
+    ----------
+    A, B : np.ndarray
+        Tọa độ nguồn (n_rows x 2) và đích (n_cols x 2).
+    scale : float
+        Đơn giá trên 1 đơn vị cost_fn.
+    cost_fn : callable, optional
+        cost_fn(a_pts, b_pts, dtype=...) -> ma trận khoảng cách (mặc định Euclid).
+    max_rows : int
+        Số hàng tối đa giữ trong cache.
+    """
+
+    def __init__(self, A: np.ndarray, B: np.ndarray, scale: float = 1.0,
+                 cost_fn: Optional[Callable] = None, max_rows: int = 256,
+                 dtype=np.float64):
+        self.A = np.ascontiguousarray(A, dtype=np.float64)
+        self.B = np.ascontiguousarray(B, dtype=np.float64)
+        self.scale = float(scale)
+        self.cost_fn = cost_fn or distance_matrix
+        self.max_rows = max(1, int(max_rows))
+        self.dtype = np.dtype(dtype)
+        self.shape = (len(self.A), len(self.B))
+        self.ndim = 2
+        self.size = self.shape[0] * self.shape[1]
+        self._rows = OrderedDict()
+        self.row_hits = 0
+        self.row_misses = 0
+
+    def __len__(self):
+        return self.shape[0]
+
+    # -----------------------------------------------------------------
+    # Tính chi phí
+    # -----------------------------------------------------------------
+    def block(self, a_pts: np.ndarray, b_pts: np.ndarray) -> np.ndarray:
+        """Khối chi phí giữa 2 tập tọa độ."""
+        out = self.cost_fn(a_pts, b_pts, dtype=self.dtype)
+        if self.scale != 1.0:
+            out *= self.dtype.type(self.scale)
+        return out
+
+    def row(self, r: int) -> np.ndarray:
+        """Hàng r (chỉ đọc), lấy từ cache nếu đã tính."""
+        r = int(r)
+        cached = self._rows.get(r)
+        if cached is not None:
+            self._rows.move_to_end(r)
+            self.row_hits += 1
+            return cached
+        self.row_misses += 1
+        values = self.block(self.A[r:r + 1], self.B)[0]
+        values.flags.writeable = False
+        self._rows[r] = values
+        if len(self._rows) > self.max_rows:
+            self._rows.popitem(last=False)
+        return values
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key, slice(None))
+        rows, cols = key
+        if isinstance(rows, (int, np.integer)):
+            return self.row(rows)[cols]
+
+        rows = np.asarray(rows) if not isinstance(rows, slice) else rows
+        if isinstance(rows, np.ndarray) and rows.ndim == 2:
+            # dạng np.ix_(rows, cols): (n, 1) x (1, m)
+            rows = rows.ravel()
+            cols = np.asarray(cols).ravel()
+        a_pts = self.A[rows]
+        if isinstance(cols, (int, np.integer)):
+            return self.block(a_pts, self.B[cols:cols + 1])[:, 0]
+        return self.block(a_pts, self.B[cols])
+
+    def __array__(self, dtype=None, copy=None):
+        out = np.empty(self.shape, dtype=self.dtype)
+        for r0 in range(0, self.shape[0], BLOCK_ROWS):
+            out[r0:r0 + BLOCK_ROWS] = self.block(self.A[r0:r0 + BLOCK_ROWS], self.B)
+        return out if dtype is None else out.astype(dtype, copy=False)
+
+    # -----------------------------------------------------------------
+    # Phép toán duyệt cả ma trận theo khối (không tạo ma trận đầy đủ)
+    # -----------------------------------------------------------------
+    def masked_row_sums(self, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """sum_b M[a, b] trên các cột có mask[b] = True, cho mọi hàng a."""
+        B = self.B if mask is None else self.B[mask]
+        out = np.empty(self.shape[0])
+        for r0 in range(0, self.shape[0], BLOCK_ROWS):
+            out[r0:r0 + BLOCK_ROWS] = self.block(self.A[r0:r0 + BLOCK_ROWS], B).sum(axis=1)
+        return out
+
+    def weighted_sum(self, weights: np.ndarray) -> float:
+        """sum_{a,b} M[a, b] * weights[a, b] (ví dụ chi phí của luồng z)."""
+        weights = np.asarray(weights, dtype=np.float64)
+        total = 0.0
+        for r0 in range(0, self.shape[0], BLOCK_ROWS):
+            blk = weights[r0:r0 + BLOCK_ROWS]
+            if blk.any():
+                total += float(np.einsum('ab,ab->',
+                                         self.block(self.A[r0:r0 + BLOCK_ROWS], self.B), blk))
+        return total
+
+    def fingerprint_arrays(self) -> Tuple[np.ndarray, ...]:
+        """Dữ liệu xác định ma trận (dùng cho instance_fingerprint)."""
+        fn = f"{getattr(self.cost_fn, '__module__', '')}.{getattr(self.cost_fn, '__qualname__', '')}"
+        return (self.A, self.B, np.array([self.scale]),
+                np.frombuffer(fn.encode(), dtype=np.uint8).astype(np.float64))
+
+    def __getstate__(self):
+        # Không pickle cache hàng: bên nhận tự tính lại khi cần
+        state = self.__dict__.copy()
+        state['_rows'] = OrderedDict()
+        return state
+
+
+class CoordinateInstance(TSCFLPInstance):
+    """
+    TSCFLPInstance với c, d là LazyCostMatrix (xem from_coordinates).
+    """
+
+    @classmethod
+    def from_coordinates(cls,
+                         pos_I: np.ndarray, pos_J: np.ndarray, pos_K: np.ndarray,
+                         f, U, g, V, D,
+                         c_rate: float = 1.0,
+                         d_rate: float = 1.0,
+                         cost_fn: Optional[Callable] = None,
+                         max_rows: int = 256,
+                         dtype=np.float64) -> "CoordinateInstance":
+        """
+        Tạo instance từ tọa độ nhà máy / kho / khách (mảng n x 2).
+        c_ij = c_rate * cost_fn(i, j), d_jk = d_rate * cost_fn(j, k).
+        """
+        c = LazyCostMatrix(pos_I, pos_J, c_rate, cost_fn, max_rows, dtype)
+        d = LazyCostMatrix(pos_J, pos_K, d_rate, cost_fn, max_rows, dtype)
+        return cls(f=f, U=U, g=g, V=V, D=D, c=c, d=d, dtype=dtype)
+
+    def _convert_arrays(self):
+        dt = np.dtype(self.dtype)
+        for name in ('f', 'U', 'g', 'V', 'D'):
+            setattr(self, name, np.ascontiguousarray(getattr(self, name), dtype=dt))
+        nI, nJ, nK = len(self.f), len(self.g), len(self.D)
+        if self.c.shape != (nI, nJ) or self.d.shape != (nJ, nK):
+            raise ValueError("Kích thước tọa độ không khớp với f/g/D")
+        if len(self.U) != nI or len(self.V) != nJ:
+            raise ValueError("Kích thước f/U hoặc g/V không khớp nhau")
+
+    def evaluate(self, open_I, open_J, w, z) -> float:
+        x = np.asarray(open_I, dtype=np.float64)
+        y = np.asarray(open_J, dtype=np.float64)
+        return float(self.f @ x + self.g @ y +
+                     self.c.weighted_sum(w) + self.d.weighted_sum(z))
+
+    def fingerprint_arrays(self):
+        return (self.f, self.U, self.g, self.V, self.D) + \
+            self.c.fingerprint_arrays() + self.d.fingerprint_arrays()
+
+
+def generate_coordinate_instance(n_primary: int,
+                                 n_secondary: int,
+                                 n_customers: int,
+                                 c_rate: float = 50.0,
+                                 d_rate: float = 100.0,
+                                 max_rows: int = 256,
+                                 dtype=np.float64,
+                                 **kwargs) -> CoordinateInstance:
+    """
+    Giống tscflp_generator.generate_instance (cùng tham số, cùng seed -> cùng
+    dữ liệu) nhưng trả về CoordinateInstance, không tạo ma trận c, d.
+    """
+    points, data = generate_data(n_primary, n_secondary, n_customers,
+                                 c_rate=c_rate, d_rate=d_rate, **kwargs)
+    return CoordinateInstance.from_coordinates(*points, c_rate=c_rate, d_rate=d_rate,
+                                               max_rows=max_rows, dtype=dtype, **data)
@@ -0,0 +1,333 @@
+# tscflp_localsearch.py
+"""
+Local search trên pattern mở/đóng facility (open_I, open_J) của 1 lời giải.
+
+Các move (VND: thử lần lượt từng loại, quay lại loại đầu khi cải thiện):
+    close_J(j), close_I(i)   : đóng 1 kho / nhà máy đang mở
+    open_J(j),  open_I(i)    : mở thêm 1 kho / nhà máy
+    swap_J(j, j'), swap_I(i, i') : đóng 1 facility, mở 1 facility khác cùng tầng
+
+Chấm điểm move không giải lại min-cost flow, chỉ sửa phần luồng bị ảnh hưởng
+của luồng tối ưu hiện tại:
+- Luồng qua kho j được coi là hỗn hợp nguồn hàng theo tỉ lệ
+  p_ij = w_ij / sum_i w_ij; chuyển 1 đơn vị hàng của khách k từ kho j sang
+  kho j' (giữ nguyên hỗn hợp nguồn) tốn M[j, j'] + d[j', k], với
+  M = p^T c (tải của nhà máy không đổi)
+- Đóng kho j: chỉ các khách đang nhận hàng từ j được gán lại (tham lam,
+  theo cost tăng dần) vào các kho còn capacity; mở kho j: các cặp (kho, khách)
+  có lợi nhất được chuyển sang j cho tới khi hết V_j
+- Nhà máy tương tự trên các cung w_ij bị ảnh hưởng
+Luồng sửa được luôn khả thi nên delta ước lượng là cận trên của delta thật.
+Move tốt nhất của mỗi loại (delta < 0) mới được kiểm tra bằng
+solve_min_cost_flow đầy đủ rồi mới nhận.
+"""
+
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from tscflp_core import TSCFLPInstance, Solution
+from tscflp_flow import solve_min_cost_flow, SparseFlow
+
+EPS = 1e-9
+INF = np.inf
+# Số kho / nhà máy đóng được thử ghép với mỗi facility bị đóng trong swap
+SWAP_CANDIDATES = 8
+
+
+def _reassign(cost: np.ndarray, amounts: np.ndarray, residual: np.ndarray) -> float:
+    """
+    Gán lượng hàng amounts[r] vào các đích còn capacity residual[t], đơn giá
+    cost[r, t]: xét các hàng theo lượng giảm dần, mỗi hàng lấy đích rẻ nhất
+    còn chỗ (tách nếu thiếu). Trả về tổng chi phí, inf nếu không đủ capacity.
+    """
+    if amounts.sum() > residual.sum() + 1e-6:
+        return INF
+    res = residual.copy()
+    total = 0.0
+    for r in np.argsort(-amounts, kind='stable'):
+        need, row = float(amounts[r]), cost[r]
+        while need > EPS:
+            t = int(np.argmin(np.where(res > EPS, row, INF)))
+            if res[t] <= EPS:
+                return INF
+            take = min(need, float(res[t]))
+            total += take * float(row[t])
+            res[t] -= take
+            need -= take
+    return total
+
+
+def _fill(gains: np.ndarray, amounts: np.ndarray, capacity: float) -> float:
+    """Tổng lợi khi chuyển các lượng có gain > 0 (gain lớn trước) vào capacity."""
+    pos = gains > EPS
+    if not pos.any():
+        return 0.0
+    g, a = gains[pos], amounts[pos]
+    order = np.argsort(-g, kind='stable')
+    g, a = g[order], a[order]
+    before = np.cumsum(a) - a
+    take = np.clip(capacity - before, 0.0, a)
+    return float(g @ take)
+
+
+class _FlowState:
+    """Các đại lượng của luồng hiện tại dùng để chấm điểm move."""
+
+    def __init__(self, ls: "LocalSearch", x: np.ndarray, y: np.ndarray,
+                 cost: float, w: np.ndarray, z: np.ndarray):
+        self.x, self.y = x, y
+        self.cost = cost
+        self.w, self.z = w, z
+        c = ls.c
+
+        self.res_I = np.where(x, ls.U - w.sum(axis=1), 0.0)
+        self.res_J = np.where(y, ls.V - z.sum(axis=1), 0.0)
+
+        inflow = w.sum(axis=0)
+        P = np.divide(w, inflow, out=np.zeros_like(w), where=inflow > EPS)
+        self.M = P.T @ c        # M[j, j'] : đơn giá thượng nguồn nếu hàng của j đi qua j'
+
+        # Các cung kho -> khách đang có hàng
+        zj, zk = np.nonzero(z > EPS)
+        self.zj, self.zk, self.za = zj, zk, z[zj, zk]
+        dz = np.empty(len(zj))
+        for j in np.unique(zj):
+            sel = zj == j
+            dz[sel] = np.asarray(ls.inst.d[j], dtype=np.float64)[zk[sel]]
+        self.unit = self.M[zj, zj] + dz     # đơn giá hiện tại của từng cung (j, k)
+
+        # Các cung nhà máy -> kho đang có hàng
+        wi, wj = np.nonzero(w > EPS)
+        self.wi, self.wj, self.wa = wi, wj, w[wi, wj]
+
+
+class LocalSearch:
+    """
+    Bộ local search cho 1 instance (dùng lại giữa các lần gọi qua
+    improve_solution).
+
+    Thống kê:
+        n_evaluated : số move đã chấm điểm
+        n_accepted  : số move được nhận (cost giảm thật sau khi giải lại luồng)
+        n_rejected  : số move ước lượng có lợi nhưng luồng tối ưu không giảm cost
+        eval_time   : thời gian chấm điểm move (giây)
+        solve_time  : tổng thời gian, kể cả giải lại luồng (giây)
+    """
+
+    def __init__(self, inst: TSCFLPInstance):
+        self.inst = inst
+        self.f = np.asarray(inst.f, dtype=np.float64)
+        self.g = np.asarray(inst.g, dtype=np.float64)
+        self.U = np.asarray(inst.U, dtype=np.float64)
+        self.V = np.asarray(inst.V, dtype=np.float64)
+        self.c = np.asarray(inst.c, dtype=np.float64)      # |I| x |J|: nhỏ
+        self.n_evaluated = 0
+        self.n_accepted = 0
+        self.n_rejected = 0
+        self.eval_time = 0.0
+        self.solve_time = 0.0
+
+    # -----------------------------------------------------------------
+    # Chấm điểm từng loại move: trả về (delta ước lượng, move) tốt nhất
+    # -----------------------------------------------------------------
+    def _close_J(self, st: _FlowState, j: int, j_in: Optional[int] = None) -> float:
+        """Delta khi đóng kho j (và mở j_in nếu là swap)."""
+        sel = st.zj == j
+        ks, amounts = st.zk[sel], st.za[sel]
+        delta = -self.g[j] - float(st.unit[sel] @ amounts)
+        targets = np.flatnonzero(st.y & (np.arange(len(self.g)) != j))
+        residual = st.res_J[targets]
+        if j_in is not None:
+            delta += self.g[j_in]
+            targets = np.append(targets, j_in)
+            residual = np.append(residual, self.V[j_in])
+        if len(ks) == 0:
+            return delta
+        if len(targets) == 0:
+            return INF
+        cost = (st.M[j, targets][None, :] +
+                np.asarray(self.inst.d[np.ix_(targets, ks)], dtype=np.float64).T)
+        return delta + _reassign(cost, amounts, residual)
+
+    def _open_J(self, st: _FlowState, j: int) -> float:
+        """Delta khi mở kho j: chuyển các cung (j0, k) có lợi sang j."""
+        d_j = np.asarray(self.inst.d[j], dtype=np.float64)[st.zk]
+        gains = st.unit - (st.M[st.zj, j] + d_j)
+        return self.g[j] - _fill(gains, st.za, self.V[j])
+
+    def _close_I(self, st: _FlowState, i: int, i_in: Optional[int] = None) -> float:
+        """Delta khi đóng nhà máy i (và mở i_in nếu là swap)."""
+        sel = st.wi == i
+        js, amounts = st.wj[sel], st.wa[sel]
+        delta = -self.f[i]
+        targets = np.flatnonzero(st.x & (np.arange(len(self.f)) != i))
+        residual = st.res_I[targets]
+        if i_in is not None:
+            delta += self.f[i_in]
+            targets = np.append(targets, i_in)
+            residual = np.append(residual, self.U[i_in])
+        if len(js) == 0:
+            return delta
+        if len(targets) == 0:
+            return INF
+        cost = self.c[np.ix_(targets, js)].T - self.c[i, js][:, None]
+        return delta + _reassign(cost, amounts, residual)
+
+    def _open_I(self, st: _FlowState, i: int) -> float:
+        """Delta khi mở nhà máy i: chuyển các cung (i0, j) có lợi sang i."""
+        gains = self.c[st.wi, st.wj] - self.c[i, st.wj]
+        return self.f[i] - _fill(gains, st.wa, self.U[i])
+
+    def _swap_J(self, st: _FlowState, j: int) -> Tuple[float, Optional[int]]:
+        """Swap tốt nhất cho kho mở j với 1 trong SWAP_CANDIDATES kho đóng gần nhất."""
+        closed = np.flatnonzero(~st.y)
+        sel = st.zj == j
+        if len(closed) == 0 or not sel.any():
+            return INF, None
+        # xếp hạng kho đóng theo chi phí phục vụ các khách hiện tại của j
+        d_blk = np.asarray(self.inst.d[np.ix_(closed, st.zk[sel])], dtype=np.float64)
+        score = st.M[j, closed] * st.za[sel].sum() + d_blk @ st.za[sel] + self.g[closed]
+        best, best_j = INF, None
+        for j_in in closed[np.argsort(score, kind='stable')[:SWAP_CANDIDATES]]:
+            delta = self._close_J(st, j, int(j_in))
+            self.n_evaluated += 1
+            if delta < best:
+                best, best_j = delta, int(j_in)
+        return best, best_j
+
+    def _swap_I(self, st: _FlowState, i: int) -> Tuple[float, Optional[int]]:
+        """Swap tốt nhất cho nhà máy mở i với 1 trong SWAP_CANDIDATES nhà máy đóng."""
+        closed = np.flatnonzero(~st.x)
+        sel = st.wi == i
+        if len(closed) == 0 or not sel.any():
+            return INF, None
+        score = self.c[np.ix_(closed, st.wj[sel])] @ st.wa[sel] + self.f[closed]
+        best, best_i = INF, None
+        for i_in in closed[np.argsort(score, kind='stable')[:SWAP_CANDIDATES]]:
+            delta = self._close_I(st, i, int(i_in))
+            self.n_evaluated += 1
+            if delta < best:
+                best, best_i = delta, int(i_in)
+        return best, best_i
+
+    def _best_move(self, st: _FlowState, kind: str, skip) -> Tuple[float, tuple]:
+        """Move tốt nhất (delta ước lượng nhỏ nhất) của 1 loại."""
+        best, move = INF, None
+        if kind in ("close_J", "open_J", "swap_J"):
+            cand = np.flatnonzero(st.y if kind != "open_J" else ~st.y)
+        else:
+            cand = np.flatnonzero(st.x if kind != "open_I" else ~st.x)
+        for a in cand.tolist():
+            if kind == "close_J":
+                delta, m = self._close_J(st, a), (kind, a)
+            elif kind == "open_J":
+                delta, m = self._open_J(st, a), (kind, a)
+            elif kind == "close_I":
+                delta, m = self._close_I(st, a), (kind, a)
+            elif kind == "open_I":
+                delta, m = self._open_I(st, a), (kind, a)
+            elif kind == "swap_J":
+                delta, b = self._swap_J(st, a)
+                m = (kind, a, b)
+            else:
+                delta, b = self._swap_I(st, a)
+                m = (kind, a, b)
+            if kind not in ("swap_J", "swap_I"):
+                self.n_evaluated += 1
+            if delta < best and m not in skip:
+                best, move = delta, m
+        return best, move
+
+    # -----------------------------------------------------------------
+    # Vòng lặp chính
+    # -----------------------------------------------------------------
+    def improve(self, sol: Solution,
+                max_moves: Optional[int] = None,
+                time_limit: Optional[float] = None) -> Solution:
+        """
+        Local search (VND) bắt đầu từ pattern của sol, tới khi không còn move
+        cải thiện (hoặc đủ max_moves / hết time_limit giây).
+        Trả về Solution với cost = cost luồng tối ưu của pattern tìm được.
+        """
+        start = time.perf_counter()
+        x = np.asarray(sol.open_I) > 0
+        y = np.asarray(sol.open_J) > 0
+        if sol.flow is not None:
+            # dùng luồng lưu kèm lời giải (không giải lại)
+            w, z = sol.flow.w, sol.flow.z
+            st = _FlowState(self, x, y, float(sol.cost), w, z)
+        else:
+            flow = solve_min_cost_flow(self.inst, x.astype(int), y.astype(int))
+            if not flow.feasible:
+                return sol
+            st = _FlowState(self, x, y, float(flow.cost), flow.w, flow.z)
+
+        kinds = ("close_J", "close_I", "open_J", "open_I", "swap_J", "swap_I")
+        moves, skip, n = 0, set(), 0
+        while n < len(kinds):
+            if max_moves is not None and moves >= max_moves:
+                break
+            if time_limit is not None and time.perf_counter() - start >= time_limit:
+                break
+            t0 = time.perf_counter()
+            delta, move = self._best_move(st, kinds[n], skip)
+            self.eval_time += time.perf_counter() - t0
+            if move is None or delta >= -1e-6 * max(1.0, abs(st.cost)):
+                n += 1
+                continue
+
+            # Kiểm tra bằng luồng tối ưu của pattern mới
+            x2, y2 = st.x.copy(), st.y.copy()
+            kind, a = move[0], move[1]
+            arr = y2 if kind.endswith("_J") else x2
+            arr[a] = kind.startswith("open")
+            if kind.startswith("swap"):
+                arr[move[2]] = True
+            flow = solve_min_cost_flow(self.inst, x2.astype(int), y2.astype(int))
+            if flow.feasible and flow.cost < st.cost - 1e-6 * max(1.0, abs(st.cost)):
+                st = _FlowState(self, x2, y2, float(flow.cost), flow.w, flow.z)
+                self.n_accepted += 1
+                moves += 1
+                skip, n = set(), 0
+            else:
+                self.n_rejected += 1
+                skip.add(move)
+
+        self.solve_time += time.perf_counter() - start
+        return Solution(cost=st.cost, open_I=st.x.astype(int).tolist(),
+                        open_J=st.y.astype(int).tolist(),
+                        flow=SparseFlow.from_dense(st.w, st.z))
+
+    def stats(self) -> Dict[str, float]:
+        return {"evaluated": self.n_evaluated,
+                "accepted": self.n_accepted,
+                "rejected": self.n_rejected,
+                "moves_per_second": round(self.n_evaluated / max(self.eval_time, 1e-9)),
+                "time_seconds": round(self.solve_time, 4)}
+
+
+def improve_solution(inst: TSCFLPInstance, sol: Solution,
+                     max_moves: Optional[int] = None,
+                     time_limit: Optional[float] = None) -> Solution:
+    """
+    Cải thiện sol bằng local search open / close / swap (xem LocalSearch.improve).
+    Không bao giờ trả về lời giải tệ hơn sol.
+    """
+    engine = inst.get_cached("local_search", LocalSearch)
+    better = engine.improve(sol, max_moves=max_moves, time_limit=time_limit)
+    return better if better.cost < sol.cost else sol
+
+
+if __name__ == "__main__":
+    from tscflp_core import build_small_example
+    from greedy_tscflp import greedy_tscflp
+
+    inst = build_small_example()
+    sol = greedy_tscflp(inst, rcl_size=1)
+    better = improve_solution(inst, sol)
+    print(f"Greedy cost = {sol.cost:.4f} -> local search cost = {better.cost:.4f}")
+    print("Open primary (I):", better.open_I)
+    print("Open secondary (J):", better.open_J)
+    print("Thống kê:", inst.get_cached("local_search", LocalSearch).stats())
@@ -0,0 +1,89 @@
+# tscflp_lp.py
+"""
+Relaxation LP của model MILP trong solve_full_mip (x_i, y_j liên tục trong
+[0, 1]), giải 1 lần cho mỗi instance bằng scipy.optimize.linprog (HiGHS)
+rồi lưu lại trên instance (xem get_lp_relaxation).
+
+Dùng để xếp hạng facility trong build_fixed_set (rule="lp", mfss_tscflp.py):
+- giá trị phân số x_i, y_j: gần 0 / 1 nghĩa là LP "chắc chắn" đóng / mở
+- reduced cost: facility ở cận 0 có reduced cost lớn (so với chi phí mở)
+  thì mở ra sẽ đắt, ở cận 1 có reduced cost âm lớn thì đóng lại sẽ đắt
+Độ chắc chắn (confidence) = |2v - 1| + min(1, |reduced cost| / chi phí mở),
+nằm trong [0, 2].
+"""
+
+import time
+from typing import Dict
+
+import numpy as np
+from scipy.optimize import linprog
+
+from tscflp_core import TSCFLPInstance
+from tscflp_highs import build_constraint_matrix
+
+
+class LPRelaxation:
+    """
+    Nghiệm relaxation LP của 1 instance.
+
+    Thuộc tính:
+        value            : giá trị tối ưu (cận dưới của bài toán)
+        x, y             : giá trị phân số của x_i, y_j
+        rc_x, rc_y       : reduced cost của x_i, y_j
+        conf_I, conf_J   : độ chắc chắn của LP cho từng nhà máy / kho
+        solve_time       : thời gian giải (giây)
+    """
+
+    def __init__(self, inst: TSCFLPInstance):
+        start = time.perf_counter()
+        nI, nJ = len(inst.I), len(inst.J)
+        f = np.asarray(inst.f, dtype=np.float64)
+        g = np.asarray(inst.g, dtype=np.float64)
+        cost = np.concatenate([f, g,
+                               np.asarray(inst.c, dtype=np.float64).ravel(),
+                               np.asarray(inst.d, dtype=np.float64).ravel()])
+        A, lo, hi = build_constraint_matrix(inst)
+        n_ub = nI + nJ      # (2), (3) là <=; (4), (5) là =
+        bounds = np.zeros((len(cost), 2))
+        bounds[:, 1] = np.inf
+        bounds[:nI + nJ, 1] = 1.0
+        res = linprog(cost, A_ub=A[:n_ub], b_ub=hi[:n_ub], A_eq=A[n_ub:], b_eq=hi[n_ub:],
+                      bounds=bounds, method="highs")
+        if res.status != 0:
+            raise RuntimeError(f"Không giải được relaxation LP: {res.message}")
+
+        rc = res.lower.marginals + res.upper.marginals
+        self.value = float(res.fun)
+        self.x, self.y = res.x[:nI].copy(), res.x[nI:nI + nJ].copy()
+        self.rc_x, self.rc_y = rc[:nI].copy(), rc[nI:nI + nJ].copy()
+        self.conf_I = self._confidence(self.x, self.rc_x, f)
+        self.conf_J = self._confidence(self.y, self.rc_y, g)
+        self.solve_time = time.perf_counter() - start
+
+    @staticmethod
+    def _confidence(v: np.ndarray, rc: np.ndarray, fixed_cost: np.ndarray) -> np.ndarray:
+        rel = np.minimum(1.0, np.abs(rc) / np.maximum(np.abs(fixed_cost), 1e-9))
+        return np.abs(2 * v - 1) + rel
+
+    def agreement(self, open_I, open_J):
+        """
+        Điểm xếp hạng cho từng facility theo trạng thái của 1 lời giải:
+        +confidence nếu LP làm tròn ra đúng trạng thái đó, -confidence nếu ngược lại.
+        Trả về (score_I, score_J).
+        """
+        oI = np.asarray(open_I) > 0
+        oJ = np.asarray(open_J) > 0
+        sI = np.where((self.x >= 0.5) == oI, self.conf_I, -self.conf_I)
+        sJ = np.where((self.y >= 0.5) == oJ, self.conf_J, -self.conf_J)
+        return sI, sJ
+
+    def stats(self) -> Dict[str, float]:
+        return {"lp_value": self.value,
+                "fractional_I": int(np.sum((self.x > 1e-6) & (self.x < 1 - 1e-6))),
+                "fractional_J": int(np.sum((self.y > 1e-6) & (self.y < 1 - 1e-6))),
+                "time_seconds": round(self.solve_time, 4)}
+
+
+def get_lp_relaxation(inst: TSCFLPInstance) -> LPRelaxation:
+    """Relaxation LP của instance (chỉ giải ở lần gọi đầu tiên)."""
+    return inst.get_cached("lp_relaxation", LPRelaxation)
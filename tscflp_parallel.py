@@ -0,0 +1,150 @@
+# tscflp_parallel.py
+"""
+Giải song song nhiều subproblem (fixed-set) của MFSS bằng process pool.
+
+- Instance được gửi cho mỗi worker đúng 1 lần qua initializer của pool
+  (không pickle lại instance theo từng task); mỗi worker tự dựng model
+  MILP của nó 1 lần rồi dùng lại (xem get_model)
+- Mỗi task chỉ gồm (fixed-set, time limit, backend, warm start); kết quả trả về theo đúng
+  thứ tự gửi đi nên việc gộp vào population là tất định
+- Cache (PatternCache) nằm ở process chính: pattern đã có trong cache
+  hoặc trùng nhau trong cùng 1 lượt thì không gửi cho worker
+- Cũng dùng để dựng population ban đầu song song (construct_many)
+"""
+
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from tscflp_core import (TSCFLPInstance, Solution, solve_full_mip,
+                         get_model, is_fully_fixed, DEFAULT_BACKEND)
+from tscflp_cache import pattern_key
+from greedy_tscflp import get_constructor
+
+# Instance dùng chung trong mỗi worker process (gán bởi _init_worker)
+_WORKER_INST: Optional[TSCFLPInstance] = None
+
+
+def _init_worker(inst: TSCFLPInstance):
+    global _WORKER_INST
+    _WORKER_INST = inst
+
+
+def _solve_task(task):
+    """Giải 1 fixed-set trong worker. Trả về (Solution, optimal)."""
+    fixed, time_limit, backend, warm_start = task
+    inst = _WORKER_INST
+    sol = solve_full_mip(inst, time_limit=time_limit, fixed=fixed, backend=backend,
+                         warm_start=warm_start)
+    optimal = is_fully_fixed(inst, fixed) or get_model(inst, backend).last_optimal
+    return sol, optimal
+
+
+def _construct_task(task):
+    """Dựng 1 pattern randomized greedy trong worker với RNG riêng."""
+    rcl_size, seed = task
+    return get_constructor(_WORKER_INST).construct(rcl_size, rng=random.Random(seed))
+
+
+class SubproblemPool:
+    """
+    Process pool giải các fixed-set của cùng 1 instance.
+
+    Parameters
+    ----------
+    inst : TSCFLPInstance
+        Instance bài toán (gửi cho worker 1 lần khi khởi tạo pool).
+    workers : int
+        Số worker process.
+    cache : PatternCache, optional
+        Cache kết quả theo fixed pattern, tra cứu / cập nhật ở process chính.
+    backend : str
+        Backend giải MILP trong worker (xem SOLVER_BACKENDS).
+
+    Thống kê:
+        n_tasks   : số subproblem được yêu cầu giải
+        n_solved  : số subproblem thực sự gửi cho worker
+        wall_time : tổng thời gian chờ các lượt giải (giây)
+    """
+
+    def __init__(self, inst: TSCFLPInstance, workers: int, cache=None,
+                 backend: str = DEFAULT_BACKEND):
+        self.inst = inst
+        self.workers = workers
+        self.cache = cache
+        self.backend = backend
+        self.n_tasks = 0
+        self.n_solved = 0
+        self.wall_time = 0.0
+        self._executor = ProcessPoolExecutor(max_workers=workers,
+                                             initializer=_init_worker,
+                                             initargs=(inst,))
+
+    def solve_many(self, fixed_sets: List[Dict[str, Dict[int, int]]],
+                   time_limit: Optional[float] = None,
+                   warm_starts: Optional[List[Optional[Solution]]] = None
+                   ) -> List[Solution]:
+        """
+        Giải danh sách fixed-set với cùng time limit.
+        warm_starts[m] (nếu có) là incumbent cho fixed_sets[m] (xem solve_full_mip).
+        Trả về list Solution theo đúng thứ tự của fixed_sets.
+        """
+        if warm_starts is None:
+            warm_starts = [None] * len(fixed_sets)
+        start = time.perf_counter()
+        results: List[Optional[Solution]] = [None] * len(fixed_sets)
+        pending = {}  # pattern -> các vị trí cần kết quả của pattern đó
+        for pos, fixed in enumerate(fixed_sets):
+            if self.cache is not None:
+                sol = self.cache.get(self.inst, fixed, time_limit)
+                if sol is not None:
+                    results[pos] = sol
+                    continue
+            pending.setdefault(pattern_key(self.inst, fixed), []).append(pos)
+
+        tasks = [(fixed_sets[positions[0]], time_limit, self.backend,
+                  warm_starts[positions[0]])
+                 for positions in pending.values()]
+        for positions, (sol, optimal) in zip(pending.values(),
+                                             self._executor.map(_solve_task, tasks)):
+            if self.cache is not None:
+                self.cache.put(self.inst, fixed_sets[positions[0]], time_limit,
+                               sol, optimal=optimal)
+            for pos in positions:
+                results[pos] = Solution(cost=sol.cost, open_I=sol.open_I,
+                                        open_J=sol.open_J, flow=sol.flow)
+
+        self.n_tasks += len(fixed_sets)
+        self.n_solved += len(tasks)
+        self.wall_time += time.perf_counter() - start
+        return results
+
+    def construct_many(self, rcl_size: int,
+                       seeds: List[int]) -> List[Tuple[List[int], List[int]]]:
+        """
+        Dựng len(seeds) pattern randomized greedy, pattern thứ m dùng
+        random.Random(seeds[m]). Trả về list (open_I, open_J) theo thứ tự seeds.
+        """
+        chunk = max(1, len(seeds) // (4 * self.workers))
+        tasks = [(rcl_size, s) for s in seeds]
+        return list(self._executor.map(_construct_task, tasks, chunksize=chunk))
+
+    def stats(self) -> Dict[str, float]:
+        """Số subproblem đã giải và throughput (subproblem / giây)."""
+        rate = self.n_tasks / self.wall_time if self.wall_time > 0 else 0.0
+        return {"workers": self.workers,
+                "subproblems": self.n_tasks,
+                "solver_calls": self.n_solved,
+                "wall_time_seconds": round(self.wall_time, 4),
+                "subproblems_per_second": round(rate, 2)}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
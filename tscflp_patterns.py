@@ -0,0 +1,146 @@
+# tscflp_patterns.py
+"""
+Biểu diễn pattern mở/đóng facility dạng bit và các bảng băm dùng trong MFSS.
+
+- pack_pattern: (open_I, open_J) -> bytes (np.packbits), 1 bit / facility,
+                giống Solution.packed
+- pack_fixed  : fixed-set {'I': {...}, 'J': {...}} -> bytes gồm 2 dãy bit
+                (facility có bị fix không, giá trị fix)
+- PatternIndex    : tập pattern của population, kiểm tra trùng O(1)
+- SubproblemMemory: nhớ các subproblem (F, tau) đã giải; gặp lại F với
+                    time limit không lớn hơn thì dùng lại kết quả cũ
+                    thay vì gọi solver lần nữa
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from tscflp_core import TSCFLPInstance, Solution
+
+
+def pack_pattern(open_I, open_J) -> bytes:
+    """Pattern (open_I, open_J) dạng bit (khóa băm, cùng instance thì cùng độ dài)."""
+    bits = np.concatenate((np.asarray(open_I, dtype=np.uint8),
+                           np.asarray(open_J, dtype=np.uint8)))
+    return np.packbits(bits).tobytes()
+
+
+def pack_fixed(inst: TSCFLPInstance,
+               fixed: Optional[Dict[str, Dict[int, int]]]) -> bytes:
+    """Fixed-set dạng bit: [mask bị fix | giá trị fix] cho nhà máy rồi tới kho."""
+    nI = len(inst.I)
+    mask = np.zeros(nI + len(inst.J), dtype=np.uint8)
+    value = np.zeros_like(mask)
+    fixed = fixed or {}
+    for i, v in fixed.get('I', {}).items():
+        mask[i], value[i] = 1, int(v)
+    for j, v in fixed.get('J', {}).items():
+        mask[nI + j], value[nI + j] = 1, int(v)
+    return np.packbits(np.concatenate((mask, value))).tobytes()
+
+
+class PatternIndex:
+    """
+    Tập các pattern đã có trong population (băm theo pack_pattern).
+
+    Thống kê:
+        lookups, hits : số lần kiểm tra / số lần pattern đã có
+    """
+
+    def __init__(self, solutions: Iterable[Solution] = ()):
+        self._keys = set()
+        self.lookups = 0
+        self.hits = 0
+        for sol in solutions:
+            self.add(sol)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, sol: Solution) -> bool:
+        self.lookups += 1
+        found = sol.packed in self._keys
+        self.hits += found
+        return found
+
+    def add(self, sol: Solution):
+        self._keys.add(sol.packed)
+
+
+class SubproblemMemory:
+    """
+    Bộ nhớ các subproblem đã giải: pack_fixed(F) -> (time limit, kết quả).
+
+    Gặp lại F với time limit tau <= tau' (tau' = time limit lúc đã giải,
+    None = không giới hạn) thì dùng lại kết quả cũ thay vì gọi solver. Đây là
+    quy ước của MFSS chứ không phải 2 kết quả tương đương: mỗi lần giải được
+    warm start từ 1 base khác nhau, nên giải lại F (dù với tau nhỏ hơn) vẫn có
+    thể ra lời giải tốt hơn kết quả cũ. Chỉ kết quả giải không giới hạn thời
+    gian (tau' = None) mới chắc chắn tối ưu trong không gian của F.
+    Giới hạn maxsize phần tử, loại bỏ theo LRU.
+
+    Thống kê:
+        hits   : số lần dùng lại kết quả cũ (không gọi solver)
+        misses : số lần phải gọi solver
+    """
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, inst: TSCFLPInstance,
+            fixed: Optional[Dict[str, Dict[int, int]]],
+            time_limit: Optional[float]) -> Optional[Solution]:
+        """Kết quả đã nhớ cho fixed-set với time limit này, hoặc None."""
+        key = pack_fixed(inst, fixed)
+        entry = self._data.get(key)
+        if entry is not None:
+            tau, sol = entry
+            if tau is None or (time_limit is not None and tau >= time_limit):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return Solution(cost=sol.cost, open_I=sol.open_I,
+                                open_J=sol.open_J, flow=sol.flow)
+        self.misses += 1
+        return None
+
+    def put(self, inst: TSCFLPInstance,
+            fixed: Optional[Dict[str, Dict[int, int]]],
+            time_limit: Optional[float],
+            sol: Solution):
+        """Ghi nhớ kết quả giải fixed-set với time limit (None = không giới hạn)."""
+        key = pack_fixed(inst, fixed)
+        old = self._data.get(key)
+        if old is not None and (old[0] is None or
+                                (time_limit is not None and old[0] >= time_limit)):
+            return      # đã có kết quả với time limit không nhỏ hơn
+        self._data[key] = (time_limit, sol)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def entries(self):
+        """Các phần tử [key (hex), tau, cost, open_I, open_J] theo thứ tự LRU (cũ -> mới)."""
+        return [[key.hex(), tau, sol.cost, list(sol.open_I), list(sol.open_J)]
+                for key, (tau, sol) in self._data.items()]
+
+    def load_entries(self, entries):
+        """Thêm các phần tử dạng entries() vào bộ nhớ (kết quả không kèm luồng)."""
+        for key, tau, cost, open_I, open_J in entries:
+            key = bytes.fromhex(key)
+            self._data[key] = (tau, Solution(cost=cost, open_I=open_I, open_J=open_J))
+            self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """Số lần dùng lại kết quả cũ (hits), số lần giải thật (misses)."""
+        return {"reused": self.hits, "solver_calls": self.misses,
+                "size": len(self._data)}
@@ -0,0 +1,339 @@
+# tscflp_population.py
+"""
+Sinh population ban đầu cho MFSS: nhiều lời giải randomized greedy cùng lúc.
+
+- Chạy N bản Algorithm 1 (RCL > 1) song song theo kiểu "lockstep":
+  trạng thái của cả population được lưu thành các ma trận N x |I|, N x |J|,
+  N x |K|, mỗi bước mọi thành viên cùng thực hiện 1 thao tác
+  (chọn nhà máy / chọn kho / giao hàng cho 1 khách) bằng phép toán mảng
+- Các pattern trùng nhau chỉ được đánh giá (tối ưu luồng) 1 lần; các pattern
+  khác nhau được đánh giá song song nếu có SubproblemPool
+- Chi phí: phần dựng pattern theo lô rẻ (100 thành viên trên instance
+  20 x 60 x 400 mất ~0.3 s, cỡ 1 lần greedy_tscflp), nhưng mỗi pattern khác
+  nhau vẫn cần 1 lần min-cost flow (~0.3 s trên instance đó), nên tổng thời
+  gian ~ số pattern khác nhau x 1 lần giải luồng / số worker, không nhanh
+  hơn build_population đáng kể khi các pattern đều khác nhau
+- build_population: chạy Algorithm 1 gốc cho từng thành viên với RNG riêng
+  (tái lập được, không phụ thuộc số worker), có thể song song bằng process pool
+"""
+
+import random
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from tscflp_core import TSCFLPInstance, Solution, solve_full_mip
+from greedy_tscflp import get_constructor, EPS
+from tscflp_parallel import SubproblemPool
+
+# Số khách xem trước trong danh sách thứ tự của kho ở mỗi bước giao hàng
+WINDOW = 8
+
+# Trạng thái của từng thành viên trong population
+CHOOSE_PRIMARY, CHOOSE_SECONDARY, ASSIGN_CUSTOMER, DONE = 0, 1, 2, 3
+
+
+def _customer_order_matrix(inst: TSCFLPInstance) -> np.ndarray:
+    """Thứ tự khách theo d_jk tăng dần cho mọi kho (ma trận |J| x |K|)."""
+    def build(inst):
+        d = np.asarray(inst.d, dtype=np.float64)
+        dtype = np.int32 if d.shape[1] < 2 ** 31 else np.int64
+        return np.argsort(d, axis=1, kind='stable').astype(dtype)
+    return inst.get_cached("customer_order_matrix", build)
+
+
+def _batched_rcl(scores: np.ndarray, rcl_size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    RCL cho từng hàng của ma trận scores (inf = ứng viên không hợp lệ):
+    lấy top rcl_size bằng argpartition rồi chọn ngẫu nhiên 1 ứng viên hợp lệ.
+    Trả về chỉ số cột được chọn cho mỗi hàng.
+    """
+    M, n = scores.shape
+    r = min(max(1, rcl_size), n)
+    if r < n:
+        top = np.argpartition(scores, r - 1, axis=1)[:, :r]
+    else:
+        top = np.broadcast_to(np.arange(n), (M, n))
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    n_valid = np.isfinite(top_scores).sum(axis=1)
+    order = np.argsort(top_scores, axis=1, kind='stable')
+    pick = (rng.random(M) * n_valid).astype(int)
+    return top[np.arange(M), order[np.arange(M), pick]]
+
+
+def construct_patterns_batched(inst: TSCFLPInstance,
+                               n: int,
+                               rcl_size: int = 2,
+                               seed: Optional[int] = None
+                               ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Dựng n lời giải randomized greedy (Algorithm 1) cùng lúc.
+
+    Parameters
+    ----------
+    inst : TSCFLPInstance
+        Instance bài toán.
+    n : int
+        Số lời giải cần dựng.
+    rcl_size : int
+        Kích thước RCL (giống greedy_tscflp).
+    seed : int, optional
+        Seed cho numpy Generator (cùng seed -> cùng kết quả).
+
+    Returns
+    -------
+    (open_I, open_J)
+        Ma trận 0/1 kích thước n x |I| và n x |J|, mỗi hàng là 1 pattern.
+    """
+    rng = np.random.default_rng(seed)
+    con = get_constructor(inst)
+    c, d = con.c, con.d
+    nI, nJ = c.shape
+    nK = d.shape[1]
+    order_mat = _customer_order_matrix(inst)
+    rows_all = np.arange(n)
+
+    # ---- Trạng thái của population ----
+    U = np.tile(con.U0, (n, 1))
+    V = np.tile(con.V0, (n, 1))
+    D = np.tile(con.D0, (n, 1))
+    D_flat = D.reshape(-1)
+    order_flat = order_mat.reshape(-1).astype(np.int64)
+    total = np.full(n, con.total_demand)
+
+    sel_I = np.zeros((n, nI), dtype=bool)
+    sel_J = np.zeros((n, nJ), dtype=bool)
+
+    avail = V > EPS
+    n_avail = avail.sum(axis=1)
+    sum_c = np.tile(c[:, con.V0 > EPS].sum(axis=1), (n, 1))
+
+    unmet = D > 0
+    n_unmet = unmet.sum(axis=1)
+    sum_d = np.tile(con.d_sum0, (n, 1))
+    head = np.zeros((n, nJ), dtype=np.int64)
+
+    phase = np.full(n, CHOOSE_PRIMARY)
+    phase[total <= EPS] = DONE
+    i_star = np.zeros(n, dtype=int)
+    j_star = np.zeros(n, dtype=int)
+    rem_i = np.zeros(n)
+    rem_j = np.zeros(n)
+
+    while np.any(phase != DONE):
+        mP = rows_all[phase == CHOOSE_PRIMARY]
+        mS = rows_all[phase == CHOOSE_SECONDARY]
+        mC = rows_all[phase == ASSIGN_CUSTOMER]
+
+        # ======== 1) Chọn primary facility i ========
+        if len(mP):
+            avg_c = np.where(n_avail[mP, None] > 0,
+                             sum_c[mP] / np.maximum(n_avail[mP, None], 1), 0.0)
+            hp = np.where(U[mP] > EPS, con.fU[None, :] + avg_c, np.inf)
+            if np.any(np.all(np.isinf(hp), axis=1)):
+                raise RuntimeError("Không đủ capacity primary để đáp ứng demand")
+            i = _batched_rcl(hp, rcl_size, rng)
+            sel_I[mP, i] = True
+            used = np.minimum(total[mP], U[mP, i])
+            U[mP, i] -= used
+            total[mP] -= used
+            rem_i[mP] = used
+            i_star[mP] = i
+            phase[mP] = CHOOSE_SECONDARY
+
+        # ======== 2) Chọn secondary facility j ========
+        if len(mS):
+            avg_d = np.where(n_unmet[mS, None] > 0,
+                             sum_d[mS] / np.maximum(n_unmet[mS, None], 1), 0.0)
+            hs = np.where(avail[mS], c[i_star[mS]] + con.gV[None, :] + avg_d, np.inf)
+            if np.any(np.all(np.isinf(hs), axis=1)):
+                raise RuntimeError("Không đủ capacity secondary để nhận hàng")
+            j = _batched_rcl(hs, rcl_size, rng)
+            sel_J[mS, j] = True
+            used = np.minimum(rem_i[mS], V[mS, j])
+            V[mS, j] -= used
+            rem_i[mS] -= used
+            full = V[mS, j] <= EPS
+            if full.any():
+                mf, jf = mS[full], j[full]
+                avail[mf, jf] = False
+                n_avail[mf] -= 1
+                sum_c[mf] -= c[:, jf].T
+            rem_j[mS] = used
+            j_star[mS] = j
+            phase[mS] = ASSIGN_CUSTOMER
+
+        # ======== 3) Giao hàng từ kho j_star cho 1 khách k ========
+        if len(mC):
+            js = j_star[mC]
+            h = head[mC, js]
+            r = max(1, rcl_size)
+            k = np.full(len(mC), -1)
+            rows = np.arange(len(mC))
+            width = WINDOW
+            # cửa sổ chưa đủ rcl_size khách hợp lệ -> mở rộng gấp 8 và xét lại
+            while len(rows):
+                pos = h[rows, None] + np.arange(width)
+                inside = pos < nK
+                cust = order_flat[(js[rows] * nK)[:, None] + np.minimum(pos, nK - 1)]
+                valid = inside & (D_flat[(mC[rows] * nK)[:, None] + cust] > EPS)
+                csum = np.cumsum(valid, axis=1)
+                n_found = np.minimum(csum[:, -1], r)
+                exact = (n_found >= r) | ~inside[:, -1]
+
+                # đẩy con trỏ head qua các khách đầu danh sách đã hết demand
+                lead = np.where(valid.any(axis=1), valid.argmax(axis=1),
+                                inside.sum(axis=1))
+                head[mC[rows], js[rows]] = h[rows] + lead
+
+                # RCL = rcl_size khách hợp lệ đầu tiên theo thứ tự d_jk
+                ok = exact & (n_found > 0)
+                if ok.any():
+                    t = (rng.random(ok.sum()) * n_found[ok]).astype(int) + 1
+                    hit = (csum[ok] == t[:, None]) & valid[ok]
+                    k[rows[ok]] = cust[ok, hit.argmax(axis=1)]
+                rows = rows[~exact]
+                width *= 8
+
+            # kho không còn khách nào để giao -> quay lại chọn kho
+            none = k < 0
+            phase[mC[none]] = CHOOSE_SECONDARY
+
+            mk, kk = mC[~none], k[~none]
+            amount = np.minimum(rem_j[mk], D[mk, kk])
+            D[mk, kk] -= amount
+            rem_j[mk] -= amount
+            met = (D[mk, kk] <= EPS) & unmet[mk, kk]
+            if met.any():
+                mm, km = mk[met], kk[met]
+                unmet[mm, km] = False
+                n_unmet[mm] -= 1
+                sum_d[mm] -= d[:, km].T
+
+        # ---- Chuyển trạng thái (giống điều kiện các vòng while trong Algorithm 1) ----
+        phase[(phase == ASSIGN_CUSTOMER) & (rem_j <= EPS)] = CHOOSE_SECONDARY
+        phase[(phase == CHOOSE_SECONDARY) & (rem_i <= EPS)] = CHOOSE_PRIMARY
+        phase[(phase == CHOOSE_PRIMARY) & (total <= EPS)] = DONE
+
+    return sel_I.astype(np.int8), sel_J.astype(np.int8)
+
+
+def build_population_batched(inst: TSCFLPInstance,
+                             n: int,
+                             rcl_size: int = 2,
+                             seed: Optional[int] = None,
+                             cache=None,
+                             workers: int = 1,
+                             pool: Optional[SubproblemPool] = None) -> List[Solution]:
+    """
+    Sinh n lời giải randomized greedy bằng construct_patterns_batched,
+    loại pattern trùng và chỉ tối ưu luồng cho các pattern khác nhau
+    (song song qua pool / workers như build_population).
+
+    Phần tối ưu luồng chiếm gần hết thời gian (xem đầu file): chỉ nhanh hơn
+    build_population khi có nhiều pattern trùng hoặc nhiều worker.
+
+    Trả về list n Solution theo đúng thứ tự sinh (các pattern trùng nhau
+    dùng chung kết quả đánh giá).
+    """
+    open_I, open_J = construct_patterns_batched(inst, n, rcl_size=rcl_size, seed=seed)
+    patterns = np.hstack([open_I, open_J])
+    unique, inverse = np.unique(patterns, axis=0, return_inverse=True)
+    inverse = np.asarray(inverse).reshape(-1)
+
+    nI = open_I.shape[1]
+    fixed_sets = [{'I': dict(enumerate(row[:nI].tolist())),
+                   'J': dict(enumerate(row[nI:].tolist()))}
+                  for row in unique]
+    own_pool = pool is None and workers > 1 and len(fixed_sets) > 1
+    if own_pool:
+        pool = SubproblemPool(inst, workers, cache=cache)
+    try:
+        if pool is None:
+            evaluated = [solve_full_mip(inst, fixed=F, cache=cache) for F in fixed_sets]
+        else:
+            evaluated = pool.solve_many(fixed_sets)
+    finally:
+        if own_pool:
+            pool.close()
+
+    return [Solution(cost=evaluated[u].cost,
+                     open_I=evaluated[u].open_I,
+                     open_J=evaluated[u].open_J,
+                     flow=evaluated[u].flow)
+            for u in inverse]
+
+
+def member_seeds(seed: Optional[int], n: int) -> List[int]:
+    """
+    Seed riêng cho từng thành viên population, sinh từ 1 seed gốc bằng
+    np.random.SeedSequence.spawn (các luồng ngẫu nhiên độc lập nhau).
+    Thành viên thứ m luôn nhận cùng seed, bất kể chạy tuần tự hay song song.
+    """
+    children = np.random.SeedSequence(seed).spawn(n)
+    return [int(ch.generate_state(1, dtype=np.uint64)[0]) for ch in children]
+
+
+def build_population(inst: TSCFLPInstance,
+                     n: int,
+                     rcl_size: int = 2,
+                     seed: Optional[int] = 0,
+                     workers: int = 1,
+                     cache=None,
+                     pool: Optional[SubproblemPool] = None) -> List[Solution]:
+    """
+    Sinh n lời giải randomized greedy (Algorithm 1), mỗi thành viên dùng
+    random.Random riêng (xem member_seeds).
+
+    Parameters
+    ----------
+    inst : TSCFLPInstance
+        Instance bài toán.
+    n : int
+        Kích thước population.
+    rcl_size : int
+        Kích thước RCL (giống greedy_tscflp).
+    seed : int, optional
+        Seed gốc; cùng seed -> cùng population với mọi số worker.
+    workers : int
+        Số worker process (1 = chạy tuần tự trong process hiện tại).
+    cache : PatternCache, optional
+        Cache kết quả theo pattern (xem tscflp_cache.py).
+    pool : SubproblemPool, optional
+        Pool có sẵn (ví dụ của mfss) để dùng lại thay vì tạo pool mới.
+
+    Returns
+    -------
+    List[Solution]
+        n lời giải theo thứ tự thành viên; pattern trùng nhau chỉ đánh giá 1 lần.
+    """
+    seeds = member_seeds(seed, n)
+
+    own_pool = pool is None and workers > 1
+    if own_pool:
+        pool = SubproblemPool(inst, workers, cache=cache)
+    try:
+        if pool is None:
+            con = get_constructor(inst)
+            patterns = [con.construct(rcl_size, rng=random.Random(s)) for s in seeds]
+            fixed_sets = [{'I': dict(enumerate(oI)), 'J': dict(enumerate(oJ))}
+                          for oI, oJ in patterns]
+            # pattern trùng nhau: lần sau lấy từ cache (nếu có) hoặc dùng lại kết quả
+            evaluated = {}
+            P = []
+            for F in fixed_sets:
+                key = (tuple(F['I'].values()), tuple(F['J'].values()))
+                if key not in evaluated:
+                    evaluated[key] = solve_full_mip(inst, fixed=F, cache=cache)
+                sol = evaluated[key]
+                P.append(Solution(cost=sol.cost, open_I=sol.open_I,
+                                  open_J=sol.open_J, flow=sol.flow))
+            return P
+
+        patterns = pool.construct_many(rcl_size, seeds)
+        fixed_sets = [{'I': dict(enumerate(oI)), 'J': dict(enumerate(oJ))}
+                      for oI, oJ in patterns]
+        return pool.solve_many(fixed_sets)
+    finally:
+        if own_pool:
+            pool.close()
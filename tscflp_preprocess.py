@@ -0,0 +1,225 @@
+# tscflp_preprocess.py
+"""
+Tiền xử lý instance TSCFLP: rút gọn instance trước khi chạy thuật toán,
+giữ ánh xạ về chỉ số gốc để đổi lời giải ngược lại (xem Preprocessed).
+
+Các phép rút gọn đều "an toàn" (instance rút gọn có cùng giá trị tối ưu):
+- Khách có demand = 0: bỏ (không cần luồng z tới khách đó)
+- Facility có capacity = 0 (và chi phí mở >= 0): đóng, không bao giờ dùng được
+- Facility bị trội (dominated): kho j bị trội bởi kho j' nếu
+      g_j' <= g_j, c_ij' <= c_ij với mọi i, d_j'k <= d_jk với mọi k
+  và V_j' >= tổng demand. Khi đó mọi lời giải mở j đều đổi được sang j'
+  (gộp luồng của j vào j') mà không tăng cost -> đóng j. Tương tự cho
+  nhà máy (f, hàng c_i., U_i' >= tổng demand).
+- Cặp nhà máy - kho không dùng được (1 đầu bị đóng) biến mất cùng facility
+- Facility bắt buộc mở: các facility còn lại cộng lại không đủ capacity cho
+  tổng demand -> mọi lời giải khả thi đều mở nó. Trong instance rút gọn
+  chi phí mở của nó = 0, phần chi phí này (offset) được cộng lại khi đổi
+  lời giải về instance gốc.
+
+Các bước được lặp tới khi không rút gọn thêm được.
+
+Dùng qua tham số preprocess=True của greedy_tscflp, mfss / mfss_iter và
+solve_full_mip: thuật toán chạy trên instance rút gọn, kết quả trả về vẫn
+theo chỉ số và cost của instance gốc.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from tscflp_core import TSCFLPInstance, Solution
+from tscflp_flow import SparseFlow
+from tscflp_lazy import LazyCostMatrix
+
+# Lý do đóng facility
+REMOVED_ZERO_CAPACITY = "zero_capacity"
+REMOVED_DOMINATED = "dominated"
+
+
+def _take(M, rows: np.ndarray, cols: np.ndarray):
+    """Ma trận con M[rows][:, cols]; LazyCostMatrix thì chỉ lấy tập tọa độ con."""
+    if isinstance(M, LazyCostMatrix):
+        return LazyCostMatrix(M.A[rows], M.B[cols], M.scale, M.cost_fn,
+                              M.max_rows, M.dtype)
+    return np.asarray(M)[np.ix_(rows, cols)]
+
+
+def _row(M, r: int, cols: np.ndarray) -> np.ndarray:
+    return np.asarray(M[r], dtype=np.float64)[cols]
+
+
+class Preprocessed:
+    """
+    Kết quả tiền xử lý 1 instance (xem get_preprocessed).
+
+    Thuộc tính:
+        original      : instance gốc
+        inst          : instance rút gọn (cùng kiểu với instance gốc)
+        map_I, map_J, map_K : chỉ số gốc của từng nhà máy / kho / khách trong inst
+        forced_I, forced_J  : chỉ số gốc của các facility bắt buộc mở
+        removed_I, removed_J : chỉ số gốc -> lý do bị đóng
+        offset        : tổng chi phí mở của các facility bắt buộc mở
+                        (cost gốc = cost trên inst + offset)
+    """
+
+    def __init__(self, inst: TSCFLPInstance):
+        self.original = inst
+        T = float(np.sum(inst.D))
+        tol = 1e-6 * max(1.0, T)
+        f = np.asarray(inst.f, dtype=np.float64)
+        g = np.asarray(inst.g, dtype=np.float64)
+        U = np.asarray(inst.U, dtype=np.float64)
+        V = np.asarray(inst.V, dtype=np.float64)
+
+        keep_I = np.ones(len(f), dtype=bool)
+        keep_J = np.ones(len(g), dtype=bool)
+        keep_K = np.asarray(inst.D) > 0
+        self.removed_I: Dict[int, str] = {}
+        self.removed_J: Dict[int, str] = {}
+
+        for i in np.flatnonzero((U <= 0) & (f >= 0)).tolist():
+            keep_I[i] = False
+            self.removed_I[i] = REMOVED_ZERO_CAPACITY
+        for j in np.flatnonzero((V <= 0) & (g >= 0)).tolist():
+            keep_J[j] = False
+            self.removed_J[j] = REMOVED_ZERO_CAPACITY
+
+        if U[keep_I].sum() < T - tol or V[keep_J].sum() < T - tol:
+            raise RuntimeError("Instance không khả thi: tổng capacity nhỏ hơn tổng demand")
+
+        changed = True
+        while changed:
+            changed = False
+            cols_J = np.flatnonzero(keep_J)
+            cols_K = np.flatnonzero(keep_K)
+            rows_I = np.flatnonzero(keep_I)
+            # Nhà máy i bị trội bởi nhà máy i' đủ capacity cho toàn bộ demand
+            for a in np.flatnonzero(keep_I & (U >= T)).tolist():
+                c_a = _row(inst.c, a, cols_J)
+                for i in np.flatnonzero(keep_I).tolist():
+                    if i != a and keep_I[a] and f[a] <= f[i] and \
+                            np.all(c_a <= _row(inst.c, i, cols_J)):
+                        keep_I[i] = False
+                        self.removed_I[i] = REMOVED_DOMINATED
+                        changed = True
+            # Kho j bị trội bởi kho j' đủ capacity cho toàn bộ demand
+            c_cols = np.asarray(inst.c[np.ix_(rows_I, cols_J)], dtype=np.float64) \
+                if len(rows_I) else np.zeros((0, len(cols_J)))
+            pos_J = {j: p for p, j in enumerate(cols_J.tolist())}
+            for b in np.flatnonzero(keep_J & (V >= T)).tolist():
+                d_b = _row(inst.d, b, cols_K)
+                c_b = c_cols[:, pos_J[b]]
+                for j in np.flatnonzero(keep_J).tolist():
+                    if j != b and keep_J[b] and g[b] <= g[j] and \
+                            np.all(c_b <= c_cols[:, pos_J[j]]) and \
+                            np.all(d_b <= _row(inst.d, j, cols_K)):
+                        keep_J[j] = False
+                        self.removed_J[j] = REMOVED_DOMINATED
+                        changed = True
+
+        # Facility bắt buộc mở: phần còn lại không đủ capacity
+        cap_I, cap_J = U[keep_I].sum(), V[keep_J].sum()
+        forced_I = keep_I & (cap_I - U < T - tol)
+        forced_J = keep_J & (cap_J - V < T - tol)
+        self.forced_I: List[int] = np.flatnonzero(forced_I).tolist()
+        self.forced_J: List[int] = np.flatnonzero(forced_J).tolist()
+        self.offset = float(f[forced_I].sum() + g[forced_J].sum())
+
+        self.map_I = np.flatnonzero(keep_I)
+        self.map_J = np.flatnonzero(keep_J)
+        self.map_K = np.flatnonzero(keep_K)
+        if keep_I.all() and keep_J.all() and keep_K.all() and self.offset == 0:
+            # không rút gọn được gì: dùng luôn instance gốc (và các model đã dựng)
+            self.inst = inst
+            return
+        self.inst = type(inst)(
+            f=np.where(forced_I, 0.0, f)[self.map_I],
+            U=U[self.map_I],
+            g=np.where(forced_J, 0.0, g)[self.map_J],
+            V=V[self.map_J],
+            D=np.asarray(inst.D)[self.map_K],
+            c=_take(inst.c, self.map_I, self.map_J),
+            d=_take(inst.d, self.map_J, self.map_K),
+            dtype=inst.dtype)
+
+    # -----------------------------------------------------------------
+    # Instance gốc -> instance rút gọn
+    # -----------------------------------------------------------------
+    def representable(self, fixed: Optional[Dict[str, Dict[int, int]]]) -> bool:
+        """False nếu fixed-set mở 1 facility đã bị đóng khi rút gọn."""
+        fixed = fixed or {}
+        return not (any(fixed.get('I', {}).get(i, 0) for i in self.removed_I) or
+                    any(fixed.get('J', {}).get(j, 0) for j in self.removed_J))
+
+    def reduce_fixed(self, fixed: Optional[Dict[str, Dict[int, int]]]
+                     ) -> Optional[Dict[str, Dict[int, int]]]:
+        """
+        Đổi fixed-set sang chỉ số của instance rút gọn (facility đã bị đóng
+        thì bỏ đi). Chỉ dùng khi representable(fixed).
+        """
+        if fixed is None:
+            return None
+        inv_I = {int(o): r for r, o in enumerate(self.map_I.tolist())}
+        inv_J = {int(o): r for r, o in enumerate(self.map_J.tolist())}
+        return {'I': {inv_I[i]: v for i, v in fixed.get('I', {}).items() if i in inv_I},
+                'J': {inv_J[j]: v for j, v in fixed.get('J', {}).items() if j in inv_J}}
+
+    def reduce_solution(self, sol: Optional[Solution]) -> Optional[Solution]:
+        """Lời giải gốc -> lời giải trên instance rút gọn (None nếu mở facility đã bị đóng)."""
+        if sol is None:
+            return None
+        open_I = np.asarray(sol.open_I)
+        open_J = np.asarray(sol.open_J)
+        if open_I[list(self.removed_I)].any() or open_J[list(self.removed_J)].any():
+            return None
+        return Solution(cost=sol.cost - self.offset, open_I=open_I[self.map_I],
+                        open_J=open_J[self.map_J])
+
+    # -----------------------------------------------------------------
+    # Instance rút gọn -> instance gốc
+    # -----------------------------------------------------------------
+    def expand_pattern(self, open_I, open_J):
+        """Pattern trên instance rút gọn -> pattern (list 0/1) trên instance gốc."""
+        full_I = np.zeros(len(self.original.I), dtype=int)
+        full_J = np.zeros(len(self.original.J), dtype=int)
+        full_I[self.map_I] = open_I
+        full_J[self.map_J] = open_J
+        return full_I.tolist(), full_J.tolist()
+
+    def expand_flow(self, flow: Optional[SparseFlow]) -> Optional[SparseFlow]:
+        """Luồng trên instance rút gọn -> luồng trên instance gốc (chỉ số phẳng mới)."""
+        if flow is None:
+            return None
+        nJ, nK = len(self.original.J), len(self.original.K)
+        i, j, w_val = flow.w_arcs()
+        jz, k, z_val = flow.z_arcs()
+        # map_* tăng dần nên thứ tự các cung được giữ nguyên
+        w_idx = self.map_I[i].astype(np.int64) * nJ + self.map_J[j]
+        z_idx = self.map_J[jz].astype(np.int64) * nK + self.map_K[k]
+        return SparseFlow((len(self.original.I), nJ), (nJ, nK),
+                          w_idx, w_val, z_idx, z_val)
+
+    def expand(self, sol: Solution) -> Solution:
+        """Lời giải trên instance rút gọn -> lời giải trên instance gốc."""
+        open_I, open_J = self.expand_pattern(sol.open_I, sol.open_J)
+        return Solution(cost=sol.cost + self.offset, open_I=open_I, open_J=open_J,
+                        flow=self.expand_flow(sol.flow))
+
+    def stats(self) -> Dict[str, int]:
+        """Kích thước trước / sau và số facility bị đóng / bắt buộc mở."""
+        o, r = self.original, self.inst
+        reasons = list(self.removed_I.values()) + list(self.removed_J.values())
+        return {"primary": f"{len(o.I)} -> {len(r.I)}",
+                "secondary": f"{len(o.J)} -> {len(r.J)}",
+                "customers": f"{len(o.K)} -> {len(r.K)}",
+                "dominated": reasons.count(REMOVED_DOMINATED),
+                "zero_capacity": reasons.count(REMOVED_ZERO_CAPACITY),
+                "forced_open": len(self.forced_I) + len(self.forced_J),
+                "arcs_removed": (len(o.I) * len(o.J) + len(o.J) * len(o.K) -
+                                 len(r.I) * len(r.J) - len(r.J) * len(r.K))}
+
+
+def get_preprocessed(inst: TSCFLPInstance) -> Preprocessed:
+    """Kết quả tiền xử lý của instance (chỉ tính ở lần gọi đầu tiên)."""
+    return inst.get_cached("preprocess", Preprocessed)
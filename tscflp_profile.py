@@ -0,0 +1,195 @@
+# tscflp_profile.py
+"""
+Đo thời gian từng pha (span) và đếm sự kiện (counter) trong greedy_tscflp,
+solve_full_mip và mfss.
+
+- Mặc định tắt: span() trả về 1 context manager rỗng dùng chung, count()
+  chỉ kiểm tra 1 biến toàn cục -> gần như không tốn gì trên hot path
+- Bật bằng `with profiling() as prof:` (hoặc enable() / disable())
+- Tùy chọn memory=True: theo dõi peak memory bằng tracemalloc (ghi vào
+  mỗi span và thành counter "memory_peak_mb" trong trace)
+- Xuất ra JSON (tổng hợp theo tên span + counter) hoặc Chrome trace
+  (mở bằng chrome://tracing hoặc https://ui.perfetto.dev)
+
+Ví dụ:
+    from tscflp_profile import profiling
+    with profiling(memory=True) as prof:
+        mfss(inst)
+    prof.save("mfss_trace.json")                  # Chrome trace
+    prof.save("mfss_profile.json", fmt="json")    # bảng tổng hợp
+
+Tên span đang dùng: greedy.construct, mip.model_build, mip.warm_start,
+mip.flow, mip.solve, mip.extract, mfss.population, mfss.lagrangian,
+mfss.build_fixed_set, mfss.screen, mfss.solve_round.
+Counter: solver_calls, flow_calls, cache_hits, mfss.duplicate_patterns,
+mfss.improvements, mfss.stagnation, mfss.subproblems_skipped,
+screen.rejected_capacity, screen.rejected_bound.
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+# Context manager rỗng dùng chung khi profiling tắt
+_NULL_SPAN = nullcontext()
+
+# Profiler đang bật (None = tắt)
+_ACTIVE: Optional["Profiler"] = None
+
+
+class Profiler:
+    """
+    Ghi lại các span (tên, thời điểm bắt đầu, thời lượng, tham số) và counter.
+
+    Parameters
+    ----------
+    memory : bool
+        True: bật tracemalloc và ghi peak memory (MB) khi kết thúc mỗi span.
+    """
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory
+        self.events: List[dict] = []
+        self.counters: Dict[str, int] = {}
+        self.memory_samples: List[tuple] = []
+        self.peak_memory_mb = 0.0
+        self._t0 = time.perf_counter()
+        self._started_tracemalloc = False
+
+    # -----------------------------------------------------------------
+    # Ghi nhận
+    # -----------------------------------------------------------------
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._t0) * 1e6
+
+    @contextmanager
+    def span(self, name: str, **args):
+        """Đo thời gian khối lệnh `with prof.span(name):`."""
+        start = self._now_us()
+        try:
+            yield
+        finally:
+            end = self._now_us()
+            event = {"name": name, "ts": start, "dur": end - start,
+                     "tid": threading.get_ident()}
+            if self.memory:
+                peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                self.peak_memory_mb = max(self.peak_memory_mb, peak)
+                self.memory_samples.append((end, peak))
+                args = dict(args, peak_memory_mb=round(peak, 3))
+            if args:
+                event["args"] = args
+            self.events.append(event)
+
+    def count(self, name: str, n: int = 1):
+        """Tăng counter name thêm n."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def stop(self):
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    # -----------------------------------------------------------------
+    # Xuất kết quả
+    # -----------------------------------------------------------------
+    def summary(self) -> dict:
+        """
+        Tổng hợp theo tên span: số lần, tổng / lớn nhất (giây), cùng các
+        counter và peak memory (nếu có).
+        """
+        spans: Dict[str, dict] = {}
+        for ev in self.events:
+            s = spans.setdefault(ev["name"], {"count": 0, "total_seconds": 0.0,
+                                              "max_seconds": 0.0})
+            dur = ev["dur"] / 1e6
+            s["count"] += 1
+            s["total_seconds"] += dur
+            s["max_seconds"] = max(s["max_seconds"], dur)
+        out = {"spans": spans, "counters": dict(self.counters),
+               "wall_time_seconds": self._now_us() / 1e6}
+        if self.memory:
+            out["peak_memory_mb"] = self.peak_memory_mb
+        return out
+
+    def chrome_trace(self) -> dict:
+        """Dữ liệu dạng Chrome trace event format (span = sự kiện "X")."""
+        pid = os.getpid()
+        trace = [dict(ev, ph="X", pid=pid) for ev in self.events]
+        trace += [{"name": "memory_peak_mb", "ph": "C", "ts": ts, "pid": pid,
+                   "args": {"peak": peak}} for ts, peak in self.memory_samples]
+        end = self._now_us()
+        trace += [{"name": name, "ph": "C", "ts": end, "pid": pid, "args": {"value": value}}
+                  for name, value in self.counters.items()]
+        return {"traceEvents": trace, "displayTimeUnit": "ms",
+                "otherData": {"counters": dict(self.counters)}}
+
+    def save(self, path: str, fmt: str = "chrome"):
+        """Ghi ra file: fmt = "chrome" (Chrome trace) hoặc "json" (summary)."""
+        if fmt == "chrome":
+            data = self.chrome_trace()
+        elif fmt == "json":
+            data = self.summary()
+        else:
+            raise ValueError(f"Định dạng không hợp lệ: {fmt!r} (chrome / json)")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, indent=1)
+
+
+# =====================================================================
+# API dùng trong code thuật toán (không tốn gì khi tắt)
+# =====================================================================
+
+def span(name: str, **args):
+    """`with span("mip.solve"):` -> đo thời gian nếu đang bật profiling."""
+    if _ACTIVE is None:
+        return _NULL_SPAN
+    return _ACTIVE.span(name, **args)
+
+
+def count(name: str, n: int = 1):
+    """Tăng counter nếu đang bật profiling."""
+    if _ACTIVE is not None:
+        _ACTIVE.count(name, n)
+
+
+def active() -> Optional[Profiler]:
+    """Profiler đang bật (hoặc None)."""
+    return _ACTIVE
+
+
+def enable(memory: bool = False) -> Profiler:
+    """Bật profiling toàn cục, trả về Profiler mới."""
+    global _ACTIVE
+    disable()
+    _ACTIVE = Profiler(memory=memory)
+    _ACTIVE.start()
+    return _ACTIVE
+
+
+def disable() -> Optional[Profiler]:
+    """Tắt profiling, trả về Profiler vừa dùng (nếu có)."""
+    global _ACTIVE
+    prof, _ACTIVE = _ACTIVE, None
+    if prof is not None:
+        prof.stop()
+    return prof
+
+
+@contextmanager
+def profiling(memory: bool = False):
+    """`with profiling() as prof:` bật profiling trong khối lệnh."""
+    prof = enable(memory=memory)
+    try:
+        yield prof
+    finally:
+        disable()
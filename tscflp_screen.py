@@ -0,0 +1,199 @@
+# tscflp_screen.py
+"""
+Sàng lọc nhanh fixed-set / pattern trước khi gọi solver (CBC, HiGHS, min-cost flow).
+
+Với fixed-set F (xem solve_full_mip), gọi:
+    A_I = các nhà máy không bị fix đóng, A_J = các kho không bị fix đóng
+    T   = tổng demand
+
+1) Khả thi về capacity: sum(U[A_I]) >= T và sum(V[A_J]) >= T,
+   nếu không thì subproblem chắc chắn vô nghiệm.
+2) Cận dưới (relaxation rẻ của model, không cần solver):
+       fixed cost của các facility bị fix mở
+     + chi phí mở thêm tối thiểu để bù phần capacity còn thiếu
+       (thiếu * min f_i / U_i trên các nhà máy tự do, tương tự cho kho)
+     + cận vận chuyển: mỗi đơn vị hàng tới khách k tốn ít nhất
+       min_{j in A_J} (d_jk + min_{i in A_I} c_ij)
+   Nếu cận dưới >= upper_bound (cost của best hiện tại) thì subproblem
+   không thể cho lời giải tốt hơn -> bỏ qua.
+
+screen_many xử lý cả 1 lượt fixed-set cùng lúc: mask (n x |I|), (n x |J|)
+-> capacity và fixed cost bằng phép nhân ma trận; chỉ phần cận vận chuyển
+tính theo từng fixed-set còn lại.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from tscflp_core import TSCFLPInstance
+from tscflp_profile import count
+
+# Lý do loại 1 fixed-set (None = giữ lại)
+REJECT_CAPACITY_I = "capacity_I"
+REJECT_CAPACITY_J = "capacity_J"
+REJECT_BOUND = "bound"
+
+
+class PatternScreen:
+    """
+    Bộ sàng lọc fixed-set của 1 instance (dữ liệu tính 1 lần, xem get_screen).
+
+    Thống kê:
+        checked            : số fixed-set đã kiểm tra
+        rejected_capacity  : số fixed-set bị loại vì không đủ capacity
+        rejected_bound     : số fixed-set bị loại vì cận dưới >= upper bound
+    """
+
+    def __init__(self, inst: TSCFLPInstance):
+        self.nI, self.nJ = len(inst.I), len(inst.J)
+        self.f = np.asarray(inst.f, dtype=np.float64)
+        self.g = np.asarray(inst.g, dtype=np.float64)
+        self.U = np.asarray(inst.U, dtype=np.float64)
+        self.V = np.asarray(inst.V, dtype=np.float64)
+        self.D = np.asarray(inst.D, dtype=np.float64)
+        self.c = np.asarray(inst.c, dtype=np.float64)
+        self.total_demand = float(self.D.sum())
+        self.tol = 1e-6 * max(1.0, self.total_demand)
+        self.served = np.flatnonzero(self.D > 0)
+        self.D_served = self.D[self.served]
+        # d có thể là LazyCostMatrix: chỉ đọc khi cần cận vận chuyển (_transport_bound)
+        self._d_source = inst.d
+        self.d: Optional[np.ndarray] = None
+        self.global_transport: Optional[float] = None
+        self.fU = self.f / np.maximum(self.U, 1e-9)
+        self.gV = self.g / np.maximum(self.V, 1e-9)
+        self.checked = 0
+        self.rejected_capacity = 0
+        self.rejected_bound = 0
+
+    # -----------------------------------------------------------------
+    # Mask từ fixed-set
+    # -----------------------------------------------------------------
+    def masks(self, fixed_sets: List[Optional[Dict[str, Dict[int, int]]]]):
+        """
+        Trả về (open_I, allow_I, open_J, allow_J), mỗi cái là mảng bool n x |I| / n x |J|:
+        open = bị fix mở, allow = không bị fix đóng.
+        """
+        n = len(fixed_sets)
+        open_I = np.zeros((n, self.nI), dtype=bool)
+        allow_I = np.ones((n, self.nI), dtype=bool)
+        open_J = np.zeros((n, self.nJ), dtype=bool)
+        allow_J = np.ones((n, self.nJ), dtype=bool)
+        for r, fixed in enumerate(fixed_sets):
+            fixed = fixed or {}
+            for i, v in fixed.get('I', {}).items():
+                open_I[r, i] = allow_I[r, i] = bool(v)
+            for j, v in fixed.get('J', {}).items():
+                open_J[r, j] = allow_J[r, j] = bool(v)
+        return open_I, allow_I, open_J, allow_J
+
+    # -----------------------------------------------------------------
+    # Kiểm tra
+    # -----------------------------------------------------------------
+    def capacity_feasible(self, open_I, open_J) -> bool:
+        """Pattern (open_I, open_J) có đủ capacity cho tổng demand không."""
+        oI = np.asarray(open_I) > 0
+        oJ = np.asarray(open_J) > 0
+        T = self.total_demand - self.tol
+        feasible = bool(self.U[oI].sum() >= T and self.V[oJ].sum() >= T)
+        self.checked += 1
+        if not feasible:
+            self.rejected_capacity += 1
+            count("screen.rejected_capacity")
+        return feasible
+
+    def _transport_bound(self, allow_I: np.ndarray, allow_J: np.ndarray) -> float:
+        """sum_k D_k * min_{j in A_J} (d_jk + min_{i in A_I} c_ij)."""
+        if self.d is None:
+            if isinstance(self._d_source, np.ndarray):
+                # chỉ giữ các khách có demand > 0
+                self.d = np.asarray(self._d_source[:, self.served], dtype=np.float64)
+            else:
+                return self._lazy_transport_bound()
+        cmin = self.c[allow_I][:, allow_J].min(axis=0)
+        unit = (self.d[allow_J] + cmin[:, None]).min(axis=0)
+        return float(unit @ self.D_served)
+
+    def _lazy_transport_bound(self) -> float:
+        """
+        d là LazyCostMatrix: không dựng ma trận đầy đủ, chỉ tính 1 lần cận vận
+        chuyển khi mọi facility đều mở (vẫn đúng cho mọi fixed-set, nhưng yếu hơn).
+        """
+        if self.global_transport is None:
+            cmin = self.c.min(axis=0)
+            unit = np.full(len(self.served), np.inf)
+            for j in range(self.nJ):
+                row = np.asarray(self._d_source[j], dtype=np.float64)[self.served]
+                np.minimum(unit, row + cmin[j], out=unit)
+            self.global_transport = float(unit @ self.D_served)
+        return self.global_transport
+
+    def screen_many(self, fixed_sets: List[Optional[Dict[str, Dict[int, int]]]],
+                    upper_bound: Optional[float] = None) -> List[Optional[str]]:
+        """
+        Sàng lọc 1 lượt fixed-set. Trả về list cùng độ dài: None nếu fixed-set
+        cần giải, hoặc lý do bị loại (REJECT_CAPACITY_I / _J / REJECT_BOUND).
+        """
+        if not fixed_sets:
+            return []
+        open_I, allow_I, open_J, allow_J = self.masks(fixed_sets)
+        T = self.total_demand
+        cap_I = allow_I @ self.U
+        cap_J = allow_J @ self.V
+        reasons: List[Optional[str]] = [
+            REJECT_CAPACITY_I if cI < T - self.tol else
+            REJECT_CAPACITY_J if cJ < T - self.tol else None
+            for cI, cJ in zip(cap_I.tolist(), cap_J.tolist())]
+
+        if upper_bound is not None and np.isfinite(upper_bound):
+            # fixed cost + chi phí mở thêm tối thiểu (vector hóa trên cả lượt)
+            short_I = np.maximum(0.0, T - self.tol - open_I @ self.U)
+            short_J = np.maximum(0.0, T - self.tol - open_J @ self.V)
+            rate_I = np.where(allow_I & ~open_I, self.fU, np.inf).min(axis=1, initial=np.inf)
+            rate_J = np.where(allow_J & ~open_J, self.gV, np.inf).min(axis=1, initial=np.inf)
+            # không thiếu capacity thì không nhân với rate (tránh 0 * inf khi hết facility tự do)
+            bound = (open_I @ self.f + open_J @ self.g +
+                     short_I * np.where(short_I > 0, rate_I, 0.0) +
+                     short_J * np.where(short_J > 0, rate_J, 0.0))
+            # cận vận chuyển chỉ tính cho các fixed-set chưa bị loại
+            for r in range(len(fixed_sets)):
+                if reasons[r] is not None:
+                    continue
+                if (bound[r] >= upper_bound or
+                        bound[r] + self._transport_bound(allow_I[r], allow_J[r]) >= upper_bound):
+                    reasons[r] = REJECT_BOUND
+
+        self.checked += len(fixed_sets)
+        n_cap = sum(1 for s in reasons if s in (REJECT_CAPACITY_I, REJECT_CAPACITY_J))
+        n_bound = sum(1 for s in reasons if s == REJECT_BOUND)
+        self.rejected_capacity += n_cap
+        self.rejected_bound += n_bound
+        count("screen.rejected_capacity", n_cap)
+        count("screen.rejected_bound", n_bound)
+        return reasons
+
+    def lower_bound(self, fixed: Optional[Dict[str, Dict[int, int]]]) -> float:
+        """Cận dưới của subproblem với fixed-set (inf nếu không đủ capacity)."""
+        open_I, allow_I, open_J, allow_J = self.masks([fixed])
+        open_I, allow_I, open_J, allow_J = open_I[0], allow_I[0], open_J[0], allow_J[0]
+        T = self.total_demand
+        if allow_I @ self.U < T - self.tol or allow_J @ self.V < T - self.tol:
+            return float('inf')
+        short_I = max(0.0, T - self.tol - float(open_I @ self.U))
+        short_J = max(0.0, T - self.tol - float(open_J @ self.V))
+        extra_I = short_I * self.fU[allow_I & ~open_I].min() if short_I > 0 else 0.0
+        extra_J = short_J * self.gV[allow_J & ~open_J].min() if short_J > 0 else 0.0
+        return (float(open_I @ self.f + open_J @ self.g) + extra_I + extra_J +
+                self._transport_bound(allow_I, allow_J))
+
+    def stats(self) -> Dict[str, int]:
+        """Số fixed-set đã kiểm tra / bị loại (không phải gọi solver)."""
+        return {"checked": self.checked,
+                "rejected_capacity": self.rejected_capacity,
+                "rejected_bound": self.rejected_bound}
+
+
+def get_screen(inst: TSCFLPInstance) -> PatternScreen:
+    """PatternScreen của instance (chỉ tính ở lần gọi đầu tiên)."""
+    return inst.get_cached("pattern_screen", PatternScreen)
@@ -0,0 +1,495 @@
+# tscflp_sparse.py
+"""
+Backend MILP thưa: chỉ tạo biến luồng cho các cung "ứng viên".
+
+Model đầy đủ có |I| x |J| biến w và |J| x |K| biến z (500 kho x 50k khách
+= 25 triệu biến z). Ở đây model chỉ có:
+    - k_secondary kho rẻ nhất cho mỗi khách (cung z_jk)
+    - k_primary nhà máy rẻ nhất cho mỗi kho (cung w_ij)
+    - các cung đã được thêm vào ở những lần giải trước
+(chỉ xét facility không bị fix đóng), cộng với biến "luồng gộp" thay cho
+TẤT CẢ các cung bị bỏ:
+    q_i >= 0 : lượng nhà máy i gửi qua cung bị bỏ (chiếm capacity U_i x_i)
+    r_j >= 0 : lượng kho j nhận qua cung bị bỏ
+    s_j >= 0 : lượng kho j gửi đi qua cung bị bỏ (chiếm capacity V_j y_j)
+    t_k >= 0 : lượng khách k nhận qua cung bị bỏ
+    (6)  sum_i q_i = sum_j r_j          (7)  sum_j s_j = sum_k t_k
+với đơn giá tách theo "thế vị" a (nhà máy), b (kho):
+    q_i: a_i,  r_j: m'_j = min c_ij - a_i,    s_j: b_j,  t_k: m_k = min d_jk - b_j
+(min lấy trên các cung bị bỏ), nên a_i + m'_j <= c_ij, b_j + m_k <= d_jk
+với mọi cung bị bỏ.
+
+Mọi lời giải của model đầy đủ đều ứng với 1 lời giải của model này với
+chi phí không lớn hơn (dồn luồng trên cung bị bỏ vào q, r, s, t), nên đây
+là relaxation: tối ưu của nó là cận dưới hợp lệ (với MỌI a, b) và nó không
+vô nghiệm khi model đầy đủ còn nghiệm. Vì vậy:
+    - Nếu lời giải tối ưu không dùng luồng gộp (r = t = 0) thì nó khả thi
+      cho model đầy đủ với cùng chi phí -> tối ưu cho model đầy đủ
+    - Nếu có kho j dùng r_j > 0 / khách k dùng t_k > 0 thì thêm cung cho
+      nó (từ các nhà máy có q_i > 0 / kho có s_j > 0, và k cung rẻ nhất
+      chưa có), cùng các cung mà luồng tối ưu của pattern vừa tìm được cần
+      (pricing với x, y cố định, giá trị LP = chi phí thật của pattern
+      = cận trên), rồi giải lại. Dừng khi cận trên - cận dưới <= mip_gap
+      (như sai số MIP của HiGHS). Số cung tăng dần nên vòng lặp dừng sau
+      hữu hạn bước (xấu nhất là model đầy đủ)
+
+Trước khi giải MILP, tập cung được làm giàu bằng pricing trên LP
+relaxation (scipy.optimize.linprog, HiGHS; luồng gộp tạm cho giá rất cao):
+với đối ngẫu alpha, beta, pi, u của (2), (3), (4), (5),
+    rc(w_ij) = c_ij - alpha_i - pi_j           (a = alpha)
+    rc(z_jk) = d_jk - beta_j + pi_j - u_k      (b = beta - pi)
+cung bị bỏ có rc < 0 được thêm vào (tối đa k_secondary cung / khách mỗi
+vòng) tới khi không còn -> LP thu hẹp bằng LP relaxation đầy đủ. Thế vị
+a, b của MILP lấy từ đối ngẫu cuối cùng, nên relaxation chặt như LP đầy đủ.
+
+Tính toán trên d theo khối cột, không tạo ma trận |J| x |K| đầy đủ
+(dùng được với tscflp_lazy.CoordinateInstance).
+"""
+
+import time
+from typing import Dict, Optional
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import milp, linprog, LinearConstraint, Bounds
+
+from tscflp_core import TSCFLPInstance, Solution
+from tscflp_flow import solve_min_cost_flow
+from tscflp_highs import build_constraint_matrix
+
+# Số ứng viên mặc định cho mỗi khách (kho) / mỗi kho (nhà máy)
+DEFAULT_CANDIDATES = 10
+# Reduced cost < -PRICE_TOL thì coi là âm
+PRICE_TOL = 1e-6
+# Đơn giá luồng gộp khi pricing = BIG_M x chi phí cung lớn nhất
+BIG_M = 100.0
+# Luồng gộp lớn hơn ngưỡng này (tương đối theo demand) thì coi là có dùng
+EXCESS_TOL = 1e-6
+# Số khách / số kho trong 1 khối khi duyệt ma trận d theo cột / theo hàng
+COL_BLOCK = 4096
+ROW_BLOCK = 64
+
+
+def _arc_costs(M, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """M[rows[a], cols[a]] cho từng cung a (rows đã sắp tăng dần)."""
+    if len(rows) == 0:
+        return np.empty(0)
+    if isinstance(M, np.ndarray):
+        return np.asarray(M[rows, cols], dtype=np.float64)
+    # ma trận tính khi cần (tscflp_lazy.LazyCostMatrix): lấy theo từng hàng
+    out = np.empty(len(rows))
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    ends = np.r_[starts[1:], len(rows)]
+    for s, e in zip(starts, ends):
+        out[s:e] = M[int(rows[s])][cols[s:e]]
+    return out
+
+
+def _in_sorted(values: np.ndarray, sorted_arr: np.ndarray) -> np.ndarray:
+    """Mask: phần tử nào của values nằm trong mảng đã sắp sorted_arr."""
+    if len(sorted_arr) == 0:
+        return np.zeros(values.shape, dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_arr, values), len(sorted_arr) - 1)
+    return sorted_arr[pos] == values
+
+
+def _cheapest_excluded(cost: np.ndarray, flat: np.ndarray, arcs: np.ndarray, k: int):
+    """
+    cost, flat: chi phí và flat index của các cung (nguồn x đích).
+    Trả về (k cung rẻ nhất chưa có trong arcs của mỗi cột,
+            chi phí cung bị bỏ rẻ nhất của mỗi cột SAU khi thêm, inf nếu hết).
+    """
+    cost = np.where(_in_sorted(flat, arcs), np.inf, cost)
+    k = min(k, cost.shape[0])
+    if k == 0:
+        return np.empty(0, dtype=np.int64), cost.min(axis=0)
+    part = np.argpartition(cost, k - 1, axis=0)[:k]
+    picked = np.take_along_axis(cost, part, axis=0)
+    new = np.take_along_axis(flat, part, axis=0)[np.isfinite(picked)]
+    np.put_along_axis(cost, part, np.inf, axis=0)
+    return new, cost.min(axis=0)
+
+
+class SparseModel:
+    """
+    Model MILP thưa của TSCFLP (scipy.optimize.milp, HiGHS), xem đầu file.
+
+    Cùng giao diện với TSCFLPModel (solve / timing / last_optimal). Đăng ký
+    sẵn là backend "sparse" (k mặc định); muốn k khác thì đăng ký thêm:
+        register_backend("sparse-20", lambda inst: SparseModel(inst, 20, 20))
+
+    Parameters
+    ----------
+    inst : TSCFLPInstance
+    k_secondary : int
+        Số kho rẻ nhất (theo d_jk) giữ cho mỗi khách / thêm mỗi vòng.
+    k_primary : int
+        Số nhà máy rẻ nhất (theo c_ij) giữ cho mỗi kho / thêm mỗi vòng.
+    max_rounds : int
+        Số lần giải lại tối đa cho 1 lần solve.
+    mip_gap : float
+        Sai số tương đối chấp nhận (cận trên - cận dưới) / cận trên, như
+        mip_rel_gap mặc định của HiGHS.
+
+    Thống kê:
+        n_rounds   : tổng số lần giải MILP thu hẹp
+        arcs_added : tổng số cung thêm vào vì luồng gộp > 0
+        last_arcs  : số biến luồng (w + z) của model ở lần giải gần nhất
+    """
+
+    def __init__(self, inst: TSCFLPInstance,
+                 k_secondary: int = DEFAULT_CANDIDATES,
+                 k_primary: int = DEFAULT_CANDIDATES,
+                 max_rounds: int = 50,
+                 mip_gap: float = 1e-4):
+        start = time.perf_counter()
+
+        self.inst = inst
+        self.nI, self.nJ, self.nK = len(inst.I), len(inst.J), len(inst.K)
+        self.k_secondary = max(1, int(k_secondary))
+        self.k_primary = max(1, int(k_primary))
+        self.max_rounds = max_rounds
+        self.mip_gap = mip_gap
+
+        self.f = np.asarray(inst.f, dtype=np.float64)
+        self.g = np.asarray(inst.g, dtype=np.float64)
+        self.c = np.asarray(inst.c, dtype=np.float64)      # |I| x |J|: luôn nhỏ
+        self.D = np.asarray(inst.D, dtype=np.float64)
+
+        # Cung thêm ở các lần giải trước (flat index i*|J|+j, j*|K|+k)
+        self.extra_w = np.empty(0, dtype=np.int64)
+        self.extra_z = np.empty(0, dtype=np.int64)
+
+        self.build_time = time.perf_counter() - start
+        self.solve_time = 0.0
+        self.n_solves = 0
+        self.n_rounds = 0
+        self.arcs_added = 0
+        self.last_arcs = 0
+        self.last_optimal = False
+
+    # -----------------------------------------------------------------
+    # Tập cung ứng viên
+    # -----------------------------------------------------------------
+    def _expand_w(self, w, open_I, open_J, targets=None, sources=None):
+        """
+        Thêm k_primary cung rẻ nhất chưa có cho mỗi kho trong targets,
+        cùng mọi cung (sources x targets). targets = None: tập ban đầu,
+        k cung rẻ nhất của mọi kho mở được (kể cả cung đã có trong w).
+        """
+        Ia = np.flatnonzero(open_I)
+        Ja = np.flatnonzero(open_J) if targets is None else targets
+        if sources is not None and len(sources) and len(Ja):
+            w = np.union1d(w, (sources[:, None] * self.nJ + Ja[None, :]).ravel())
+        if len(Ia) and len(Ja):
+            flat = Ia[:, None] * self.nJ + Ja[None, :]
+            skip = w if targets is not None else w[:0]
+            added, _ = _cheapest_excluded(self.c[np.ix_(Ia, Ja)], flat, skip, self.k_primary)
+            w = np.union1d(w, added)
+        return w
+
+    def _expand_z(self, z, open_J, targets=None, sources=None):
+        """Như _expand_w cho cung z: k_secondary kho rẻ nhất cho mỗi khách."""
+        Ja = np.flatnonzero(open_J)
+        cust = np.arange(self.nK) if targets is None else targets
+        if sources is not None and len(sources) and len(cust):
+            z = np.union1d(z, (sources[:, None] * self.nK + cust[None, :]).ravel())
+        if len(Ja) and len(cust):
+            skip = z if targets is not None else z[:0]
+            added = []
+            for k0 in range(0, len(cust), COL_BLOCK):
+                cols = cust[k0:k0 + COL_BLOCK]
+                flat = Ja[:, None] * self.nK + cols[None, :]
+                sub = np.asarray(self.inst.d[np.ix_(Ja, cols)], dtype=np.float64)
+                added.append(_cheapest_excluded(sub, flat, skip, self.k_secondary)[0])
+            z = np.union1d(z, np.concatenate(added))
+        return z
+
+    def _excluded_min(self, w, z, open_I, open_J, pot_I, pot_J):
+        """
+        (m', m): m'_j = min (c_ij - pot_I[i]), m_k = min (d_jk - pot_J[j]) trên
+        các cung bị bỏ (chỉ xét facility mở được), inf nếu không còn cung nào.
+        """
+        Ia, Ja = np.flatnonzero(open_I), np.flatnonzero(open_J)
+        m_w = np.full(self.nJ, np.inf)
+        m_z = np.full(self.nK, np.inf)
+        if len(Ia) and len(Ja):
+            flat = Ia[:, None] * self.nJ + Ja[None, :]
+            sub = self.c[np.ix_(Ia, Ja)] - pot_I[Ia, None]
+            m_w[Ja] = _cheapest_excluded(sub, flat, w, 0)[1]
+        if len(Ja):
+            for k0 in range(0, self.nK, COL_BLOCK):
+                cols = np.arange(k0, min(self.nK, k0 + COL_BLOCK))
+                flat = Ja[:, None] * self.nK + cols[None, :]
+                sub = np.asarray(self.inst.d[np.ix_(Ja, cols)], dtype=np.float64)
+                m_z[cols] = _cheapest_excluded(sub - pot_J[Ja, None], flat, z, 0)[1]
+        return m_w, m_z
+
+    # -----------------------------------------------------------------
+    # Model thu hẹp + luồng gộp
+    # -----------------------------------------------------------------
+    def _relaxed(self, w, z, pot, lb, ub):
+        """
+        (cost, constraints, bounds, integrality) của model có các cung w, z
+        và biến gộp q (|I|), r (|J|), s (|J|), t (|K|) ở cuối vector biến;
+        pot = (a, m', b, m) là đơn giá của q, r, s, t (xem đầu file).
+        """
+        pot_I, m_w, pot_J, m_z = pot
+        nI, nJ, nK = self.nI, self.nJ, self.nK
+        w_arcs = np.divmod(w, nJ)
+        z_arcs = np.divmod(z, nK)
+        A, rlb, rub = build_constraint_matrix(self.inst, w_arcs, z_arcs)
+        n_row, n_var = A.shape
+
+        r2, r3, r4, r5 = 0, nI, nI + nJ, nI + 2 * nJ
+        r6, r7 = n_row, n_row + 1
+        oq, o_r, o_s, o_t = 0, nI, nI + nJ, nI + 2 * nJ
+        Ii, Jj, Kk = np.arange(nI), np.arange(nJ), np.arange(nK)
+        rows = np.concatenate([r2 + Ii, np.full(nI, r6),                  # q
+                               r4 + Jj, np.full(nJ, r6),                  # r
+                               r3 + Jj, r4 + Jj, np.full(nJ, r7),         # s
+                               r5 + Kk, np.full(nK, r7)])                 # t
+        cols = np.concatenate([oq + Ii, oq + Ii,
+                               o_r + Jj, o_r + Jj,
+                               o_s + Jj, o_s + Jj, o_s + Jj,
+                               o_t + Kk, o_t + Kk])
+        vals = np.concatenate([np.ones(nI), np.ones(nI),
+                               np.ones(nJ), -np.ones(nJ),
+                               np.ones(nJ), -np.ones(nJ), np.ones(nJ),
+                               np.ones(nK), -np.ones(nK)])
+        E = sp.csr_matrix((vals, (rows, cols)), shape=(n_row + 2, nI + 2 * nJ + nK))
+        A = sp.hstack([sp.vstack([A, sp.csr_matrix((2, n_var))]), E], format="csr")
+        rlb = np.concatenate([rlb, [0.0, 0.0]])
+        rub = np.concatenate([rub, [0.0, 0.0]])
+
+        # khách / kho không còn cung bị bỏ thì không có luồng gộp
+        has_w, has_z = np.isfinite(m_w), np.isfinite(m_z)
+        cost = np.concatenate([self.f, self.g,
+                               _arc_costs(self.c, *w_arcs),
+                               _arc_costs(self.inst.d, *z_arcs),
+                               pot_I, np.where(has_w, m_w, 0.0),
+                               pot_J, np.where(has_z, m_z, 0.0)])
+        n_flow = len(w) + len(z)
+        var_lb = np.concatenate([lb, np.zeros(n_flow + nI + 2 * nJ + nK)])
+        var_ub = np.concatenate([ub, np.full(n_flow + nI, np.inf),
+                                 np.where(has_w, np.inf, 0.0),
+                                 np.full(nJ, np.inf),
+                                 np.where(has_z, np.inf, 0.0)])
+        integrality = np.zeros(len(cost))
+        integrality[:nI + nJ] = 1
+        return cost, LinearConstraint(A, rlb, rub), Bounds(var_lb, var_ub), integrality
+
+    def _solve_lp(self, w, z, pot, lb, ub, time_left):
+        """
+        Giải LP relaxation. Trả về (đối ngẫu (alpha, beta, pi, u), giá trị LP,
+        True nếu không dùng luồng gộp), hoặc None nếu không giải được.
+        """
+        nI, nJ, nK = self.nI, self.nJ, self.nK
+        cost, cons, bounds, _ = self._relaxed(w, z, pot, lb, ub)
+        n_ub = nI + nJ              # (2), (3) là ràng buộc <=, còn lại là =
+        options = {} if time_left is None else {"time_limit": max(time_left, 0.0)}
+        res = linprog(cost, A_ub=cons.A[:n_ub], b_ub=cons.ub[:n_ub],
+                      A_eq=cons.A[n_ub:], b_eq=cons.lb[n_ub:],
+                      bounds=np.column_stack([bounds.lb, bounds.ub]),
+                      method="highs", options=options)
+        if res.status != 0:
+            return None
+        y_ub, y_eq = res.ineqlin.marginals, res.eqlin.marginals
+        excess = res.x[nI + nJ + len(w) + len(z):]
+        exact = not np.any(excess > EXCESS_TOL * max(1.0, float(self.D.sum())))
+        return (y_ub[:nI], y_ub[nI:], y_eq[:nJ], y_eq[nJ:nJ + nK]), float(res.fun), exact
+
+    def _price(self, w, z, duals, open_I, open_J):
+        """Các cung bị bỏ có reduced cost âm (flat index w, z), xem đầu file."""
+        alpha, beta, pi, u = duals
+        rc_w = self.c - alpha[:, None] - pi[None, :]
+        rc_w[~open_I, :] = np.inf
+        rc_w[:, ~open_J] = np.inf
+        new_w = np.flatnonzero(rc_w < -PRICE_TOL)
+        new_w = new_w[~_in_sorted(new_w, w)]
+
+        Ja, shift = np.flatnonzero(open_J), beta - pi
+        new_z, ks, vals = [z[:0]], [z[:0]], [np.empty(0)]
+        for j0 in range(0, len(Ja), ROW_BLOCK):
+            jb = Ja[j0:j0 + ROW_BLOCK]
+            rc = np.asarray(self.inst.d[jb], dtype=np.float64) - shift[jb, None] - u[None, :]
+            r, k = np.nonzero(rc < -PRICE_TOL)
+            flat = jb[r] * self.nK + k
+            fresh = ~_in_sorted(flat, z)
+            new_z.append(flat[fresh])
+            ks.append(k[fresh])
+            vals.append(rc[r, k][fresh])
+        new_z, ks, vals = np.concatenate(new_z), np.concatenate(ks), np.concatenate(vals)
+
+        # mỗi khách chỉ thêm k_secondary cung có reduced cost âm nhất
+        order = np.lexsort((vals, ks))
+        first = np.r_[True, ks[order][1:] != ks[order][:-1]]
+        pos = np.arange(len(order))
+        rank = pos - np.maximum.accumulate(np.where(first, pos, 0))
+        return new_w, np.sort(new_z[order[rank < self.k_secondary]])
+
+    def _column_generation(self, w, z, lb, ub, time_left):
+        """
+        Pricing lặp trên LP relaxation với bound lb, ub của x, y tới khi
+        không còn cung bị bỏ nào có reduced cost âm. Luồng gộp được cho giá
+        rất cao (BIG_M) để LP luôn có nghiệm mà không dùng nó nếu tránh được.
+        Trả về (w, z, a, b, value): thế vị a, b lấy từ đối ngẫu cuối cùng,
+        value = giá trị LP nếu đã hội tụ và không dùng luồng gộp (= giá trị
+        LP relaxation đầy đủ; bằng chi phí luồng tối ưu nếu lb = ub), ngược lại inf.
+        """
+        nI, nJ = self.nI, self.nJ
+        open_I, open_J = ub[:nI] > 0, ub[nI:] > 0
+        zero_I, zero_J = np.zeros(nI), np.zeros(nJ)
+        pot_I, pot_J = zero_I, zero_J
+        value = float('inf')
+        for _ in range(self.max_rounds):
+            if time_left() is not None and time_left() <= 0:
+                break
+            m_w, m_z = self._excluded_min(w, z, open_I, open_J, zero_I, zero_J)
+            big = BIG_M * max(np.max(self.c, initial=1.0),
+                              np.max(m_w[np.isfinite(m_w)], initial=1.0),
+                              np.max(m_z[np.isfinite(m_z)], initial=1.0))
+            pot = (zero_I, np.where(np.isfinite(m_w), big, np.inf),
+                   zero_J, np.where(np.isfinite(m_z), big, np.inf))
+            out = self._solve_lp(w, z, pot, lb, ub, time_left())
+            if out is None:
+                break
+            duals, lp_value, exact = out
+            pot_I, pot_J = duals[0], duals[1] - duals[2]
+            new_w, new_z = self._price(w, z, duals, open_I, open_J)
+            if not len(new_w) and not len(new_z):
+                value = lp_value if exact else value
+                break
+            w, z = np.union1d(w, new_w), np.union1d(z, new_z)
+        return w, z, pot_I, pot_J, value
+
+    # -----------------------------------------------------------------
+    # Giải
+    # -----------------------------------------------------------------
+    def _bounds(self, fixed: Optional[Dict[str, Dict[int, int]]]):
+        """Bound của x_i, y_j: [0, 1], biến bị fix thì lb = ub."""
+        lb = np.zeros(self.nI + self.nJ)
+        ub = np.ones(self.nI + self.nJ)
+        if fixed is not None:
+            for i, val in fixed.get('I', {}).items():
+                lb[i] = ub[i] = int(val)
+            for j, val in fixed.get('J', {}).items():
+                lb[self.nI + j] = ub[self.nI + j] = int(val)
+        return lb, ub
+
+    def solve(self,
+              time_limit: Optional[float] = None,
+              fixed: Optional[Dict[str, Dict[int, int]]] = None,
+              warm_start=None
+              ) -> Solution:
+        """
+        Giải model thưa với fixed-set cho trước (xem đầu file).
+        warm_start = (open_I, open_J, w, z): các cung incumbent dùng được
+        đưa vào tập ứng viên (milp không nhận MIP start).
+        """
+        start = time.perf_counter()
+        nI, nJ = self.nI, self.nJ
+
+        def time_left():
+            return None if time_limit is None else time_limit - (time.perf_counter() - start)
+
+        lb, ub = self._bounds(fixed)
+        open_I, open_J = ub[:nI] > 0, ub[nI:] > 0
+        w, z = self.extra_w, self.extra_z
+        if warm_start is not None:
+            # các cung incumbent dùng -> model thu hẹp chắc chắn chứa incumbent
+            w = np.union1d(w, np.flatnonzero(np.asarray(warm_start[2]) > 0))
+            z = np.union1d(z, np.flatnonzero(np.asarray(warm_start[3]) > 0))
+        w = self._expand_w(w, open_I, open_J)
+        z = self._expand_z(z, open_J)
+        n_start = len(w) + len(z)
+
+        # --- 1. Pricing trên LP relaxation, thế vị a, b = đối ngẫu cuối cùng ---
+        w, z, pot_I, pot_J, _ = self._column_generation(w, z, lb, ub, time_left)
+
+        # --- 2. MILP trên relaxation, thêm cung khi luồng gộp > 0 ---
+        best: Optional[Solution] = None
+        lower = -np.inf          # cận dưới (dual bound của relaxation)
+        pattern = None
+        proven = False
+        for _ in range(self.max_rounds):
+            options = {"disp": False, "mip_rel_gap": self.mip_gap / 2}
+            if time_left() is not None:
+                if time_left() <= 0:
+                    break
+                options["time_limit"] = time_left()
+            self.n_rounds += 1
+
+            m_w, m_z = self._excluded_min(w, z, open_I, open_J, pot_I, pot_J)
+            cost, cons, bounds, integrality = self._relaxed(w, z, (pot_I, m_w, pot_J, m_z), lb, ub)
+            res = milp(cost, constraints=cons, integrality=integrality,
+                       bounds=bounds, options=options)
+            if res.x is None:
+                # relaxation vô nghiệm -> model đầy đủ cũng vô nghiệm
+                proven = res.status == 2
+                break
+            if res.status == 0:
+                lower = max(lower, float(getattr(res, "mip_dual_bound", res.fun)))
+
+            xy = np.rint(res.x[:nI + nJ]).astype(int)
+            pattern = xy.tolist()
+            excess = res.x[nI + nJ + len(w) + len(z):]
+            tol = EXCESS_TOL * max(1.0, float(self.D.sum()))
+            q, r = excess[:nI], excess[nI:nI + nJ]
+            s, t = excess[nI + nJ:nI + 2 * nJ], excess[nI + 2 * nJ:]
+            need_J = np.flatnonzero(r > tol)
+            need_K = np.flatnonzero(t > EXCESS_TOL * np.maximum(1.0, self.D))
+            if not len(need_J) and not len(need_K):
+                # không dùng luồng gộp: khả thi cho model đầy đủ
+                if best is None or res.fun <= best.cost:
+                    best = Solution(cost=float(res.fun), open_I=pattern[:nI], open_J=pattern[nI:])
+                proven = res.status == 0
+                break
+
+            # luồng gộp > 0: thêm cung cho các kho / khách đang dùng nó, gồm
+            # mọi cung từ nguồn của luồng gộp (q_i > 0, s_j > 0) -> lời giải
+            # vừa tìm được biểu diễn được bằng cung thật ở lần giải sau
+            if len(need_J):
+                w = self._expand_w(w, open_I, open_J, need_J, np.flatnonzero(q > tol))
+            if len(need_K):
+                z = self._expand_z(z, open_J, need_K, np.flatnonzero(s > tol))
+            # và các cung mà luồng tối ưu của pattern vừa tìm được cần tới;
+            # giá trị LP khi đó là chi phí thật của pattern (cận trên)
+            w, z, _, _, value = self._column_generation(w, z, xy, xy, time_left)
+            if np.isfinite(value) and (best is None or value < best.cost):
+                best = Solution(cost=value, open_I=pattern[:nI], open_J=pattern[nI:])
+            if best is not None and best.cost - lower <= self.mip_gap * abs(best.cost):
+                proven = True
+                break
+
+        # giữ lại các cung đã thêm cho những lần giải sau
+        self.arcs_added += len(w) + len(z) - n_start
+        self.extra_w, self.extra_z = w, z
+        self.last_arcs = len(w) + len(z)
+        self.last_optimal = proven
+
+        sol = best
+        if sol is None:
+            if pattern is not None:
+                # dừng giữa chừng: chi phí thật của pattern cuối (luồng trên mọi cung)
+                flow = solve_min_cost_flow(self.inst, pattern[:nI], pattern[nI:])
+                sol = Solution(cost=float(flow.cost), open_I=pattern[:nI], open_J=pattern[nI:],
+                               flow=flow.sparse() if flow.feasible else None)
+            else:
+                sol = Solution(cost=float('inf'), open_I=[0] * nI, open_J=[0] * nJ)
+
+        self.solve_time += time.perf_counter() - start
+        self.n_solves += 1
+        return sol
+
+    def timing(self) -> Dict[str, float]:
+        """Thống kê thời gian dựng / giải model (giây) và số cung."""
+        return {
+            "build_time_seconds": self.build_time,
+            "solve_time_seconds": self.solve_time,
+            "num_solves": self.n_solves,
+            "rounds": self.n_rounds,
+            "arcs_added": self.arcs_added,
+            "last_num_arcs": self.last_arcs,
+            "full_num_arcs": self.nI * self.nJ + self.nJ * self.nK,
+        }